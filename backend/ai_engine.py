@@ -1,8 +1,25 @@
 import speech_recognition as sr
-import openai
-import os
+
+import transcription_service
+
+# one single-worker service per backend, reused across calls
+_services = {}
+
+
+def _get_service(use_online):
+    name = "whisper" if use_online else "google"
+    if name not in _services:
+        _services[name] = transcription_service.TranscriptionService(
+            transcription_service.create_backend(name), workers=1, queue_size=0)
+    return _services[name]
+
 
 def transcribe_voice(use_online=False):
+    """
+    Local (desktop) helper: record one utterance from the microphone and
+    transcribe it through the transcription service. The server path is
+    POST /doctor/ai/transcribe with the audio bytes.
+    """
     recognizer = sr.Recognizer()
 
     with sr.Microphone() as source:
@@ -11,20 +28,11 @@ def transcribe_voice(use_online=False):
         audio = recognizer.listen(source)
 
     try:
-        if use_online:
-            print("🔗 Using OpenAI Whisper API...")
-            with open("temp_audio.wav", "wb") as f:
-                f.write(audio.get_wav_data())
-
-            with open("temp_audio.wav", "rb") as audio_file:
-                transcript = openai.Audio.transcribe("whisper-1", audio_file)
-            return transcript["text"]
-
-        else:
-            print("🎧 Using offline Google SpeechRecognition...")
-            return recognizer.recognize_google(audio)
+        service = _get_service(use_online)
+        print(f"🎧 Transcribing with {service.backend.name}...")
+        return service.transcribe(audio.get_wav_data(), "speech.wav")["text"]
 
-    except sr.UnknownValueError:
+    except transcription_service.UnintelligibleAudio:
         return "Could not understand your voice."
-    except sr.RequestError as e:
+    except transcription_service.TranscriptionError as e:
         return f"Speech recognition error: {e}"
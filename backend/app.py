@@ -1,23 +1,40 @@
 from flask import Flask, render_template, session, redirect
 from flask_cors import CORS
+import os
 import database
+import nlp_engine
+import migrations
+from utils import counters, bulk_export, session_store, sql_profiler, metrics, request_profiler, llm_cache
+from utils.patient_search import patient_index
 
 # Import blueprints
 from routes.auth_routes import auth_bp
 from routes.doctor_routes import doctor_bp
 from routes.patient_routes import patient_bp
 from routes.admin_routes import admin_bp
+from routes.job_routes import job_bp
+from routes.nlp_routes import nlp_bp
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.secret_key = "supersecretkey"
-app.config["SESSION_TYPE"] = "filesystem"
 CORS(app)
+metrics.init_app(app)         # first, so its timing wraps every other hook; serves /metrics
+database.init_app(app)
+counters.init_app(app)
+migrations.init_app(app)
+bulk_export.init_app(app)
+session_store.init_app(app)   # cookie holds only the session ID
+llm_cache.init_app(app)       # expires cached model output on disk
+sql_profiler.init_app(app)    # per-request SQL timing, N+1 and slow log
+request_profiler.init_app(app)  # opt-in cProfile / stack sampling, see /admin/profiler
 
 # Register Blueprints
 app.register_blueprint(auth_bp, url_prefix="/auth")
 app.register_blueprint(doctor_bp, url_prefix="/doctor")
 app.register_blueprint(patient_bp, url_prefix="/patient")
 app.register_blueprint(admin_bp, url_prefix="/admin")
+app.register_blueprint(job_bp, url_prefix="/jobs")
+app.register_blueprint(nlp_bp, url_prefix="/nlp")
 
 @app.route("/")
 def index():
@@ -32,4 +49,8 @@ def index():
 
 if __name__ == "__main__":
     database.create_tables()
+    migrations.migrate()
+    if os.environ.get("EHR_NLP_WARMUP", "1") == "1":
+        nlp_engine.warm_up()
+    patient_index.load()
     app.run(debug=True, port=5000)
@@ -0,0 +1,102 @@
+# Throughput + accuracy benchmark for prescription extraction.
+#
+#   cd backend && python benchmarks/extraction_benchmark.py [--rounds 200]
+#
+# Compares the legacy per-request regex extractor with extraction_engine
+# on the dictation corpus in benchmarks/dictations.jsonl. spaCy is not
+# needed: both extractors run on raw text so only extraction is timed.
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import extraction_engine  # noqa: E402
+
+CORPUS_PATH = os.path.join(BENCH_DIR, "dictations.jsonl")
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ----------------------------------------
+# Legacy extractor (pre-engine ai_structure, minus spaCy)
+# ----------------------------------------
+def legacy_extract(text):
+    diagnosis = ""
+    for p in [r"diagnosis is (.*?)(?:\.|$)", r"diagnosed with (.*?)(?:\.|$)"]:
+        m = re.search(p, text, re.IGNORECASE)
+        if m:
+            diagnosis = m.group(1).strip()
+            break
+
+    medicines = []
+    med_pattern = r"([A-Za-z]+[A-Za-z0-9]*)\s*(\d+mg|\d+ml|\d+mcg)?\s*(tablet|capsule|syrup|drop)?\s*(once|twice|daily|night|morning|evening)?\s*(for\s*\d+\s*(days|weeks))?"
+    for m in re.finditer(med_pattern, text, re.IGNORECASE):
+        if m.group(1):
+            medicines.append({"name": m.group(1)})
+
+    return {"diagnosis": diagnosis, "medicines": medicines}
+
+
+# ----------------------------------------
+# Scoring
+# ----------------------------------------
+def score(extract, corpus):
+    tp = fp = fn = dx_hits = 0
+    for row in corpus:
+        out = extract(row["text"])
+        found = {m["name"].lower() for m in out["medicines"]}
+        gold = {m.lower() for m in row["medicines"]}
+        tp += len(found & gold)
+        fp += len(found - gold)
+        fn += len(gold - found)
+        dx_hits += out["diagnosis"].lower() == row["diagnosis"].lower()
+
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "precision": round(precision, 3),
+        "recall": round(recall, 3),
+        "diagnosis_accuracy": round(dx_hits / len(corpus), 3),
+    }
+
+
+def throughput(extract, corpus, rounds):
+    texts = [row["text"] for row in corpus]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for t in texts:
+            extract(t)
+    elapsed = time.perf_counter() - start
+    n = rounds * len(texts)
+    return {
+        "docs": n,
+        "docs_per_sec": round(n / elapsed, 1),
+        "us_per_doc": round(elapsed / n * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    results = {}
+    for name, fn in (("legacy_regex", legacy_extract), ("extraction_engine", extraction_engine.extract)):
+        results[name] = {**score(fn, corpus), **throughput(fn, corpus, args.rounds)}
+
+    print(json.dumps({"corpus_size": len(corpus), "rounds": args.rounds, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
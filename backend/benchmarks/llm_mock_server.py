@@ -0,0 +1,118 @@
+# Local OpenAI-compatible mock for exercising llm_client without the API.
+#
+#   cd backend && python benchmarks/llm_mock_server.py --port 8099 \
+#       [--latency 0.2] [--fail-rate 0.3] [--fail-status 503] [--hang-rate 0.1]
+#   OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=test python app.py
+#
+# POST /v1/chat/completions answers with a fixed structured prescription
+# after --latency seconds. A --fail-rate share of requests get
+# --fail-status (with Retry-After), a --hang-rate share sleep for
+# --hang seconds first, to trip client deadlines and the circuit breaker.
+# With "stream": true the content is sent as SSE chunks of --chunk
+# characters, --token-delay seconds apart.
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESULT = {
+    "diagnosis": "Acute bronchitis",
+    "symptoms": ["cough", "mild fever"],
+    "medicines": [
+        {"name": "Azithromycin", "dose": "500mg", "freq": "once daily", "duration": "3 days"},
+        {"name": "Paracetamol", "dose": "650mg", "freq": "twice daily", "duration": "5 days"},
+    ],
+    "transcript": "",
+}
+
+
+def make_handler(args):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *a):
+            if args.verbose:
+                super().log_message(fmt, *a)
+
+        def _send(self, status, body, headers=None):
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            try:
+                self.wfile.write(raw)
+            except BrokenPipeError:
+                pass    # client gave up (deadline)
+
+        def _stream(self, content):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for i in range(0, len(content), args.chunk):
+                    delta = {"choices": [{"index": 0, "delta": {"content": content[i:i + args.chunk]}}]}
+                    self.wfile.write(f"data: {json.dumps(delta)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(args.token_delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+            except BrokenPipeError:
+                pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+
+            if not self.path.endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": "not found"}})
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                return self._send(401, {"error": {"message": "missing key"}})
+
+            if random.random() < args.hang_rate:
+                time.sleep(args.hang)
+            if random.random() < args.fail_rate:
+                return self._send(args.fail_status, {"error": {"message": "injected failure"}},
+                                  {"Retry-After": str(args.retry_after)})
+
+            time.sleep(args.latency)
+            content = json.dumps(RESULT)
+            if payload.get("stream"):
+                return self._stream(content)
+            self._send(200, {
+                "id": "mock-1",
+                "object": "chat.completion",
+                "model": payload.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+            })
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang", type=float, default=30.0)
+    parser.add_argument("--chunk", type=int, default=4)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args))
+    print(f"Mock LLM on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# Pages-per-second benchmark for PDF rendering.
+#
+#   cd backend && python benchmarks/pdf_benchmark.py [--docs 300]
+#
+# Renders synthetic patient summaries and prescriptions with the legacy
+# FPDF code (one FPDF + multi_cell per line, as export_utils did before
+# utils.pdf_engine) and with the engine, one document per call and via
+# render_batch(). Nothing is written to disk. Needs fpdf, not MySQL.
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fpdf import FPDF  # noqa: E402
+
+from utils import pdf_engine  # noqa: E402
+
+PAGE_RE = re.compile(rb"/Type /Page\b(?!s)")
+
+DIAGNOSES = ["Hypertension", "Type 2 diabetes mellitus", "Acute bronchitis", "Migraine without aura",
+             "Iron deficiency anaemia", "Seasonal allergic rhinitis", "Gastro-oesophageal reflux disease"]
+DRUGS = [("Amlodipine", "5mg"), ("Metformin", "500mg"), ("Azithromycin", "500mg"), ("Sumatriptan", "50mg"),
+         ("Ferrous sulfate", "200mg"), ("Cetirizine", "10mg"), ("Omeprazole", "20mg"), ("Paracetamol", "650mg")]
+ADVICE = ["Take after meals.", "Review in two weeks.", "Monitor blood pressure daily and keep a log.",
+          "Avoid alcohol while on this medication.", "Increase fluid intake and rest.",
+          "Return immediately if symptoms worsen or new symptoms appear."]
+
+
+def make_prescription(rng, when):
+    return {
+        "prescription_id": rng.randint(1, 10 ** 6),
+        "created_at": when,
+        "doctor_name": "Dr. " + rng.choice(["Mehta", "Shah", "Iyer", "Patel"]),
+        "first_name": "Asha",
+        "last_name": "Verma",
+        "diagnosis": rng.choice(DIAGNOSES),
+        "prescription_text": " ".join(rng.choice(ADVICE) for _ in range(rng.randint(2, 6))),
+        "medicines": [{"name": n, "dosage": d} for n, d in rng.sample(DRUGS, rng.randint(1, 4))],
+    }
+
+
+def make_patient_record(rng, i):
+    start = datetime(2015, 1, 1)
+    prescriptions = [make_prescription(rng, start + timedelta(days=rng.randint(0, 3650)))
+                     for _ in range(rng.randint(3, 40))]
+    reports = [{"upload_date": start + timedelta(days=rng.randint(0, 3650)),
+                "report_name": rng.choice(["CBC", "Lipid profile", "HbA1c", "Chest X-ray"]),
+                "report_file": f"report_{i}_{j}.pdf"} for j in range(rng.randint(0, 10))]
+    patient = {"patient_id": i, "first_name": "Patient", "last_name": str(i), "username": f"patient{i}",
+               "phone": "98765" + str(i).zfill(5), "dob": "1980-05-17", "doctor_name": "Dr. Mehta"}
+    return {"patient": patient, "prescriptions": prescriptions, "reports": reports}
+
+
+# ----------------------------------------
+# Legacy renderers (pre-engine export_utils, text cleaned to latin-1)
+# ----------------------------------------
+def legacy_patient(item):
+    c = pdf_engine.clean
+    patient, prescriptions, reports = item["patient"], item["prescriptions"], item["reports"]
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=12)
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, "Patient Summary", ln=True, align="C")
+    pdf.ln(6)
+    pdf.set_font("Arial", "", 12)
+    pdf.cell(0, 8, f"Name: {patient.get('first_name','')} {patient.get('last_name','')}", ln=True)
+    pdf.cell(0, 8, f"Username: {patient.get('username','')}", ln=True)
+    pdf.cell(0, 8, f"Phone: {patient.get('phone','-')}", ln=True)
+    pdf.cell(0, 8, f"DOB: {patient.get('dob','-')}", ln=True)
+    pdf.cell(0, 8, f"Assigned Doctor: {patient.get('doctor_name','-')}", ln=True)
+    pdf.ln(8)
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 8, "Prescriptions:", ln=True)
+    pdf.set_font("Arial", "", 11)
+    for pres in prescriptions:
+        pdf.multi_cell(0, 6, c(f"- [{pres.get('created_at')}] {pres.get('doctor_name','')} - {pres.get('diagnosis','')}"))
+        if pres.get("prescription_text"):
+            pdf.multi_cell(0, 6, c(f"  {pres['prescription_text']}"))
+        if pres["medicines"]:
+            pdf.multi_cell(0, 6, "  Medicines:")
+            for m in pres["medicines"]:
+                pdf.multi_cell(0, 6, c(f"    * {m.get('name','')} {m.get('dosage','')}"))
+        pdf.ln(2)
+    pdf.ln(6)
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 8, "Lab Reports:", ln=True)
+    pdf.set_font("Arial", "", 11)
+    for r in reports:
+        pdf.cell(0, 6, c(f"- [{r.get('upload_date')}] {r.get('report_name')} ({r.get('report_file')})"), ln=True)
+    data = pdf.output(dest="S")
+    return data.encode("latin-1") if isinstance(data, str) else bytes(data)
+
+
+def legacy_prescription(prescription):
+    c = pdf_engine.clean
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(0, 10, "Prescription", ln=True, align="C")
+    pdf.ln(6)
+    pdf.set_font("Arial", "", 12)
+    pdf.cell(0, 8, c(f"Date: {prescription.get('created_at','')}"), ln=True)
+    pdf.cell(0, 8, c(f"Doctor: {prescription.get('doctor_name','')}"), ln=True)
+    pdf.cell(0, 8, c(f"Patient: {prescription.get('first_name','')} {prescription.get('last_name','')}"), ln=True)
+    pdf.ln(6)
+    for label, key in (("Diagnosis:", "diagnosis"), ("Prescription:", "prescription_text")):
+        pdf.set_font("Arial", "B", 12)
+        pdf.cell(0, 8, label, ln=True)
+        pdf.set_font("Arial", "", 11)
+        pdf.multi_cell(0, 6, c(prescription.get(key, "")))
+        pdf.ln(4)
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(0, 8, "Medicines:", ln=True)
+    pdf.set_font("Arial", "", 11)
+    for m in prescription["medicines"]:
+        pdf.multi_cell(0, 6, c(f"- {m.get('name','')} {m.get('dosage','')}"))
+    data = pdf.output(dest="S")
+    return data.encode("latin-1") if isinstance(data, str) else bytes(data)
+
+
+# ----------------------------------------
+# Timing
+# ----------------------------------------
+def measure(render_all, items):
+    start = time.perf_counter()
+    outputs = render_all(items)
+    elapsed = time.perf_counter() - start
+    pages = sum(len(PAGE_RE.findall(pdf)) for pdf in outputs)
+    return {
+        "docs": len(outputs),
+        "pages": pages,
+        "pages_per_sec": round(pages / elapsed, 1),
+        "docs_per_sec": round(len(outputs) / elapsed, 1),
+        "mb_out": round(sum(len(pdf) for pdf in outputs) / 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    patients = [make_patient_record(rng, i) for i in range(args.docs)]
+    prescriptions = [make_prescription(rng, datetime(2024, 1, 1) + timedelta(minutes=i)) for i in range(args.docs)]
+
+    # warm up font metrics / word caches the way a long-running process would be
+    pdf_engine.render_batch("patient", patients[:5])
+    pdf_engine.render_batch("prescription", prescriptions[:5])
+
+    results = {}
+    for kind, items, legacy, single in (
+        ("patient_summary", patients, legacy_patient, pdf_engine.RENDERERS["patient"]),
+        ("prescription", prescriptions, legacy_prescription, pdf_engine.render_prescription),
+    ):
+        batch_kind = "patient" if kind == "patient_summary" else "prescription"
+        results[kind] = {
+            "legacy": measure(lambda xs: [legacy(x) for x in xs], items),
+            "engine": measure(lambda xs: [single(x) for x in xs], items),
+            "engine_batch": measure(lambda xs: pdf_engine.render_batch(batch_kind, xs), items),
+        }
+
+    print(json.dumps({"docs": args.docs, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
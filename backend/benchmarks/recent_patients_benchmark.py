@@ -0,0 +1,165 @@
+# Regression benchmark for the doctor dashboard "recent patients" query.
+#
+#   cd backend && python benchmarks/recent_patients_benchmark.py [--patients 50000]
+#
+# Builds a synthetic dataset in a scratch MySQL database (EHR_BENCH_DB,
+# default ehr_ai_bench - never the live one), then times the old
+# correlated-subquery query against utils.counters.recent_patients() and
+# checks both return the same rows. Exits non-zero on a mismatch or if
+# the set-based query is not faster.
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import mysql.connector  # noqa: E402
+
+import database  # noqa: E402
+from utils import counters  # noqa: E402
+
+BENCH_DB = os.environ.get("EHR_BENCH_DB", "ehr_ai_bench")
+
+LEGACY_SQL = """
+    SELECT
+        p.patient_id,
+        p.first_name,
+        p.last_name,
+        TIMESTAMPDIFF(YEAR, p.dob, CURDATE()) AS age,
+        p.phone,
+        p.address,
+
+        (SELECT MAX(created_at) FROM prescriptions WHERE patient_id = p.patient_id) AS last_visit,
+        (SELECT COUNT(*) FROM prescriptions WHERE patient_id = p.patient_id) AS prescription_count,
+        (SELECT COUNT(*) FROM lab_reports WHERE patient_id = p.patient_id) AS report_count
+
+    FROM patients p
+    WHERE p.doctor_id=%s
+    ORDER BY (last_visit IS NULL), last_visit DESC
+    LIMIT 8
+"""
+
+
+def _insert_many(cur, sql, rows, chunk=2000):
+    for i in range(0, len(rows), chunk):
+        cur.executemany(sql, rows[i:i + chunk])
+
+
+def build_dataset(conn, patients, max_visits, seed):
+    rnd = random.Random(seed)
+    cur = conn.cursor()
+
+    # Load without triggers, then install + rebuild the materialized stats
+    for table in ("ai_logs", "lab_reports", "prescriptions", "patients", "doctors",
+                  "dashboard_counters", "patient_visit_stats"):
+        cur.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.commit()
+
+    database.create_tables()
+    cur.execute("SELECT TRIGGER_NAME FROM information_schema.TRIGGERS WHERE TRIGGER_SCHEMA=%s", (BENCH_DB,))
+    for (trigger,) in cur.fetchall():
+        cur.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    cur.execute("INSERT INTO doctors (name, email, password) VALUES ('Bench Doctor', 'bench@example.com', 'x')")
+    did = cur.lastrowid
+
+    _insert_many(cur, """
+        INSERT INTO patients (doctor_id, first_name, last_name, dob, phone, username)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, [(did, f"First{i}", f"Last{i}", "1980-01-01", f"9{i:09d}", f"bench_{i}") for i in range(patients)])
+
+    cur.execute("SELECT patient_id FROM patients WHERE doctor_id=%s", (did,))
+    pids = [row[0] for row in cur.fetchall()]
+
+    # Unique timestamps so both queries have a single correct ordering
+    base = datetime(2015, 1, 1)
+    offsets = rnd.sample(range(10 * 365 * 24 * 3600), len(pids) * max_visits)
+    prescriptions, reports = [], []
+    for pid in pids:
+        for _ in range(rnd.randint(0, max_visits)):
+            prescriptions.append((did, pid, "Bench", "Bench", base + timedelta(seconds=offsets.pop())))
+        for _ in range(rnd.randint(0, 2)):
+            reports.append((did, pid, "CBC", "bench.pdf"))
+
+    _insert_many(cur, """
+        INSERT INTO prescriptions (doctor_id, patient_id, diagnosis, prescription_text, created_at)
+        VALUES (%s, %s, %s, %s, %s)
+    """, prescriptions)
+    _insert_many(cur, """
+        INSERT INTO lab_reports (doctor_id, patient_id, report_name, report_file)
+        VALUES (%s, %s, %s, %s)
+    """, reports)
+    conn.commit()
+
+    counters.install(cur)
+    counters._rebuild(cur)
+    conn.commit()
+    cur.close()
+    return did, len(prescriptions), len(reports)
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, round(statistics.median(samples), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=50000)
+    parser.add_argument("--max-visits", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    server = {k: v for k, v in database.DB_CONFIG.items() if k != "database"}
+    conn = mysql.connector.connect(**server)
+    conn.cursor().execute(f"CREATE DATABASE IF NOT EXISTS {BENCH_DB}")
+    conn.close()
+
+    database.DB_CONFIG["database"] = BENCH_DB
+    conn = mysql.connector.connect(**database.DB_CONFIG)
+
+    did, n_pres, n_reports = build_dataset(conn, args.patients, args.max_visits, args.seed)
+    cur = conn.cursor(dictionary=True)
+
+    def legacy():
+        cur.execute(LEGACY_SQL, (did,))
+        return cur.fetchall()
+
+    legacy_rows, legacy_ms = timed(legacy, args.repeat)
+    new_rows, new_ms = timed(lambda: counters.recent_patients(cur, did, 8), args.repeat)
+
+    key = ("patient_id", "last_visit", "prescription_count", "report_count")
+    same = [tuple(r[k] for k in key) for r in legacy_rows] == [tuple(r[k] for k in key) for r in new_rows]
+
+    print(json.dumps({
+        "patients": args.patients,
+        "prescriptions": n_pres,
+        "lab_reports": n_reports,
+        "legacy_ms": legacy_ms,
+        "set_based_ms": new_ms,
+        "speedup": round(legacy_ms / new_ms, 1) if new_ms else None,
+        "same_result": same,
+    }, indent=2))
+
+    cur.close()
+    conn.close()
+
+    if not same or new_ms >= legacy_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
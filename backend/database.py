@@ -1,5 +1,15 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from flask import g, has_app_context
+
+from utils import sql_profiler
 
 # ✅ MySQL Configuration (XAMPP Default)
 DB_CONFIG = {
@@ -9,12 +19,217 @@ DB_CONFIG = {
     "database": "ehr_ai_db" # Your EHR database
 }
 
+# ✅ Pool Configuration (override with environment variables)
+DB_POOL_SIZE = int(os.environ.get("EHR_DB_POOL_SIZE", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("EHR_DB_POOL_TIMEOUT", 5))       # seconds to wait for a free connection
+DB_POOL_PING_AFTER = float(os.environ.get("EHR_DB_POOL_PING_AFTER", 30)) # ping connections idle longer than this
+
+
+# ✅ Request-scoped connection handed out by the pool
+class PooledConnection:
+    """
+    Thin wrapper around a pooled MySQL connection.
+    close() is a no-op so existing route code can keep calling it;
+    the real connection goes back to the pool at request teardown.
+    """
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.last_used = time.monotonic()
+
+    def close(self):
+        pass
+
+    def cursor(self, *args, **kwargs):
+        # timed per request when the SQL profiler is on
+        return sql_profiler.wrap(self._raw.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class ConnectionPool:
+    """
+    Fixed-size, thread-safe MySQL connection pool.
+    Connections are opened lazily up to `size`; callers wait up to
+    `timeout` seconds when every connection is checked out.
+    """
+
+    def __init__(self, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 ping_after=DB_POOL_PING_AFTER, **config):
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.config = config
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._stats = {
+            "checkouts": 0,
+            "returns": 0,
+            "created": 0,
+            "discarded": 0,
+            "health_check_failures": 0,
+            "exhausted": 0,
+            "timeouts": 0,
+            "wait_time_total_ms": 0.0,
+            "wait_time_max_ms": 0.0,
+        }
+
+    def _open(self):
+        return PooledConnection(mysql.connector.connect(**self.config))
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+            self._stats["discarded"] += 1
+        try:
+            conn._raw.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn):
+        if time.monotonic() - conn.last_used < self.ping_after:
+            return True
+        try:
+            conn._raw.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._lock:
+                self._stats["health_check_failures"] += 1
+            return False
+
+    def acquire(self):
+        start = time.monotonic()
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+
+            if conn is None:
+                with self._lock:
+                    can_open = self._created < self.size
+                    if can_open:
+                        self._created += 1
+                    else:
+                        self._stats["exhausted"] += 1
+
+                if can_open:
+                    try:
+                        conn = self._open()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                    with self._lock:
+                        self._stats["created"] += 1
+                else:
+                    remaining = self.timeout - (time.monotonic() - start)
+                    try:
+                        conn = self._idle.get(timeout=max(remaining, 0))
+                    except queue.Empty:
+                        with self._lock:
+                            self._stats["timeouts"] += 1
+                        raise PoolError(f"No free connection after {self.timeout}s (pool size {self.size})")
+
+            if self._healthy(conn):
+                break
+            self._discard(conn)
+
+        waited = (time.monotonic() - start) * 1000
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_time_total_ms"] += waited
+            self._stats["wait_time_max_ms"] = max(self._stats["wait_time_max_ms"], waited)
+        return conn
+
+    def release(self, conn):
+        try:
+            # A half-read unbuffered result (abandoned stream) cannot be reused
+            if conn._raw.unread_result:
+                raise Error("unread result")
+            # Never hand an open transaction to the next request
+            if conn._raw.in_transaction:
+                conn._raw.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self._stats["returns"] += 1
+        self._idle.put(conn)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["size"] = self.size
+            data["open"] = self._created
+        data["idle"] = self._idle.qsize()
+        data["in_use"] = data["open"] - data["idle"]
+        data["wait_time_avg_ms"] = round(data["wait_time_total_ms"] / data["checkouts"], 3) if data["checkouts"] else 0.0
+        return data
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(**DB_CONFIG)
+                print(f"✅ MySQL connection pool ready: {DB_CONFIG['database']} (size {DB_POOL_SIZE})")
+    return _pool
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+# ✅ One pooled connection per Flask request (stored on g)
+def get_db():
+    if "db" not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+def close_db(exc=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
+
+
+# ✅ Pooled connection not tied to a request (streaming responses, workers)
+@contextmanager
+def pooled_connection():
+    conn = get_pool().acquire()
+    try:
+        yield conn
+    finally:
+        get_pool().release(conn)
+
+
 # ✅ Create Connection
 def connect_db():
+    """
+    Inside a request this returns the request's pooled connection.
+    Outside a request (scripts, create_tables) it opens a direct connection.
+    """
     try:
+        if has_app_context():
+            return get_db()
+
         connection = mysql.connector.connect(**DB_CONFIG)
         if connection.is_connected():
-            print("✅ Connected to MySQL Database: ehr_ai_db")
             return connection
     except Error as e:
         print(f"❌ Error connecting to MySQL: {e}")
@@ -51,7 +266,7 @@ def create_tables():
         specialization VARCHAR(100),
         phone VARCHAR(15),
         address VARCHAR(255),
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
     )
     """)
 
@@ -69,7 +284,7 @@ def create_tables():
         address VARCHAR(255),
         username VARCHAR(100) UNIQUE,
         password VARCHAR(255),
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
         FOREIGN KEY (doctor_id) REFERENCES doctors(doctor_id)
     )
     """)
@@ -145,6 +360,10 @@ def create_tables():
     )
     """)
 
+    # Dashboard Counters (table + maintenance triggers)
+    from utils import counters
+    counters.install(cursor)
+
     connection.commit()
     cursor.close()
     connection.close()
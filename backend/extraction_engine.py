@@ -0,0 +1,258 @@
+import re
+from bisect import bisect_right
+from collections import deque
+
+# ----------------------------------------
+# Lexicons
+# ----------------------------------------
+DRUG_LEXICON = (
+    "paracetamol", "acetaminophen", "dolo", "crocin", "calpol", "ibuprofen", "brufen",
+    "aspirin", "diclofenac", "aceclofenac", "naproxen", "tramadol", "mefenamic acid",
+    "amoxicillin", "augmentin", "amoxicillin clavulanate", "azithromycin", "ampicillin",
+    "cefixime", "ceftriaxone", "cefuroxime", "cephalexin", "ciprofloxacin", "levofloxacin",
+    "ofloxacin", "doxycycline", "metronidazole", "nitrofurantoin", "clarithromycin",
+    "linezolid", "cotrimoxazole", "fluconazole", "clotrimazole", "acyclovir", "oseltamivir",
+    "albendazole", "ivermectin", "cetirizine", "levocetirizine", "loratadine",
+    "fexofenadine", "montelukast", "chlorpheniramine", "salbutamol", "albuterol",
+    "budesonide", "ambroxol", "dextromethorphan", "guaifenesin", "prednisolone",
+    "dexamethasone", "hydrocortisone", "methylprednisolone", "pantoprazole", "omeprazole",
+    "esomeprazole", "rabeprazole", "ranitidine", "famotidine", "domperidone",
+    "ondansetron", "metoclopramide", "loperamide", "oral rehydration salts", "ors",
+    "lactulose", "sucralfate", "metformin", "glimepiride", "gliclazide", "sitagliptin",
+    "insulin", "insulin glargine", "amlodipine", "telmisartan", "losartan", "olmesartan",
+    "enalapril", "ramipril", "atenolol", "metoprolol", "bisoprolol", "carvedilol",
+    "hydrochlorothiazide", "furosemide", "spironolactone", "atorvastatin",
+    "rosuvastatin", "clopidogrel", "warfarin", "apixaban", "levothyroxine", "thyroxine",
+    "vitamin d3", "cholecalciferol", "vitamin b12", "methylcobalamin", "folic acid",
+    "iron", "ferrous sulphate", "calcium carbonate", "zinc", "multivitamin",
+    "gabapentin", "pregabalin", "amitriptyline", "sertraline", "escitalopram",
+    "fluoxetine", "alprazolam", "clonazepam", "diazepam", "zolpidem", "melatonin",
+    "sumatriptan", "betahistine", "tamsulosin", "finasteride", "sildenafil",
+    "mupirocin", "silver sulfadiazine", "permethrin", "ketoconazole", "terbinafine",
+)
+
+SYMPTOM_LEXICON = (
+    "fever", "high fever", "pain", "chest pain", "abdominal pain", "back pain",
+    "joint pain", "body ache", "body pain", "cough", "dry cough", "cold", "runny nose",
+    "sore throat", "vomit", "vomiting", "nausea", "diarrhea", "diarrhoea", "headache",
+    "migraine", "fatigue", "weakness", "tiredness", "breathing", "breathlessness",
+    "shortness of breath", "wheezing", "dizziness", "giddiness", "chills", "rash",
+    "itching", "swelling", "burning", "acidity", "heartburn", "constipation",
+    "loss of appetite", "palpitations", "insomnia",
+)
+
+# ----------------------------------------
+# Precompiled Patterns
+# ----------------------------------------
+DIAGNOSIS_PATTERNS = (
+    re.compile(r"\bdiagnosis\s*(?:is|:)\s*(.*?)(?:[.;\n]|$)", re.IGNORECASE),
+    re.compile(r"\bdiagnosed\s+with\s+(.*?)(?:[.;\n]|$)", re.IGNORECASE),
+    re.compile(r"\bsuffering\s+from\s+(.*?)(?:[.;,\n]|$)", re.IGNORECASE),
+)
+
+DOSE_RE = re.compile(r"\b(\d+(?:\.\d+)?\s?(?:mg|mcg|ml|g|iu|units?))\b", re.IGNORECASE)
+FORM_RE = re.compile(r"\b(tablets?|tabs?|capsules?|caps?|syrup|drops?|injection|cream|ointment|gel|inhaler|sachets?|puffs?)\b", re.IGNORECASE)
+FREQ_RE = re.compile(r"\b((?:once|twice|thrice|three times|four times)(?:\s+(?:a|per)\s+day|\s+daily)?"
+                     r"|daily|every\s+\d+\s+hours|at\s+night|night|morning|evening|bedtime"
+                     r"|after\s+meals|before\s+meals|od|bd|bid|tds|tid|qid|sos|hs|as\s+needed)\b",
+                     re.IGNORECASE)
+DURATION_RE = re.compile(r"\b(for\s+(?:\d+|one|two|three|four|five|six|seven|ten|fourteen)\s+(?:days?|weeks?|months?))\b",
+                         re.IGNORECASE)
+SENTENCE_RE = re.compile(r"[^.!?\n]+[.!?]?")
+
+# Attributes must follow the drug name within this many characters
+ATTRIBUTE_WINDOW = 80
+
+
+# ----------------------------------------
+# Aho-Corasick Lexicon Automaton
+# ----------------------------------------
+class LexiconAutomaton:
+    """
+    Multi-term matcher built once from a lexicon. find() scans the text
+    a single time and returns whole-word, non-overlapping, longest
+    leftmost matches as (start, end) character offsets.
+    """
+
+    def __init__(self, terms):
+        self._goto = [{}]
+        self._fail = [0]
+        self._term = [0]    # length of the term ending exactly at this state
+        self._dict = [0]    # nearest fail-ancestor that ends a term
+
+        for term in terms:
+            self._add(term.lower())
+        self._build()
+
+    def _add(self, term):
+        state = 0
+        for ch in term:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._term.append(0)
+                self._dict.append(0)
+            state = nxt
+        self._term[state] = len(term)
+
+    def _build(self):
+        todo = deque(self._goto[0].values())
+        while todo:
+            state = todo.popleft()
+            for ch, nxt in self._goto[state].items():
+                todo.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                fb = self._goto[f].get(ch, 0)
+                self._fail[nxt] = fb if fb != nxt else 0
+                fb = self._fail[nxt]
+                self._dict[nxt] = fb if self._term[fb] else self._dict[fb]
+
+    def find(self, text):
+        goto, fail, term, dict_link = self._goto, self._fail, self._term, self._dict
+        n = len(text)
+        hits = []
+        state = 0
+
+        lowered = text.lower()
+        if len(lowered) != n:
+            # rare case-folds that change length; keep offsets aligned
+            lowered = "".join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+
+        for i, c in enumerate(lowered):
+            node = goto[state]
+            while state and c not in node:
+                state = fail[state]
+                node = goto[state]
+            state = node.get(c, 0)
+            if not state:
+                continue
+
+            # every term ending here: the state itself, then its dictionary links
+            s = state if term[state] else dict_link[state]
+            while s:
+                start = i + 1 - term[s]
+                end = i + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == n or not text[end].isalnum()):
+                    hits.append((start, end))
+                s = dict_link[s]
+
+        # keep longest leftmost, non-overlapping
+        hits.sort(key=lambda h: (h[0], h[0] - h[1]))
+        chosen = []
+        last_end = -1
+        for start, end in hits:
+            if start >= last_end:
+                chosen.append((start, end))
+                last_end = end
+        return chosen
+
+
+_drugs = LexiconAutomaton(DRUG_LEXICON)
+_symptoms = LexiconAutomaton(SYMPTOM_LEXICON)
+
+
+# ----------------------------------------
+# Extraction
+# ----------------------------------------
+def _sentence_spans(text, doc=None):
+    if doc is not None:
+        return [(s.start_char, s.end_char) for s in doc.sents]
+    return [(m.start(), m.end()) for m in SENTENCE_RE.finditer(text)]
+
+
+def _attr(pattern, window):
+    m = pattern.search(window)
+    return m.group(1) if m else ""
+
+
+def extract_diagnosis(text, doc=None):
+    for p in DIAGNOSIS_PATTERNS:
+        m = p.search(text)
+        if m and m.group(1).strip():
+            return m.group(1).strip()
+
+    # fallback
+    if doc is not None:
+        for ent in doc.ents:
+            if ent.label_ in ("DISEASE", "CONDITION", "SYMPTOM"):
+                return ent.text
+    return ""
+
+
+def extract_symptoms(text, sentences):
+    starts = [s for s, _ in sentences]
+    picked = []
+    seen = set()
+    for start, _ in _symptoms.find(text):
+        idx = bisect_right(starts, start) - 1
+        if idx >= 0 and idx not in seen:
+            seen.add(idx)
+            picked.append(idx)
+
+    return [text[sentences[i][0]:sentences[i][1]].strip() for i in sorted(picked)]
+
+
+def extract_medicines(text):
+    matches = _drugs.find(text)
+    medicines = []
+    seen = set()
+
+    for i, (start, end) in enumerate(matches):
+        name = text[start:end]
+        if name.lower() in seen:
+            continue
+        seen.add(name.lower())
+
+        # attributes come from the text up to the next drug name
+        limit = matches[i + 1][0] if i + 1 < len(matches) else len(text)
+        window = text[end:min(limit, end + ATTRIBUTE_WINDOW)]
+
+        medicines.append({
+            "name": name,
+            "dose": _attr(DOSE_RE, window),
+            "form": _attr(FORM_RE, window),
+            "freq": _attr(FREQ_RE, window),
+            "duration": _attr(DURATION_RE, window)
+        })
+    return medicines
+
+
+def extract(text, doc=None):
+    """
+    Structure a dictated note into diagnosis / symptoms / medicines.
+    `doc` is an optional spaCy Doc for sentence boundaries and the
+    entity-based diagnosis fallback; without it a regex splitter is used.
+    """
+    sentences = _sentence_spans(text, doc)
+    return {
+        "diagnosis": extract_diagnosis(text, doc),
+        "symptoms": extract_symptoms(text, sentences),
+        "medicines": extract_medicines(text)
+    }
+
+
+def extract_iter(text, get_doc=None):
+    """
+    Streaming form of extract(): yields ("diagnosis", str), then
+    ("symptoms", list), then ("medicine", dict) per medicine.
+    get_doc() is only called once the spaCy Doc is needed, so a regex
+    diagnosis goes out before the model has run.
+    """
+    doc = None
+    diagnosis = extract_diagnosis(text)
+    if not diagnosis and get_doc is not None:
+        doc = get_doc()
+        diagnosis = extract_diagnosis(text, doc)
+    yield "diagnosis", diagnosis
+
+    if doc is None and get_doc is not None:
+        doc = get_doc()
+    yield "symptoms", extract_symptoms(text, _sentence_spans(text, doc))
+
+    for medicine in extract_medicines(text):
+        yield "medicine", medicine
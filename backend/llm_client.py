@@ -0,0 +1,316 @@
+import os
+import json
+import time
+import random
+import threading
+
+# install requests: pip install requests (also pulled in by openai)
+import requests
+from requests.adapters import HTTPAdapter
+
+# ----------------------------------------
+# Bounded-latency LLM client
+# ----------------------------------------
+# Every model call has an overall deadline; inside it, attempts are
+# retried on timeouts, connection errors, 429 and 5xx with full-jitter
+# exponential backoff (honouring Retry-After when it fits). A circuit
+# breaker opens after LLM_BREAKER_FAILURES consecutive failed calls and
+# fails fast for LLM_BREAKER_RESET seconds, then lets one trial call
+# through. Callers catch LLMUnavailable and fall back to the local
+# structurer. One requests.Session keeps connections to the API alive.
+#
+# OPENAI_BASE_URL can point at any OpenAI-compatible server, e.g. the
+# mock in benchmarks/llm_mock_server.py.
+
+LLM_BASE_URL = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+LLM_API_KEY = os.environ.get("OPENAI_API_KEY")
+LLM_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+LLM_CONNECT_TIMEOUT = float(os.environ.get("EHR_LLM_CONNECT_TIMEOUT", 3))     # seconds
+LLM_DEADLINE = float(os.environ.get("EHR_LLM_DEADLINE", 20))                  # seconds per call, all attempts
+LLM_MAX_ATTEMPTS = int(os.environ.get("EHR_LLM_MAX_ATTEMPTS", 3))
+LLM_BACKOFF_BASE = float(os.environ.get("EHR_LLM_BACKOFF_BASE", 0.5))         # seconds
+LLM_BACKOFF_MAX = float(os.environ.get("EHR_LLM_BACKOFF_MAX", 4))
+LLM_BREAKER_FAILURES = int(os.environ.get("EHR_LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET = float(os.environ.get("EHR_LLM_BREAKER_RESET", 30))        # seconds
+LLM_POOL_SIZE = int(os.environ.get("EHR_LLM_POOL_SIZE", 10))
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """
+    The API rejected the request (bad key, bad request); not retried.
+    """
+
+
+class LLMUnavailable(LLMError):
+    """
+    No answer within the deadline, or the circuit is open.
+    """
+
+
+# ----------------------------------------
+# Circuit breaker
+# ----------------------------------------
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failures=LLM_BREAKER_FAILURES, reset_after=LLM_BREAKER_RESET):
+        self.failure_threshold = failures
+        self.reset_after = reset_after
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.opened_count = 0
+
+    def allow(self):
+        """
+        True if a call may go out now. In half-open state only one
+        trial call is let through at a time.
+        """
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_after:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN:
+                if self._trial_running:
+                    return False
+                self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened_count += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_after:
+                return self.HALF_OPEN
+            return self._state
+
+
+# ----------------------------------------
+# Client
+# ----------------------------------------
+class LLMClient:
+
+    def __init__(self, base_url=LLM_BASE_URL, api_key=LLM_API_KEY, model=LLM_MODEL,
+                 deadline=LLM_DEADLINE, max_attempts=LLM_MAX_ATTEMPTS, breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LLM_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "succeeded": 0, "failed": 0, "rejected_open": 0,
+                       "attempts": 0, "retries": 0, "total_ms": 0.0}
+
+    @property
+    def configured(self):
+        return bool(self.api_key)
+
+    def _bump(self, **changes):
+        with self._lock:
+            for k, v in changes.items():
+                self._stats[k] += v
+
+    @staticmethod
+    def _backoff(attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+    def _post(self, path, payload, deadline_at, stream=False):
+        """
+        POST with retries until success or the deadline. Returns JSON,
+        or with stream=True the open response (retries stop once the
+        status line has arrived).
+        """
+        last_error = "no attempt made"
+        for attempt in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+
+            self._bump(attempts=1, retries=1 if attempt else 0)
+            retry_after = None
+            try:
+                resp = self.session.post(self.base_url + path, json=payload, stream=stream,
+                                         timeout=(min(LLM_CONNECT_TIMEOUT, remaining), remaining))
+            except requests.RequestException as e:
+                last_error = f"{type(e).__name__}: {e}"
+            else:
+                if resp.status_code < 300:
+                    return resp if stream else resp.json()
+                last_error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+                if resp.status_code not in RETRY_STATUS:
+                    raise LLMError(last_error)
+                try:
+                    retry_after = float(resp.headers.get("Retry-After"))
+                except (TypeError, ValueError):
+                    retry_after = None
+
+            if attempt + 1 < self.max_attempts:
+                pause = self._backoff(attempt, retry_after)
+                if time.monotonic() + pause >= deadline_at:
+                    break
+                time.sleep(pause)
+
+        raise LLMUnavailable(last_error)
+
+    def chat(self, messages, deadline=None, **params):
+        """
+        One chat completion; returns the message content string.
+        Raises LLMUnavailable (deadline / open circuit) or LLMError.
+        """
+        if not self.configured:
+            raise LLMUnavailable("OpenAI API key not set on server")
+
+        self._bump(calls=1)
+        if not self.breaker.allow():
+            self._bump(rejected_open=1)
+            raise LLMUnavailable("LLM circuit open")
+
+        start = time.monotonic()
+        deadline_at = start + (deadline if deadline is not None else self.deadline)
+        try:
+            data = self._post("/chat/completions", {"model": self.model, "messages": messages, **params}, deadline_at)
+            content = data["choices"][0]["message"]["content"]
+        except LLMUnavailable:
+            self.breaker.record_failure()
+            self._bump(failed=1)
+            raise
+        except LLMError:
+            # a rejected request says nothing about upstream health
+            self.breaker.record_success()
+            self._bump(failed=1)
+            raise
+        except (KeyError, IndexError, ValueError) as e:
+            self.breaker.record_success()
+            self._bump(failed=1)
+            raise LLMError(f"Malformed API response: {e}")
+        except Exception as e:
+            self.breaker.record_failure()
+            self._bump(failed=1)
+            raise LLMUnavailable(f"{type(e).__name__}: {e}")
+        finally:
+            self._bump(total_ms=(time.monotonic() - start) * 1000)
+
+        self.breaker.record_success()
+        self._bump(succeeded=1)
+        return content
+
+    def chat_stream(self, messages, deadline=None, **params):
+        """
+        Streaming chat completion: a generator of content deltas as
+        the model produces them. Connection failures are retried like
+        chat(); once tokens are flowing a failure or the deadline ends
+        the stream with LLMUnavailable.
+        """
+        if not self.configured:
+            raise LLMUnavailable("OpenAI API key not set on server")
+
+        self._bump(calls=1)
+        if not self.breaker.allow():
+            self._bump(rejected_open=1)
+            raise LLMUnavailable("LLM circuit open")
+
+        start = time.monotonic()
+        deadline_at = start + (deadline if deadline is not None else self.deadline)
+        resp = None
+        try:
+            resp = self._post("/chat/completions",
+                              {"model": self.model, "messages": messages, "stream": True, **params},
+                              deadline_at, stream=True)
+            for line in resp.iter_lines(decode_unicode=True):
+                if time.monotonic() > deadline_at:
+                    raise LLMUnavailable(f"Stream exceeded the {deadline or self.deadline}s deadline")
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+        except LLMUnavailable:
+            self.breaker.record_failure()
+            self._bump(failed=1)
+            raise
+        except LLMError:
+            self.breaker.record_success()
+            self._bump(failed=1)
+            raise
+        except (KeyError, IndexError, ValueError) as e:
+            self.breaker.record_success()
+            self._bump(failed=1)
+            raise LLMError(f"Malformed API response: {e}")
+        except GeneratorExit:
+            # the consumer went away; the upstream was fine
+            self.breaker.record_success()
+            self._bump(succeeded=1)
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            self._bump(failed=1)
+            raise LLMUnavailable(f"{type(e).__name__}: {e}")
+        else:
+            self.breaker.record_success()
+            self._bump(succeeded=1)
+        finally:
+            if resp is not None:
+                resp.close()
+            self._bump(total_ms=(time.monotonic() - start) * 1000)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        data["avg_ms"] = round(data["total_ms"] / data["calls"], 1) if data["calls"] else 0.0
+        data["total_ms"] = round(data["total_ms"], 1)
+        data["circuit"] = self.breaker.state
+        data["circuit_opened"] = self.breaker.opened_count
+        data["model"] = self.model
+        data["base_url"] = self.base_url
+        return data
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = LLMClient()
+    return _client
+
+
+def stats():
+    return get_client().stats()
@@ -0,0 +1,282 @@
+import sys
+
+from mysql.connector import Error
+
+import database
+from utils.counters import RECENT_PATIENTS_SQL
+
+# ----------------------------------------
+# Versioned schema migrations
+# ----------------------------------------
+# Each migration runs once, in version order, and is recorded in
+# schema_version. Steps are idempotent (they check information_schema
+# first) so a half-applied migration can simply be re-run. A step whose
+# table does not exist yet blocks its migration: the version is not
+# recorded and later ones wait, so the next run picks it up. Tables the
+# app does not create itself (audit_logs) are optional: their migration
+# is skipped unrecorded without holding up the others, and runs once
+# the table exists.
+#
+#   flask db-migrate        apply pending migrations (exit 1 if blocked)
+#   flask db-explain        EXPLAIN the hot queries, fail on full scans
+
+SCHEMA_VERSION_SQL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INT PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+MIGRATE_LOCK = "ehr_schema_migrate"
+
+
+class MigrationBlocked(RuntimeError):
+
+    def __init__(self, message, optional=False):
+        super().__init__(message)
+        self.optional = optional
+
+
+def _table_exists(cursor, table):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return cursor.fetchone() is not None
+
+
+def _index_exists(cursor, table, name):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (table, name))
+    return cursor.fetchone() is not None
+
+
+def add_index(table, name, columns, optional=False):
+    def step(cursor):
+        if not _table_exists(cursor, table):
+            raise MigrationBlocked(f"table {table} does not exist", optional)
+        if _index_exists(cursor, table, name):
+            return
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+    step.__doc__ = f"index {name} on {table}({', '.join(columns)})"
+    return step
+
+
+def _column_nullable(cursor, table, column):
+    cursor.execute("""
+        SELECT IS_NULLABLE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    row = cursor.fetchone()
+    return row is not None and (row["IS_NULLABLE"] if isinstance(row, dict) else row[0]) == "YES"
+
+
+def set_not_null(table, column, definition, fill):
+    """
+    Backfill NULLs in table.column with `fill` (SQL), then redeclare the
+    column as `definition` (which must include NOT NULL).
+    """
+    def step(cursor):
+        if not _table_exists(cursor, table):
+            raise MigrationBlocked(f"table {table} does not exist")
+        if not _column_nullable(cursor, table, column):
+            return
+        cursor.execute(f"UPDATE {table} SET {column} = {fill} WHERE {column} IS NULL")
+        cursor.execute(f"ALTER TABLE {table} MODIFY {column} {definition}")
+    step.__doc__ = f"{table}.{column} NOT NULL"
+    return step
+
+
+# (version, description, steps) - append only, never renumber
+MIGRATIONS = [
+    (1, "Covering indexes for patient detail, dashboard and export queries", [
+        add_index("prescriptions", "idx_prescriptions_patient_created", ["patient_id", "created_at"]),
+        add_index("prescriptions", "idx_prescriptions_doctor_created", ["doctor_id", "created_at"]),
+        add_index("lab_reports", "idx_lab_reports_patient_uploaded", ["patient_id", "upload_date"]),
+        add_index("lab_reports", "idx_lab_reports_doctor_uploaded", ["doctor_id", "upload_date"]),
+        add_index("patients", "idx_patients_doctor_created", ["doctor_id", "created_at"]),
+        add_index("ai_logs", "idx_ai_logs_doctor_created", ["doctor_id", "created_at"]),
+    ]),
+    (2, "Timestamp indexes for activity logs", [
+        add_index("activity_logs", "idx_activity_logs_timestamp", ["timestamp"]),
+        add_index("activity_logs", "idx_activity_logs_user_timestamp", ["user_id", "timestamp"]),
+    ]),
+    (3, "Sort indexes for keyset-paginated admin lists", [
+        add_index("patients", "idx_patients_created", ["created_at"]),
+        add_index("patients", "idx_patients_first_name", ["first_name"]),
+        add_index("doctors", "idx_doctors_created", ["created_at"]),
+        add_index("doctors", "idx_doctors_name", ["name"]),
+    ]),
+    # audit_logs is not created by create_tables()
+    (4, "Timestamp and list indexes for audit logs", [
+        add_index("audit_logs", "idx_audit_logs_timestamp", ["timestamp"], optional=True),
+        add_index("audit_logs", "idx_audit_logs_user_timestamp", ["user_id", "timestamp"], optional=True),
+        add_index("audit_logs", "idx_audit_logs_role_timestamp", ["role", "timestamp"], optional=True),
+    ]),
+    # keyset pagination sorts on these; rows without a date sort as oldest
+    (5, "NOT NULL created_at on patients and doctors", [
+        set_not_null("patients", "created_at", "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP", "'1970-01-01 00:00:01'"),
+        set_not_null("doctors", "created_at", "TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP", "'1970-01-01 00:00:01'"),
+    ]),
+]
+
+
+def applied_versions(cursor):
+    cursor.execute(SCHEMA_VERSION_SQL)
+    cursor.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(strict=False):
+    """
+    Apply every pending migration. Returns the list of versions applied.
+    A named MySQL lock keeps two app processes from migrating at once.
+    A blocked migration stops the run unrecorded; strict=True raises
+    MigrationBlocked, otherwise a warning is printed. Migrations on a
+    missing optional table are skipped (unrecorded) in both modes.
+    """
+    conn = database.connect_db()
+    cursor = conn.cursor()
+    applied = []
+
+    cursor.execute("SELECT GET_LOCK(%s, 30)", (MIGRATE_LOCK,))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        conn.close()
+        raise RuntimeError("Another process is running migrations")
+
+    try:
+        done = applied_versions(cursor)
+        for number, description, steps in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if number in done:
+                continue
+
+            try:
+                for step in steps:
+                    step(cursor)
+            except MigrationBlocked as e:
+                if e.optional:
+                    print(f"⏭️ Skipped migration {number} ({description}): {e}")
+                    continue
+                message = f"Migration {number} ({description}) is blocked: {e}"
+                if strict:
+                    raise MigrationBlocked(message) from None
+                print(f"⚠️ {message}; it stays pending")
+                break
+            cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                           (number, description))
+            conn.commit()
+            applied.append(number)
+            print(f"✅ Applied migration {number}: {description}")
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATE_LOCK,))
+        cursor.fetchone()
+        cursor.close()
+        conn.close()
+
+    return applied
+
+
+# ----------------------------------------
+# EXPLAIN check for the hot queries
+# ----------------------------------------
+# (name, SQL, sample params[, optional table]). A query fails the check
+# when any plan row is a full table scan (type ALL), or when it cannot be
+# EXPLAINed at all (e.g. its table is missing). A query on an optional
+# table that does not exist is reported as skipped.
+HOT_QUERIES = [
+    ("patient prescriptions", """
+        SELECT p.*, d.name AS doctor_name FROM prescriptions p
+        JOIN doctors d ON p.doctor_id = d.doctor_id
+        WHERE p.patient_id=%s ORDER BY p.created_at DESC
+    """, (1,)),
+    ("patient lab reports", """
+        SELECT r.*, d.name AS doctor_name FROM lab_reports r
+        JOIN doctors d ON r.doctor_id = d.doctor_id
+        WHERE r.patient_id=%s ORDER BY r.upload_date DESC
+    """, (1,)),
+    ("doctor patients", "SELECT * FROM patients WHERE doctor_id=%s ORDER BY created_at DESC", (1,)),
+    ("patient login", "SELECT * FROM patients WHERE username=%s", ("x",)),
+    ("doctor login", "SELECT * FROM doctors WHERE email=%s", ("x",)),
+    ("dashboard counters", "SELECT name, value FROM dashboard_counters WHERE scope=%s AND scope_id=%s", ("doctor", 1)),
+    ("recent patients", RECENT_PATIENTS_SQL, {"did": 1, "limit": 8}),
+    ("recent activity", "SELECT * FROM activity_logs ORDER BY timestamp DESC LIMIT 5", ()),
+    ("recent audit log", "SELECT * FROM audit_logs ORDER BY timestamp DESC LIMIT 5", (), "audit_logs"),
+    ("admin patient list page", """
+        SELECT p.patient_id, p.created_at FROM patients p
+        WHERE (p.created_at < %s OR (p.created_at = %s AND p.patient_id < %s))
+        ORDER BY p.created_at DESC, p.patient_id DESC LIMIT 51
+    """, ("2030-01-01", "2030-01-01", 1)),
+]
+
+
+def explain_hot_queries():
+    """
+    EXPLAIN each hot query. Returns (ok, report) where report has one
+    entry per query with its plan rows and any full-scan problems.
+    """
+    conn = database.connect_db()
+    cursor = conn.cursor(dictionary=True)
+    report = []
+    ok = True
+
+    for name, sql, params, *optional in HOT_QUERIES:
+        if optional and not _table_exists(cursor, optional[0]):
+            report.append({"query": name, "skipped": f"table {optional[0]} does not exist", "problems": []})
+            continue
+        try:
+            cursor.execute("EXPLAIN " + sql, params)
+            plan = cursor.fetchall()
+        except Error as e:
+            ok = False
+            report.append({"query": name, "problems": [f"EXPLAIN failed: {e}"]})
+            continue
+
+        problems = []
+        for row in plan:
+            table = row.get("table") or ""
+            if table.startswith("<"):   # derived / union result, already bounded
+                continue
+            rows = row.get("rows") or 0
+            if row.get("type") == "ALL":
+                problems.append(f"full scan of {table} (~{rows} rows)")
+
+        ok = ok and not problems
+        report.append({
+            "query": name,
+            "plan": [{k: row.get(k) for k in ("table", "type", "key", "rows", "Extra")} for row in plan],
+            "problems": problems,
+        })
+
+    cursor.close()
+    conn.close()
+    return ok, report
+
+
+def init_app(app):
+    @app.cli.command("db-migrate")
+    def migrate_command():
+        """Apply pending schema migrations."""
+        try:
+            applied = migrate(strict=True)
+        except MigrationBlocked as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        if not applied:
+            print("✅ Schema is up to date")
+
+    @app.cli.command("db-explain")
+    def explain_command():
+        """EXPLAIN the hot queries and fail on full table scans."""
+        ok, report = explain_hot_queries()
+        for entry in report:
+            status = "SKIP" if "skipped" in entry else ("FAIL" if entry["problems"] else "OK")
+            print(f"[{status}] {entry['query']}")
+            for problem in entry["problems"]:
+                print(f"    ❌ {problem}")
+        if not ok:
+            sys.exit(1)
@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+
+# install spaCy: pip install spacy && python -m spacy download en_core_web_sm
+import spacy
+
+import extraction_engine
+
+NLP_MODEL = os.environ.get("EHR_NLP_MODEL", "en_core_web_sm")
+
+# Batch structuring defaults (nlp.pipe)
+NLP_BATCH_SIZE = int(os.environ.get("EHR_NLP_BATCH_SIZE", 64))
+NLP_MAX_PROCESSES = os.cpu_count() or 1
+
+# The structurer only needs entities and sentence boundaries
+UNUSED_PIPES = ["tagger", "parser", "attribute_ruler", "lemmatizer"]
+
+_nlp = None
+_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "model": NLP_MODEL,
+    "loaded": False,
+    "load_time_ms": 0.0,
+    "calls": 0,
+    "total_time_ms": 0.0,
+    "last_time_ms": 0.0,
+    "batch_calls": 0,
+    "batch_docs": 0,
+    "batch_time_ms": 0.0,
+}
+
+
+# ----------------------------------------
+# Model Loading (once per process)
+# ----------------------------------------
+def get_nlp():
+    global _nlp
+    if _nlp is None:
+        with _lock:
+            if _nlp is None:
+                start = time.perf_counter()
+                nlp = spacy.load(NLP_MODEL, exclude=UNUSED_PIPES)
+
+                # Cheap statistical sentence splitter instead of the parser
+                if "senter" in nlp.disabled:
+                    nlp.enable_pipe("senter")
+                elif "senter" not in nlp.pipe_names and "parser" not in nlp.pipe_names:
+                    nlp.add_pipe("sentencizer")
+
+                _stats["load_time_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                _stats["loaded"] = True
+                _stats["pipeline"] = list(nlp.pipe_names)
+                print(f"✅ Loaded spaCy model {NLP_MODEL} in {_stats['load_time_ms']} ms ({', '.join(nlp.pipe_names)})")
+                _nlp = nlp
+    return _nlp
+
+
+def warm_up():
+    """
+    Load the model and run one tiny document so the first real
+    request does not pay the load or first-call cost.
+    """
+    try:
+        get_nlp()("Patient diagnosed with fever.")
+        return True
+    except Exception as e:
+        print(f"⚠️ NLP warm-up failed: {e}")
+        return False
+
+
+def stats():
+    with _stats_lock:
+        data = dict(_stats)
+    data["avg_time_ms"] = round(data["total_time_ms"] / data["calls"], 3) if data["calls"] else 0.0
+    return data
+
+
+def _record(elapsed_ms):
+    with _stats_lock:
+        _stats["calls"] += 1
+        _stats["total_time_ms"] += elapsed_ms
+        _stats["last_time_ms"] = elapsed_ms
+
+
+# ----------------------------------------
+# Prescription Structuring
+# ----------------------------------------
+def structure_text(text):
+    """
+    Extract diagnosis, symptoms and medicines from a dictated note.
+    Returns a dict with the same keys /doctor/ai/structure sends back,
+    plus elapsed_ms for the NLP work.
+    """
+    start = time.perf_counter()
+    doc = get_nlp()(text)
+
+    result = extraction_engine.extract(text, doc)
+
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+    _record(elapsed_ms)
+
+    result["structured"] = format_structured(result["diagnosis"], result["symptoms"], result["medicines"])
+    result["elapsed_ms"] = elapsed_ms
+    return result
+
+
+def structure_stream(text):
+    """
+    Incremental structure_text(): yields (event, value) pairs -
+    diagnosis, symptoms, one "medicine" per medicine, and finally
+    "done" with the formatted text and elapsed_ms.
+    """
+    start = time.perf_counter()
+    parts = {"diagnosis": "", "symptoms": [], "medicines": []}
+
+    for event, value in extraction_engine.extract_iter(text, lambda: get_nlp()(text)):
+        if event == "medicine":
+            parts["medicines"].append(value)
+        else:
+            parts[event] = value
+        yield event, value
+
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+    _record(elapsed_ms)
+    yield "done", {
+        "structured": format_structured(parts["diagnosis"], parts["symptoms"], parts["medicines"]),
+        "elapsed_ms": elapsed_ms
+    }
+
+
+def structure_many(texts, batch_size=NLP_BATCH_SIZE, n_process=1):
+    """
+    Structure many dictations through nlp.pipe.
+    Yields one result dict per input text, in input order.
+    """
+    texts = [str(t or "").strip() for t in texts]
+    n_process = max(1, min(int(n_process), NLP_MAX_PROCESSES))
+    batch_size = max(1, int(batch_size))
+
+    start = time.perf_counter()
+    docs = get_nlp().pipe(texts, batch_size=batch_size, n_process=n_process)
+
+    for text, doc in zip(texts, docs):
+        result = extraction_engine.extract(text, doc)
+        result["structured"] = format_structured(result["diagnosis"], result["symptoms"], result["medicines"])
+        yield result
+
+    if texts:
+        _record_batch(len(texts), round((time.perf_counter() - start) * 1000, 3))
+
+
+def _record_batch(count, elapsed_ms):
+    with _stats_lock:
+        _stats["batch_calls"] += 1
+        _stats["batch_docs"] += count
+        _stats["batch_time_ms"] += elapsed_ms
+
+
+def format_structured(diagnosis, symptoms, medicines):
+    return f"""
+🩺 Diagnosis:
+{diagnosis or "Not detected"}
+
+🤒 Symptoms:
+{', '.join(symptoms) if symptoms else "Not detected"}
+
+💊 Medicines:
+""" + "\n".join([" ".join(["-", m.get("name", "")] + [m.get(k) or "" for k in ("dose", "form", "freq", "duration")]).strip()
+                  for m in medicines])
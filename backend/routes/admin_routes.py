@@ -1,9 +1,21 @@
-from flask import Blueprint, render_template, request, redirect, flash, session, send_file
+from flask import Blueprint, render_template, request, redirect, flash, session, send_file, send_from_directory, jsonify, Response
 import os
-import json
-from database import connect_db
+from urllib.parse import urlencode
+import nlp_engine
+import transcription_service
+import llm_client
+from database import connect_db, pool_stats
 from encryption import hash_password
-from utils.audit_logger import log_action
+from utils.audit_logger import log_action, audit_stats
+from utils.counters import get_counters
+from utils.patient_records import load_patient_record
+from utils.patient_search import patient_index
+from utils.pagination import keyset_page, page_size
+from utils.export_utils import export_cache
+from utils.jobs import job_queue
+from utils.llm_cache import llm_cache
+from utils import session_store, queries, sql_profiler, request_profiler
+from utils.bulk_export import BulkExport, BulkExportBusy, resolve_patient_ids, get_progress, export_path
 
 admin_bp = Blueprint("admin", __name__, url_prefix="/admin")
 
@@ -15,6 +27,94 @@ def require_admin():
     return "admin" in session and session.get("role") == "admin"
 
 
+# ------------------------------------------------
+# Keyset-paginated admin lists (shared by HTML + JSON)
+# ------------------------------------------------
+PATIENT_LIST_SQL = """
+    SELECT p.patient_id, p.doctor_id, p.first_name, p.last_name, p.gender, p.dob,
+           p.phone, p.email, p.username, p.created_at, d.name AS doctor_name
+    FROM patients p
+    LEFT JOIN doctors d ON p.doctor_id=d.doctor_id
+"""
+
+DOCTOR_LIST_SQL = """
+    SELECT doctor_id, name, email, specialization, phone, address, created_at
+    FROM doctors
+"""
+
+AUDIT_LIST_SQL = "SELECT * FROM audit_logs"
+
+PATIENT_SORTS = {"created_at": "p.created_at", "first_name": "p.first_name", "patient_id": "p.patient_id"}
+DOCTOR_SORTS = {"created_at": "created_at", "name": "name", "doctor_id": "doctor_id"}
+
+
+def _list_args():
+    args = request.args
+    return {
+        "q": (args.get("q") or "").strip(),
+        "sort": args.get("sort") or "",
+        "dir": "asc" if args.get("dir") == "asc" else "desc",
+        "after": args.get("after") or "",
+        "limit": page_size(args.get("limit")),
+    }
+
+
+def _patients_page(cur, opts):
+    where, params = [], []
+    if opts["q"]:
+        where.append("(p.first_name LIKE %s OR p.last_name LIKE %s OR p.username LIKE %s)")
+        params += [opts["q"] + "%"] * 3
+    doctor_id = request.args.get("doctor_id", type=int)
+    if doctor_id:
+        where.append("p.doctor_id=%s")
+        params.append(doctor_id)
+
+    sort_col = PATIENT_SORTS.get(opts["sort"], PATIENT_SORTS["created_at"])
+    return keyset_page(cur, PATIENT_LIST_SQL, sort_col, "p.patient_id", where, params,
+                       opts["after"], opts["dir"] == "desc", opts["limit"])
+
+
+def _doctors_page(cur, opts):
+    where, params = [], []
+    if opts["q"]:
+        where.append("(name LIKE %s OR email LIKE %s)")
+        params += [opts["q"] + "%"] * 2
+    specialization = (request.args.get("specialization") or "").strip()
+    if specialization:
+        where.append("specialization=%s")
+        params.append(specialization)
+
+    sort_col = DOCTOR_SORTS.get(opts["sort"], DOCTOR_SORTS["created_at"])
+    return keyset_page(cur, DOCTOR_LIST_SQL, sort_col, "doctor_id", where, params,
+                       opts["after"], opts["dir"] == "desc", opts["limit"])
+
+
+def _audit_page(cur, opts):
+    where, params = [], []
+    role = (request.args.get("role") or "").strip()
+    if role:
+        where.append("role=%s")
+        params.append(role)
+    user_id = request.args.get("user_id", type=int)
+    if user_id:
+        where.append("user_id=%s")
+        params.append(user_id)
+    if opts["q"]:
+        where.append("action LIKE %s")
+        params.append("%" + opts["q"] + "%")
+
+    return keyset_page(cur, AUDIT_LIST_SQL, "timestamp", "log_id", where, params,
+                       opts["after"], opts["dir"] == "desc", opts["limit"])
+
+
+def _next_url(path, next_cursor):
+    if not next_cursor:
+        return None
+    args = request.args.to_dict()
+    args["after"] = next_cursor
+    return path + "?" + urlencode(args)
+
+
 
 # ------------------------------------------------
 # ADMIN DASHBOARD
@@ -27,37 +127,21 @@ def admin_dashboard():
     conn = connect_db()
     cur = conn.cursor(dictionary=True)
 
-    # Summary numbers
-    cur.execute("SELECT COUNT(*) AS total FROM doctors")
-    total_doctors = cur.fetchone()["total"]
-
-    cur.execute("SELECT COUNT(*) AS total FROM patients")
-    total_patients = cur.fetchone()["total"]
-
-    cur.execute("SELECT COUNT(*) AS total FROM prescriptions")
-    total_prescriptions = cur.fetchone()["total"]
-
-    cur.execute("SELECT COUNT(*) AS total FROM lab_reports")
-    total_reports = cur.fetchone()["total"]
+    # Summary numbers (materialized, see utils/counters.py)
+    counts = get_counters(cur, "global", 0)
 
     # Recent audit logs
-    cur.execute("""
-        SELECT role, user_id, action, timestamp, ip_address
-        FROM audit_logs
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """)
-    recent_logs = cur.fetchall()
+    recent_logs = queries.fetch_all(conn, "admin.recent_audit_logs")
 
     cur.close()
     conn.close()
 
     return render_template(
         "admin/dashboard.html",
-        total_doctors=total_doctors,
-        total_patients=total_patients,
-        total_prescriptions=total_prescriptions,
-        total_reports=total_reports,
+        total_doctors=counts["doctors"],
+        total_patients=counts["patients"],
+        total_prescriptions=counts["prescriptions"],
+        total_reports=counts["lab_reports"],
         recent_logs=recent_logs
     )
 
@@ -82,10 +166,7 @@ def manage_doctors():
 
         hashed = hash_password(password)
 
-        cur.execute("""
-            INSERT INTO doctors (name, email, password, specialization, phone, created_at)
-            VALUES (%s, %s, %s, %s, %s, NOW())
-        """, (name, email, hashed, specialization, phone))
+        queries.execute(conn, "admin.insert_doctor", (name, email, hashed, specialization, phone))
 
         conn.commit()
         log_action("admin", session["admin"]["admin_id"], f"Added doctor: {name}")
@@ -96,14 +177,15 @@ def manage_doctors():
         conn.close()
         return redirect("/admin/manage-doctors")
 
-    # GET doctors list
-    cur.execute("SELECT * FROM doctors ORDER BY created_at DESC")
-    doctors = cur.fetchall()
+    # GET doctors list (one keyset page, no password column)
+    opts = _list_args()
+    doctors, next_cursor = _doctors_page(cur, opts)
 
     cur.close()
     conn.close()
 
-    return render_template("admin/manage-doctors.html", doctors=doctors)
+    return render_template("admin/manage-doctors.html", doctors=doctors, filters=opts,
+                           next_url=_next_url("/admin/manage-doctors", next_cursor))
 
 
 # ------------------------------------------------
@@ -115,7 +197,6 @@ def edit_doctor():
         return redirect("/auth/login")
 
     conn = connect_db()
-    cur = conn.cursor()
 
     doctor_id = request.form.get("doctor_id")
     name = request.form.get("name")
@@ -126,24 +207,16 @@ def edit_doctor():
 
     if password:
         hashed = hash_password(password)
-        cur.execute("""
-            UPDATE doctors
-            SET name=%s, email=%s, specialization=%s, phone=%s, password=%s
-            WHERE doctor_id=%s
-        """, (name, email, specialization, phone, hashed, doctor_id))
+        queries.execute(conn, "admin.update_doctor_with_password",
+                        (name, email, specialization, phone, hashed, doctor_id))
     else:
-        cur.execute("""
-            UPDATE doctors
-            SET name=%s, email=%s, specialization=%s, phone=%s
-            WHERE doctor_id=%s
-        """, (name, email, specialization, phone, doctor_id))
+        queries.execute(conn, "admin.update_doctor", (name, email, specialization, phone, doctor_id))
 
     conn.commit()
 
     log_action("admin", session["admin"]["admin_id"], f"Edited doctor ID {doctor_id}")
     flash("Doctor updated successfully", "success")
 
-    cur.close()
     conn.close()
     return redirect("/admin/manage-doctors")
 
@@ -157,22 +230,19 @@ def delete_doctor(doctor_id):
         return redirect("/auth/login")
 
     conn = connect_db()
-    cur = conn.cursor()
 
-    cur.execute("SELECT name FROM doctors WHERE doctor_id=%s", (doctor_id,))
-    row = cur.fetchone()
+    row = queries.fetch_one(conn, "admin.doctor_name", (doctor_id,))
 
     if not row:
         flash("Doctor not found!", "danger")
         return redirect("/admin/manage-doctors")
 
-    cur.execute("DELETE FROM doctors WHERE doctor_id=%s", (doctor_id,))
+    queries.execute(conn, "admin.delete_doctor", (doctor_id,))
     conn.commit()
 
     log_action("admin", session["admin"]["admin_id"], f"Deleted doctor ID {doctor_id}")
     flash("Doctor removed successfully", "info")
 
-    cur.close()
     conn.close()
     return redirect("/admin/manage-doctors")
 
@@ -196,12 +266,13 @@ def manage_patients():
         phone = request.form.get("phone")
         dob = request.form.get("dob")
 
-        cur.execute("""
-            INSERT INTO patients (doctor_id, first_name, last_name, phone, dob, username, created_at)
-            VALUES (%s, %s, %s, %s, %s, %s, NOW())
-        """, (doctor_id, first, last, phone, dob, username))
+        result = queries.execute(conn, "admin.insert_patient", (doctor_id, first, last, phone, dob, username))
 
         conn.commit()
+        patient_index.upsert({
+            "patient_id": result.lastrowid, "doctor_id": int(doctor_id) if doctor_id else None,
+            "first_name": first, "last_name": last, "username": username, "phone": phone
+        })
 
         log_action("admin", session["admin"]["admin_id"], f"Added patient username: {username}")
         flash("Patient added successfully", "success")
@@ -210,23 +281,18 @@ def manage_patients():
         conn.close()
         return redirect("/admin/manage-patients")
 
-    # GET patient list
-    cur.execute("""
-        SELECT p.*, d.name AS doctor_name
-        FROM patients p
-        LEFT JOIN doctors d ON p.doctor_id=d.doctor_id
-        ORDER BY p.created_at DESC
-    """)
-    patients = cur.fetchall()
+    # GET patient list (one keyset page)
+    opts = _list_args()
+    patients, next_cursor = _patients_page(cur, opts)
 
     # doctor dropdown list
-    cur.execute("SELECT doctor_id, name FROM doctors ORDER BY name")
-    doctors = cur.fetchall()
+    doctors = queries.fetch_all(conn, "admin.doctor_choices")
 
     cur.close()
     conn.close()
 
-    return render_template("admin/manage-patients.html", patients=patients, doctors=doctors)
+    return render_template("admin/manage-patients.html", patients=patients, doctors=doctors, filters=opts,
+                           next_url=_next_url("/admin/manage-patients", next_cursor))
 
 
 # ------------------------------------------------
@@ -238,7 +304,6 @@ def edit_patient():
         return redirect("/auth/login")
 
     conn = connect_db()
-    cur = conn.cursor()
 
     patient_id = request.form.get("patient_id")
     first = request.form.get("first_name")
@@ -248,18 +313,17 @@ def edit_patient():
     dob = request.form.get("dob")
     doctor_id = request.form.get("doctor_id")
 
-    cur.execute("""
-        UPDATE patients
-        SET first_name=%s, last_name=%s, username=%s, phone=%s, dob=%s, doctor_id=%s
-        WHERE patient_id=%s
-    """, (first, last, username, phone, dob, doctor_id, patient_id))
+    queries.execute(conn, "admin.update_patient", (first, last, username, phone, dob, doctor_id, patient_id))
 
     conn.commit()
+    patient_index.upsert({
+        "patient_id": int(patient_id), "doctor_id": int(doctor_id) if doctor_id else None,
+        "first_name": first, "last_name": last, "username": username, "phone": phone
+    })
 
     log_action("admin", session["admin"]["admin_id"], f"Edited patient ID {patient_id}")
     flash("Patient updated successfully", "success")
 
-    cur.close()
     conn.close()
     return redirect("/admin/manage-patients")
 
@@ -273,20 +337,18 @@ def delete_patient(patient_id):
         return redirect("/auth/login")
 
     conn = connect_db()
-    cur = conn.cursor()
 
-    cur.execute("SELECT username FROM patients WHERE patient_id=%s", (patient_id,))
-    if not cur.fetchone():
+    if not queries.fetch_one(conn, "admin.patient_username", (patient_id,)):
         flash("Patient not found!", "danger")
         return redirect("/admin/manage-patients")
 
-    cur.execute("DELETE FROM patients WHERE patient_id=%s", (patient_id,))
+    queries.execute(conn, "admin.delete_patient", (patient_id,))
     conn.commit()
+    patient_index.remove(patient_id)
 
     log_action("admin", session["admin"]["admin_id"], f"Deleted patient ID {patient_id}")
     flash("Patient removed successfully", "info")
 
-    cur.close()
     conn.close()
     return redirect("/admin/manage-patients")
 
@@ -302,67 +364,19 @@ def admin_patient_details(patient_id):
     db = connect_db()
     cur = db.cursor(dictionary=True)
 
-    # BASIC PATIENT INFO
-    cur.execute("""
-        SELECT p.*, d.name AS doctor_name
-        FROM patients p
-        LEFT JOIN doctors d ON p.doctor_id=d.doctor_id
-        WHERE p.patient_id=%s
-    """, (patient_id,))
-    patient = cur.fetchone()
+    # PATIENT, PRESCRIPTIONS, LAB REPORTS + SUMMARY (one round trip)
+    record = load_patient_record(cur, patient_id)
 
-    if not patient:
+    if not record:
         db.close()
         return "Patient not found", 404
 
-    # PRESCRIPTIONS
-    cur.execute("""
-        SELECT p.*, d.name AS doctor_name
-        FROM prescriptions p
-        JOIN doctors d ON p.doctor_id=d.doctor_id
-        WHERE p.patient_id=%s
-        ORDER BY p.created_at DESC
-    """, (patient_id,))
-    prescriptions = cur.fetchall()
-
-    for pres in prescriptions:
-        meds = pres.get("medicines")
-        pres["medicines"] = json.loads(meds) if meds else []
-
-    # LAB REPORTS
-    cur.execute("""
-        SELECT r.*, d.name AS doctor_name
-        FROM lab_reports r
-        JOIN doctors d ON r.doctor_id=d.doctor_id
-        WHERE r.patient_id=%s
-        ORDER BY r.upload_date DESC
-    """, (patient_id,))
-    reports = cur.fetchall()
-
-    # SUMMARY COUNTS
-    cur.execute("SELECT COUNT(*) AS total FROM prescriptions WHERE patient_id=%s", (patient_id,))
-    patient["total_prescriptions"] = cur.fetchone()["total"]
-
-    cur.execute("SELECT COUNT(*) AS total FROM lab_reports WHERE patient_id=%s", (patient_id,))
-    patient["total_reports"] = cur.fetchone()["total"]
-
-    cur.execute("""
-        SELECT created_at 
-        FROM prescriptions 
-        WHERE patient_id=%s 
-        ORDER BY created_at DESC LIMIT 1
-    """, (patient_id,))
-    row = cur.fetchone()
-    patient["last_visit"] = row["created_at"] if row else "-"
+    patient = record["patient"]
+    prescriptions = record["prescriptions"]
+    reports = record["reports"]
 
     # PATIENT AUDIT LOG
-    cur.execute("""
-        SELECT *
-        FROM audit_logs
-        WHERE action LIKE %s OR user_id=%s
-        ORDER BY timestamp DESC
-    """, (f"%patient ID {patient_id}%", patient_id))
-    patient_audit = cur.fetchall()
+    patient_audit = queries.fetch_all(db, "admin.patient_audit", (f"%patient ID {patient_id}%", patient_id))
 
     cur.close()
     db.close()
@@ -387,9 +401,300 @@ def admin_audit_log():
     conn = connect_db()
     cur = conn.cursor(dictionary=True)
 
-    cur.execute("SELECT * FROM audit_logs ORDER BY timestamp DESC LIMIT 500")
-    logs = cur.fetchall()
+    opts = _list_args()
+    logs, next_cursor = _audit_page(cur, opts)
 
     cur.close()
     conn.close()
-    return render_template("admin/audit-log.html", logs=logs)
+    return render_template("admin/audit-log.html", logs=logs, filters=opts,
+                           next_url=_next_url("/admin/audit-log", next_cursor))
+
+
+# ------------------------------------------------
+# JSON LIST API (same filters / cursors as the pages)
+# ------------------------------------------------
+@admin_bp.route("/api/<string:kind>")
+def admin_list_api(kind):
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    pages = {"patients": _patients_page, "doctors": _doctors_page, "audit-log": _audit_page}
+    if kind not in pages:
+        return jsonify({"status": "error", "message": "Unknown list"}), 404
+
+    conn = connect_db()
+    cur = conn.cursor(dictionary=True)
+
+    try:
+        rows, next_cursor = pages[kind](cur, _list_args())
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    finally:
+        cur.close()
+        conn.close()
+
+    return jsonify({"status": "success", "data": rows, "next_cursor": next_cursor})
+
+
+# ------------------------------------------------
+# DB POOL STATISTICS (JSON)
+# ------------------------------------------------
+@admin_bp.route("/db-pool")
+def admin_db_pool():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "data": pool_stats()})
+
+
+# ------------------------------------------------
+# NLP ENGINE STATISTICS (JSON)
+# ------------------------------------------------
+@admin_bp.route("/nlp-stats")
+def admin_nlp_stats():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "data": nlp_engine.stats()})
+
+
+# ------------------------------------------------
+# AUDIT WRITER STATISTICS (JSON)
+# ------------------------------------------------
+@admin_bp.route("/audit-stats")
+def admin_audit_stats():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "data": audit_stats()})
+
+
+# ------------------------------------------------
+# EXPORT CACHE STATISTICS (JSON)
+# ------------------------------------------------
+@admin_bp.route("/export-cache")
+def admin_export_cache():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "data": export_cache.stats()})
+
+
+# ------------------------------------------------
+# TRANSCRIPTION SERVICE STATISTICS (JSON)
+# ------------------------------------------------
+@admin_bp.route("/transcription-stats")
+def admin_transcription_stats():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "data": transcription_service.stats()})
+
+
+# ------------------------------------------------
+# LLM RESULT CACHE STATISTICS (JSON)
+# ------------------------------------------------
+@admin_bp.route("/llm-cache")
+def admin_llm_cache():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "data": llm_cache.stats()})
+
+
+# ------------------------------------------------
+# LLM CLIENT STATISTICS (JSON)
+# ------------------------------------------------
+@admin_bp.route("/llm-stats")
+def admin_llm_stats():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "data": llm_client.stats()})
+
+
+# ------------------------------------------------
+# SQL PERFORMANCE (worst routes / statements, N+1, slow log)
+# ------------------------------------------------
+@admin_bp.route("/perf")
+def admin_perf():
+    if not require_admin():
+        return redirect("/auth/login")
+
+    perf = sql_profiler.report(limit=request.args.get("limit", 20, type=int))
+
+    if request.args.get("format") == "json":
+        return jsonify({"status": "success", "data": perf})
+
+    return render_template("admin/perf.html", perf=perf)
+
+
+@admin_bp.route("/perf/reset", methods=["POST"])
+def admin_perf_reset():
+    if not require_admin():
+        return redirect("/auth/login")
+
+    sql_profiler.reset()
+    flash("Performance counters reset", "info")
+    return redirect("/admin/perf")
+
+
+# ------------------------------------------------
+# REQUEST PROFILER (opt-in, per route pattern)
+# ------------------------------------------------
+@admin_bp.route("/profiler", methods=["GET", "POST"])
+def admin_profiler():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    if request.method == "GET":
+        return jsonify({"status": "success", "data": request_profiler.status()})
+
+    data = request.get_json(silent=True) or request.form
+
+    def number(key, cast, default):
+        # only a missing/blank field means "default"; 0 goes to start() to be rejected
+        value = data.get(key)
+        return cast(value) if value not in (None, "") else default
+
+    try:
+        status = request_profiler.start(
+            (data.get("pattern") or "").strip(),
+            rate=number("rate", float, 1.0),
+            mode=data.get("mode") or "cprofile",
+            max_profiles=number("max_profiles", int, request_profiler.PROFILE_MAX),
+            duration=number("duration", float, request_profiler.PROFILE_DURATION),
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    log_action("admin", session["admin"]["admin_id"], f"Started request profiler for {status['config']['pattern']}")
+    return jsonify({"status": "success", "data": status})
+
+
+@admin_bp.route("/profiler/stop", methods=["POST"])
+def admin_profiler_stop():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "data": request_profiler.stop()})
+
+
+@admin_bp.route("/profiler/files/<path:filename>")
+def admin_profiler_file(filename):
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return send_from_directory(request_profiler.PROFILE_DIR, filename, as_attachment=True)
+
+
+# ------------------------------------------------
+# NAMED STATEMENT STATISTICS (JSON)
+# ------------------------------------------------
+@admin_bp.route("/query-stats")
+def admin_query_stats():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "data": queries.stats()})
+
+
+# ------------------------------------------------
+# SERVER-SIDE SESSION STORE STATISTICS (JSON)
+# ------------------------------------------------
+@admin_bp.route("/session-stats")
+def admin_session_stats():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "data": session_store.stats()})
+
+
+# ------------------------------------------------
+# BACKGROUND JOB QUEUE STATISTICS (JSON)
+# ------------------------------------------------
+@admin_bp.route("/job-stats")
+def admin_job_stats():
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    return jsonify({"status": "success", "data": job_queue.stats()})
+
+
+# ------------------------------------------------
+# BULK EXPORT (many patients -> one ZIP)
+# ------------------------------------------------
+@admin_bp.route("/bulk-export", methods=["GET", "POST"])
+def admin_bulk_export():
+    """
+    doctor_id=<id> | patient_ids=1,2,3 | all=1
+    target=file writes the ZIP in the background and returns the export
+    id to poll; otherwise the ZIP is streamed as patients finish.
+    """
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    try:
+        doctor_id = request.values.get("doctor_id", type=int)
+        ids = [int(p) for p in request.values.get("patient_ids", "").split(",") if p.strip()]
+    except ValueError:
+        return jsonify({"status": "error", "message": "patient_ids must be numbers"}), 400
+    everyone = request.values.get("all") == "1"
+
+    conn = connect_db()
+    cur = conn.cursor(dictionary=True)
+    patient_ids = resolve_patient_ids(cur, doctor_id, ids, everyone)
+    cur.close()
+    conn.close()
+
+    if not patient_ids:
+        return jsonify({"status": "error", "message": "No patients selected"}), 400
+
+    label = f"doctor_{doctor_id}" if doctor_id is not None else ("all" if everyone and not ids else "patients")
+    try:
+        export = BulkExport(patient_ids, label=label)
+    except BulkExportBusy as e:
+        return jsonify({"status": "error", "message": str(e)}), 429
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    log_action("admin", session["admin"]["admin_id"], f"Bulk export {export.id} ({label}, {len(patient_ids)} patients)")
+
+    if request.values.get("target") == "file":
+        export.write_in_background()
+        return jsonify({"status": "success", "data": export.progress,
+                        "progress_url": f"/admin/bulk-export/{export.id}"}), 202
+
+    response = Response(export.stream(), mimetype="application/zip", headers={
+        "Content-Disposition": f'attachment; filename="bulk_{label}_{export.id}.zip"',
+        "X-Export-Id": export.id,
+        "X-Accel-Buffering": "no",
+    })
+    response.call_on_close(export.release)
+    return response
+
+
+@admin_bp.route("/bulk-export/<string:export_id>")
+def admin_bulk_export_progress(export_id):
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    progress = get_progress(export_id)
+    if progress is None:
+        return jsonify({"status": "error", "message": "Unknown export"}), 404
+    if progress.get("file"):
+        progress["download"] = f"/admin/bulk-export/{export_id}/download"
+    return jsonify({"status": "success", "data": progress})
+
+
+@admin_bp.route("/bulk-export/<string:export_id>/download")
+def admin_bulk_export_download(export_id):
+    if not require_admin():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    path = export_path(export_id)
+    if path is None:
+        return jsonify({"status": "error", "message": "Unknown or unfinished export"}), 404
+
+    log_action("admin", session["admin"]["admin_id"], f"Downloaded bulk export {export_id}")
+    return send_file(path, as_attachment=True, download_name=os.path.basename(path))
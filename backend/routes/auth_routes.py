@@ -1,10 +1,18 @@
 from flask import Blueprint, render_template, request, redirect, flash, session
 from database import connect_db
 from utils.audit_logger import log_action
+from utils import queries
 
 auth_bp = Blueprint("auth", __name__)
 
 
+def session_row(row):
+    """
+    The account row as kept in the session: everything but the password.
+    """
+    return {k: v for k, v in row.items() if k != "password"}
+
+
 # ------------------------------
 # LOGIN PAGE (GET)
 # ------------------------------
@@ -24,21 +32,20 @@ def login_post():
     password = request.form.get("password")
 
     conn = connect_db()
-    cur = conn.cursor(dictionary=True)
 
     # ------------------------------
     # ADMIN LOGIN (Plain Text)
     # ------------------------------
     if role == "admin":
-        cur.execute("SELECT * FROM admins WHERE email=%s", (identifier,))
-        admin = cur.fetchone()
+        admin = queries.fetch_one(conn, "auth.admin_by_email", (identifier,))
 
         if not admin or admin["password"] != password:
             flash("Invalid admin login", "danger")
             return redirect("/auth/login")
 
+        session.regenerate()
         session["role"] = "admin"
-        session["admin"] = admin
+        session["admin"] = session_row(admin)
         log_action("admin", admin["admin_id"], "Logged in")
         return redirect("/admin/dashboard")
 
@@ -46,15 +53,15 @@ def login_post():
     # DOCTOR LOGIN (Plain Text)
     # ------------------------------
     elif role == "doctor":
-        cur.execute("SELECT * FROM doctors WHERE email=%s", (identifier,))
-        doctor = cur.fetchone()
+        doctor = queries.fetch_one(conn, "auth.doctor_by_email", (identifier,))
 
         if not doctor or doctor["password"] != password:
             flash("Invalid doctor login", "danger")
             return redirect("/auth/login")
 
+        session.regenerate()
         session["role"] = "doctor"
-        session["doctor"] = doctor
+        session["doctor"] = session_row(doctor)
         log_action("doctor", doctor["doctor_id"], "Logged in")
         return redirect("/doctor/dashboard")
 
@@ -62,15 +69,15 @@ def login_post():
     # PATIENT LOGIN (Plain Text)
     # ------------------------------
     elif role == "patient":
-        cur.execute("SELECT * FROM patients WHERE username=%s", (identifier,))
-        patient = cur.fetchone()
+        patient = queries.fetch_one(conn, "auth.patient_by_username", (identifier,))
 
         if not patient or patient["password"] != password:
             flash("Invalid patient login", "danger")
             return redirect("/auth/login")
 
+        session.regenerate()
         session["role"] = "patient"
-        session["patient"] = patient
+        session["patient"] = session_row(patient)
         log_action("patient", patient["patient_id"], "Logged in")
         return redirect("/patient/dashboard")
 
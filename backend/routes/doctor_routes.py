@@ -1,10 +1,19 @@
-from flask import Blueprint, request, jsonify, send_file, session, render_template, redirect, abort
+from flask import Blueprint, request, jsonify, send_file, session, render_template, redirect, abort, Response, stream_with_context
 import os
 import json
+import time
 from datetime import datetime
 
+import nlp_engine
+import transcription_service
 from utils.audit_logger import log_action
+from utils.counters import get_counters, recent_patients, DOCTOR_COUNTERS
+from utils.patient_records import load_patient_record
+from utils.patient_search import patient_index, SEARCH_LIMIT
+from utils.csv_stream import load_csv_patient, stream_patient_csv, stream_panel_csv, csv_response_headers
+from utils.sse import sse_event, SSE_HEADERS
 from database import connect_db
+from utils import queries
 from utils.export_utils import (
     export_patient_csv,
     generate_patient_pdf,
@@ -60,11 +69,9 @@ def add_prescription():
                         "message": "Missing patient_id, diagnosis or prescription_text"}), 400
 
     db = connect_db()
-    cur = db.cursor(dictionary=True)
 
     try:
-        cur.execute("SELECT patient_id, doctor_id FROM patients WHERE patient_id=%s", (patient_id,))
-        patient = cur.fetchone()
+        patient = queries.fetch_one(db, "doctor.patient_owner", (patient_id,))
 
         if not patient:
             return jsonify({"status": "error", "message": "Patient not found"}), 404
@@ -74,14 +81,11 @@ def add_prescription():
 
         meds_json = json.dumps(medicines, ensure_ascii=False) if medicines else None
 
-        cur.execute("""
-            INSERT INTO prescriptions
-                (doctor_id, patient_id, diagnosis, prescription_text, medicines, created_at)
-            VALUES (%s, %s, %s, %s, %s, NOW())
-        """, (doctor["doctor_id"], patient_id, diagnosis, prescription_text, meds_json))
+        result = queries.execute(db, "doctor.insert_prescription",
+                                 (doctor["doctor_id"], patient_id, diagnosis, prescription_text, meds_json))
 
         db.commit()
-        pres_id = cur.lastrowid
+        pres_id = result.lastrowid
 
         log_action("doctor", doctor["doctor_id"], f"Added prescription ID {pres_id}")
 
@@ -92,7 +96,6 @@ def add_prescription():
         return jsonify({"status": "error", "message": str(e)}), 500
 
     finally:
-        cur.close()
         db.close()
 
 
@@ -117,19 +120,14 @@ def upload_report():
     file.save(filepath)
 
     db = connect_db()
-    cur = db.cursor(dictionary=True)
 
-    cur.execute("""
-        INSERT INTO lab_reports (doctor_id, patient_id, report_name, report_file, upload_date)
-        VALUES (%s, %s, %s, %s, NOW())
-    """, (doctor["doctor_id"], patient_id, report_name, filename))
+    result = queries.execute(db, "doctor.insert_report", (doctor["doctor_id"], patient_id, report_name, filename))
 
     db.commit()
-    report_id = cur.lastrowid
+    report_id = result.lastrowid
 
     log_action("doctor", doctor["doctor_id"], f"Uploaded report ID {report_id}")
 
-    cur.close()
     db.close()
 
     return jsonify({
@@ -149,17 +147,8 @@ def get_prescriptions(pid):
         return jsonify({"status": "error"}), 401
 
     db = connect_db()
-    cur = db.cursor(dictionary=True)
-
-    cur.execute("""
-        SELECT p.*, d.name AS doctor_name
-        FROM prescriptions p
-        JOIN doctors d ON p.doctor_id = d.doctor_id
-        WHERE p.patient_id=%s
-        ORDER BY p.created_at DESC
-    """, (pid,))
 
-    rows = cur.fetchall()
+    rows = queries.fetch_all(db, "doctor.patient_prescriptions", (pid,))
 
     for r in rows:
         try:
@@ -167,12 +156,34 @@ def get_prescriptions(pid):
         except:
             r["medicines"] = []
 
-    cur.close()
     db.close()
 
     return jsonify({"status": "success", "data": rows})
 
 
+# ========================================================================
+#                  PATIENT TYPEAHEAD (in-memory index)
+# ========================================================================
+@doctor_bp.route("/search-patients")
+def search_patients():
+    doctor = get_current_doctor()
+    if not doctor:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    q = (request.args.get("q") or "").strip()
+    limit = request.args.get("limit", SEARCH_LIMIT, type=int)
+
+    if not q:
+        return jsonify({"status": "success", "data": []})
+
+    try:
+        results = patient_index.search(doctor["doctor_id"], q, limit)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    return jsonify({"status": "success", "data": results})
+
+
 # ========================================================================
 #             EXPORT FULL PATIENT PDF (Reports + Prescriptions)
 # ========================================================================
@@ -185,30 +196,14 @@ def export_pdf(pid):
     db = connect_db()
     cur = db.cursor(dictionary=True)
 
-    cur.execute("SELECT * FROM patients WHERE patient_id=%s", (pid,))
-    patient = cur.fetchone()
+    record = load_patient_record(cur, pid)
 
-    if not patient:
+    if not record:
         return abort(404)
 
-    cur.execute("""
-        SELECT p.*, d.name AS doctor_name
-        FROM prescriptions p
-        JOIN doctors d ON p.doctor_id=d.doctor_id
-        WHERE p.patient_id=%s
-    """, (pid,))
-    prescriptions = cur.fetchall()
-
-    for p in prescriptions:
-        p["medicines"] = json.loads(p["medicines"]) if p["medicines"] else []
-
-    cur.execute("""
-        SELECT r.*, d.name AS doctor_name
-        FROM lab_reports r
-        JOIN doctors d ON r.doctor_id=d.doctor_id
-        WHERE r.patient_id=%s
-    """, (pid,))
-    reports = cur.fetchall()
+    patient = record["patient"]
+    prescriptions = record["prescriptions"]
+    reports = record["reports"]
 
     filepath = generate_patient_pdf(patient, prescriptions, reports)
 
@@ -218,22 +213,63 @@ def export_pdf(pid):
     return send_file(filepath, as_attachment=True)
 
 
+# ========================================================================
+#             STREAMING CSV EXPORT (one patient / whole panel)
+# ========================================================================
+@doctor_bp.route("/export-csv/<int:pid>")
+def export_csv(pid):
+    doctor = get_current_doctor()
+    if not doctor:
+        return redirect("/auth/login")
+
+    db = connect_db()
+    try:
+        owner = queries.fetch_one(db, "doctor.patient_owner", (pid,))
+        if not owner:
+            return abort(404)
+        if owner["doctor_id"] != doctor["doctor_id"]:
+            return jsonify({"status": "error", "message": "This is not your patient"}), 403
+
+        cur = db.cursor(dictionary=True)
+        header = load_csv_patient(cur, pid)
+        cur.close()
+    finally:
+        db.close()
+
+    if not header:
+        return abort(404)
+
+    log_action("doctor", doctor["doctor_id"], f"Exported CSV for patient {pid}")
+    return Response(
+        stream_patient_csv(header),
+        mimetype="text/csv",
+        headers=csv_response_headers(f"patient_{pid}.csv")
+    )
+
+
+@doctor_bp.route("/export-panel-csv")
+def export_panel_csv():
+    doctor = get_current_doctor()
+    if not doctor:
+        return redirect("/auth/login")
+
+    did = doctor["doctor_id"]
+    log_action("doctor", did, "Exported panel CSV")
+    return Response(
+        stream_panel_csv(did),
+        mimetype="text/csv",
+        headers=csv_response_headers(f"doctor_{did}_panel.csv")
+    )
+
+
 # ========================================================================
 #                   DOWNLOAD SINGLE PRESCRIPTION PDF
 # ========================================================================
 @doctor_bp.route("/prescription/<int:prescription_id>/pdf")
 def download_prescription_pdf(prescription_id):
     db = connect_db()
-    cur = db.cursor(dictionary=True)
 
-    cur.execute("""
-        SELECT p.*, d.name AS doctor_name, pa.first_name, pa.last_name
-        FROM prescriptions p
-        JOIN doctors d ON p.doctor_id=d.doctor_id
-        JOIN patients pa ON p.patient_id=pa.patient_id
-        WHERE p.prescription_id=%s
-    """, (prescription_id,))
-    pres = cur.fetchone()
+    pres = queries.fetch_one(db, "doctor.prescription_detail", (prescription_id,))
 
     if not pres:
         return abort(404)
@@ -242,7 +278,6 @@ def download_prescription_pdf(prescription_id):
 
     filepath = generate_prescription_pdf(pres)
 
-    cur.close()
     db.close()
 
     return send_file(filepath, as_attachment=True)
@@ -256,10 +291,8 @@ def download_report(report_id):
     doctor = get_current_doctor()
 
     db = connect_db()
-    cur = db.cursor(dictionary=True)
 
-    cur.execute("SELECT report_file FROM lab_reports WHERE report_id=%s", (report_id,))
-    row = cur.fetchone()
+    row = queries.fetch_one(db, "doctor.report_file", (report_id,))
 
     if not row:
         return abort(404)
@@ -271,7 +304,6 @@ def download_report(report_id):
 
     log_action("doctor", doctor.get("doctor_id"), f"Downloaded report {report_id}")
 
-    cur.close()
     db.close()
 
     return send_file(file_path, as_attachment=True)
@@ -291,50 +323,21 @@ def doctor_dashboard():
     db = connect_db()
     cur = db.cursor(dictionary=True)
 
-    # Counts
-    cur.execute("SELECT COUNT(*) AS total FROM patients WHERE doctor_id=%s", (did,))
-    total_patients = cur.fetchone()["total"]
+    # Counts (materialized, see utils/counters.py)
+    counts = get_counters(cur, "doctor", did, DOCTOR_COUNTERS)
 
-    cur.execute("SELECT COUNT(*) AS total FROM prescriptions WHERE doctor_id=%s", (did,))
-    total_prescriptions = cur.fetchone()["total"]
-
-    cur.execute("SELECT COUNT(*) AS total FROM lab_reports WHERE doctor_id=%s", (did,))
-    total_reports = cur.fetchone()["total"]
-
-    cur.execute("SELECT COUNT(*) AS total FROM ai_logs WHERE doctor_id=%s", (did,))
-    ai_logs_count = cur.fetchone()["total"]
-
-    # RECENT PATIENTS (fixed age)
-    cur.execute("""
-        SELECT 
-            p.patient_id,
-            p.first_name,
-            p.last_name,
-            TIMESTAMPDIFF(YEAR, p.dob, CURDATE()) AS age,
-            p.phone,
-            p.address,
-
-            (SELECT MAX(created_at) FROM prescriptions WHERE patient_id = p.patient_id) AS last_visit,
-            (SELECT COUNT(*) FROM prescriptions WHERE patient_id = p.patient_id) AS prescription_count,
-            (SELECT COUNT(*) FROM lab_reports WHERE patient_id = p.patient_id) AS report_count
-
-        FROM patients p
-        WHERE p.doctor_id=%s
-        ORDER BY (last_visit IS NULL), last_visit DESC
-        LIMIT 8
-    """, (did,))
-
-    patients = cur.fetchall()
+    # RECENT PATIENTS (set-based, from patient_visit_stats)
+    patients = recent_patients(cur, did, 8)
 
     cur.close()
     db.close()
 
     return render_template("doctor/dashboard.html",
                            doctor=doctor,
-                           total_patients=total_patients,
-                           total_prescriptions=total_prescriptions,
-                           total_reports=total_reports,
-                           ai_logs_count=ai_logs_count,
+                           total_patients=counts["patients"],
+                           total_prescriptions=counts["prescriptions"],
+                           total_reports=counts["lab_reports"],
+                           ai_logs_count=counts["ai_logs"],
                            patients=patients)
 
 # ========================================================================
@@ -342,10 +345,6 @@ def doctor_dashboard():
 # ========================================================================
 @doctor_bp.route("/ai/structure", methods=["POST"])
 def ai_structure():
-    from flask import request, jsonify
-    import spacy
-    import re
-
     data = request.get_json() or {}
     text = data.get("text", "").strip()
 
@@ -353,71 +352,120 @@ def ai_structure():
         return jsonify({"status": "error", "message": "No text received"}), 400
 
     try:
-        nlp = spacy.load("en_core_web_sm")
-        doc = nlp(text)
-
-        # -------- Diagnosis --------
-        diagnosis = ""
-        patterns = [
-            r"diagnosis is (.*?)(?:\.|$)",
-            r"diagnosed with (.*?)(?:\.|$)"
-        ]
-        for p in patterns:
-            m = re.search(p, text, re.IGNORECASE)
-            if m:
-                diagnosis = m.group(1).strip()
-                break
-
-        # fallback
-        if not diagnosis:
-            for ent in doc.ents:
-                if ent.label_ in ["DISEASE", "CONDITION", "SYMPTOM"]:
-                    diagnosis = ent.text
-                    break
-
-        # -------- Symptoms --------
-        symptoms = []
-        symptom_words = ["fever", "pain", "cough", "cold", "vomit",
-                         "headache", "fatigue", "weakness", "breathing"]
-
-        for sent in doc.sents:
-            if any(w in sent.text.lower() for w in symptom_words):
-                symptoms.append(sent.text.strip())
-
-        # -------- Medicines --------
-        medicines = []
-        med_pattern = r"([A-Za-z]+[A-Za-z0-9]*)\s*(\d+mg|\d+ml|\d+mcg)?\s*(tablet|capsule|syrup|drop)?\s*(once|twice|daily|night|morning|evening)?\s*(for\s*\d+\s*(days|weeks))?"
-
-        for m in re.finditer(med_pattern, text, re.IGNORECASE):
-            g = m.groups()
-            if g[0]:
-                medicines.append({
-                    "name": g[0],
-                    "dose": g[1] or "",
-                    "form": g[2] or "",
-                    "freq": g[3] or "",
-                    "duration": g[4] or ""
-                })
-
-        # -------- Build structured preview --------
-        structured = f"""
-🩺 Diagnosis:
-{diagnosis or "Not detected"}
-
-🤒 Symptoms:
-{', '.join(symptoms) if symptoms else "Not detected"}
-
-💊 Medicines:
-""" + "\n".join([f"- {m['name']} {m['dose']} {m['form']} {m['freq']} {m['duration']}".strip()
-                  for m in medicines])
-
-        return jsonify({
-            "status": "success",
-            "structured": structured,
-            "diagnosis": diagnosis,
-            "symptoms": symptoms,
-            "medicines": medicines
-        })
+        result = nlp_engine.structure_text(text)
+        return jsonify({"status": "success", **result})
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+# SSE: diagnosis, then symptoms, then one event per medicine, then done
+@doctor_bp.route("/ai/structure-stream", methods=["POST"])
+def ai_structure_stream():
+    if not require_doctor():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    data = request.get_json(silent=True) or {}
+    text = data.get("text", "").strip()
+
+    if not text:
+        return jsonify({"status": "error", "message": "No text received"}), 400
+
+    def generate():
+        start = time.perf_counter()
+        first_field_ms = None
+        try:
+            for event, value in nlp_engine.structure_stream(text):
+                if event == "done":
+                    value = {**value, "first_field_ms": first_field_ms}
+                elif first_field_ms is None:
+                    first_field_ms = round((time.perf_counter() - start) * 1000, 3)
+                yield sse_event(event, value)
+        except Exception as e:
+            yield sse_event("error", {"message": str(e)})
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+# ========================================================================
+#               VOICE → TEXT (uploaded audio, bounded worker pool)
+# ========================================================================
+@doctor_bp.route("/ai/transcribe", methods=["POST"])
+def ai_transcribe():
+    if not require_doctor():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    # multipart upload ("audio" field) or the raw request body
+    upload = request.files.get("audio")
+    if upload:
+        data, filename = upload.read(), upload.filename
+    else:
+        data, filename = request.get_data(cache=False), None
+    language = request.values.get("language", "en-US")
+
+    try:
+        result = transcription_service.transcribe(data, filename, language)
+    except transcription_service.ServiceBusy as e:
+        return jsonify({"status": "error", "message": str(e)}), 503, {"Retry-After": "2"}
+    except transcription_service.UnintelligibleAudio as e:
+        return jsonify({"status": "error", "message": str(e)}), 422
+    except transcription_service.InvalidAudio as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except transcription_service.BackendUnavailable as e:
+        print("❌ Transcription backend unavailable:", e)
+        return jsonify({"status": "error", "message": "Transcription is not available"}), 500
+    except transcription_service.TranscriptionTimeout as e:
+        return jsonify({"status": "error", "message": str(e)}), 504
+    except transcription_service.TranscriptionError as e:
+        # the recognition backend failed
+        return jsonify({"status": "error", "message": str(e)}), 502
+
+    return jsonify({"status": "success", **result})
+
+
+# ========================================================================
+#               BATCH NLP — STRUCTURE MANY DICTATIONS (nlp.pipe)
+# ========================================================================
+# Batch structuring limits
+MAX_BATCH_TEXTS = 10000
+
+
+@doctor_bp.route("/ai/structure-batch", methods=["POST"])
+def ai_structure_batch():
+    if not require_doctor():
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    data = request.get_json(force=True, silent=True) or {}
+    texts = data.get("texts")
+
+    if not isinstance(texts, list) or not texts:
+        return jsonify({"status": "error", "message": "texts must be a non-empty list"}), 400
+
+    if len(texts) > MAX_BATCH_TEXTS:
+        return jsonify({"status": "error", "message": f"At most {MAX_BATCH_TEXTS} texts per batch"}), 413
+
+    try:
+        batch_size = int(data.get("batch_size") or nlp_engine.NLP_BATCH_SIZE)
+        n_process = int(data.get("n_process") or 1)
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "batch_size and n_process must be integers"}), 400
+
+    results = nlp_engine.structure_many(texts, batch_size=batch_size, n_process=n_process)
+
+    # NDJSON: one line per dictation, flushed as soon as it is structured
+    stream = data.get("stream") or "application/x-ndjson" in request.headers.get("Accept", "")
+    if stream:
+        def generate():
+            try:
+                for i, result in enumerate(results):
+                    yield json.dumps({"index": i, "status": "success", **result}, ensure_ascii=False) + "\n"
+            except Exception as e:
+                yield json.dumps({"status": "error", "message": str(e)}) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    try:
+        return jsonify({"status": "success", "count": len(texts), "data": list(results)})
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
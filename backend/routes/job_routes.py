@@ -0,0 +1,113 @@
+from flask import Blueprint, request, jsonify, session, send_from_directory
+
+from database import connect_db
+from utils import queries
+from utils.audit_logger import log_action
+from utils.jobs import job_queue, QueueFull, SUCCEEDED
+from utils.export_jobs import EXPORT_FORMATS, JOB_EXPORT_DIR
+
+job_bp = Blueprint("jobs", __name__, url_prefix="/jobs")
+
+
+# ----------------------------------------
+# Helpers
+# ----------------------------------------
+def current_owner():
+    """
+    (role, user id) of the logged-in user, or None.
+    """
+    role = session.get("role")
+    keys = {"doctor": "doctor_id", "patient": "patient_id", "admin": "admin_id"}
+    if role in keys and role in session:
+        return role, session[role].get(keys[role])
+    return None
+
+
+def _job_json(job):
+    data = job.to_dict()
+    if job.status == SUCCEEDED:
+        data["download_url"] = f"/jobs/{job.id}/download"
+    return data
+
+
+# ========================================================================
+#                 SUBMIT AN EXPORT (returns a job id)
+# ========================================================================
+@job_bp.route("/export", methods=["POST"])
+def submit_export():
+    owner = current_owner()
+    if not owner:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    data = request.get_json(silent=True) or request.form
+    fmt = (data.get("format") or data.get("export_type") or "pdf").lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"status": "error", "message": "format must be pdf or csv"}), 400
+
+    role, user_id = owner
+    if role == "patient":
+        # patients can only export their own record
+        patient_id = user_id
+    else:
+        try:
+            patient_id = int(data.get("patient_id"))
+        except (TypeError, ValueError):
+            return jsonify({"status": "error", "message": "patient_id is required"}), 400
+
+    if role == "doctor":
+        db = connect_db()
+        try:
+            patient = queries.fetch_one(db, "doctor.patient_owner", (patient_id,))
+        finally:
+            db.close()
+        if not patient:
+            return jsonify({"status": "error", "message": "Patient not found"}), 404
+        if patient["doctor_id"] != user_id:
+            return jsonify({"status": "error", "message": "This is not your patient"}), 403
+
+    try:
+        job = job_queue.submit("patient_export", {"patient_id": patient_id, "fmt": fmt}, owner)
+    except QueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 503, {"Retry-After": "5"}
+
+    log_action(role, user_id, f"Queued {fmt.upper()} export of patient ID {patient_id}")
+
+    return jsonify({
+        "status": "success",
+        "job": _job_json(job),
+        "status_url": f"/jobs/{job.id}"
+    }), 202
+
+
+# ========================================================================
+#                          POLL JOB STATUS
+# ========================================================================
+@job_bp.route("/<string:job_id>")
+def job_status(job_id):
+    owner = current_owner()
+    if not owner:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    job = job_queue.get(job_id, owner)
+    if not job:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+
+    return jsonify({"status": "success", "job": _job_json(job)})
+
+
+# ========================================================================
+#                        DOWNLOAD JOB RESULT
+# ========================================================================
+@job_bp.route("/<string:job_id>/download")
+def job_download(job_id):
+    owner = current_owner()
+    if not owner:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    job = job_queue.get(job_id, owner)
+    if not job:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    if job.status != SUCCEEDED:
+        return jsonify({"status": "error", "message": f"Job is {job.status}"}), 409
+
+    return send_from_directory(JOB_EXPORT_DIR, job.result, as_attachment=True)
@@ -1,18 +1,33 @@
 # routes/nlp_routes.py
-import os
+import re
 import json
-from flask import Blueprint, request, jsonify
+import time
+from datetime import date
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from mysql.connector import Error as DatabaseError
+from mysql.connector.errors import InterfaceError, OperationalError
 from database import connect_db
-
-# install openai: pip install openai
-import openai
+from routes.doctor_routes import get_current_doctor
+from utils import queries
+from utils.llm_cache import llm_cache
+from utils.json_stream import JSONFieldStream
+from utils.sse import sse_event, SSE_HEADERS
+import llm_client
+import nlp_engine
 
 nlp_bp = Blueprint("nlp", __name__)
 
-OPENAI_KEY = os.environ.get("OPENAI_API_KEY")
-OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")  # set via env
+OPENAI_MODEL = llm_client.LLM_MODEL  # set via OPENAI_MODEL env
+
+# Bump whenever build_prompt() or the system message changes, so cached
+# results from the old prompt are not reused.
+PROMPT_VERSION = "1"
 
-openai.api_key = OPENAI_KEY
+
+class ModelOutputError(Exception):
+    def __init__(self, message, raw=""):
+        super().__init__(message)
+        self.raw = raw
 
 def build_prompt(text, patient_info=None):
     """
@@ -22,7 +37,7 @@ def build_prompt(text, patient_info=None):
     patient_note = ""
     if patient_info:
         parts = []
-        for k in ("name","age","city","phone"):
+        for k in ("name","age","phone"):
             v = patient_info.get(k)
             if v:
                 parts.append(f"{k}: {v}")
@@ -45,67 +60,67 @@ Required JSON keys:
 If any field is unknown, use an empty string or empty array. Strict JSON only.
 """
 
+def age_from_dob(dob, today=None):
+    if not isinstance(dob, date):
+        return ""
+    today = today or date.today()
+    return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
+
+
+def load_patient_info(patient_id, doctor_id):
+    """
+    Prompt context for one of `doctor_id`'s own patients; {} otherwise.
+    Only a lost database connection is tolerated - query errors propagate.
+    """
+    if not patient_id:
+        return {}
+
+    db = connect_db()
+    if db is None:
+        return {}
+    try:
+        row = queries.fetch_one(db, "nlp.patient_context", (patient_id, doctor_id))
+    except (InterfaceError, OperationalError) as e:
+        print("❌ Patient context unavailable:", e)
+        return {}
+    finally:
+        db.close()
+
+    if not row:
+        return {}
+    return {
+        "name": f"{row.get('first_name') or ''} {row.get('last_name') or ''}".strip(),
+        "age": age_from_dob(row.get("dob")),
+        "phone": row.get("phone") or ""
+    }
+
+
 @nlp_bp.route("/structure-prescription", methods=["POST"])
 def structure_prescription():
-    if OPENAI_KEY is None:
-        return jsonify({"error":"OpenAI API key not set on server"}), 500
+    doctor = get_current_doctor()
+    if not doctor:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
 
     body = request.get_json(force=True) or {}
     text = body.get("text", "")
     patient_id = body.get("patient_id")
 
-    # optional: fetch patient to include context (name/age/city/phone)
-    patient_info = {}
-    if patient_id:
-        try:
-            db = connect_db()
-            cur = db.cursor(dictionary=True)
-            cur.execute("SELECT first_name, last_name, COALESCE(age,'') AS age, COALESCE(city,'') AS city, COALESCE(phone,'') as phone FROM patients WHERE patient_id=%s", (patient_id,))
-            row = cur.fetchone()
-            if row:
-                patient_info = {
-                    "name": f"{row.get('first_name','')} {row.get('last_name','')}".strip(),
-                    "age": row.get("age") or "",
-                    "city": row.get("city") or "",
-                    "phone": row.get("phone") or ""
-                }
-            cur.close()
-            db.close()
-        except Exception:
-            patient_info = {}
-
     if not text:
         return jsonify({"error":"No text provided"}), 400
 
-    prompt = build_prompt(text, patient_info)
-
     try:
-        # Use Chat Completion API
-        resp = openai.ChatCompletion.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role":"system","content":"You are an assistant that outputs only JSON."},
-                {"role":"user","content": prompt}
-            ],
-            temperature=0.0,
-            max_tokens=700
-        )
-
-        content = ""
-        if resp and "choices" in resp and len(resp["choices"])>0:
-            content = resp["choices"][0]["message"]["content"].strip()
-
-        # Ensure JSON parse
+        # optional: fetch patient to include context (name/age/phone)
+        patient_info = load_patient_info(patient_id, doctor["doctor_id"])
+        prompt = build_prompt(text, patient_info)
+        key = llm_cache.key(text, patient_info, OPENAI_MODEL, PROMPT_VERSION)
+
         try:
-            parsed = json.loads(content)
-        except Exception:
-            # As a fallback, try to extract JSON substring
-            import re
-            m = re.search(r"\{.*\}", content, flags=re.S)
-            if m:
-                parsed = json.loads(m.group(0))
-            else:
-                return jsonify({"error":"OpenAI returned non-JSON response", "raw": content}), 500
+            parsed, source = llm_cache.get_or_call(key, lambda: call_model(prompt))
+            parsed = dict(parsed)
+        except llm_client.LLMUnavailable as e:
+            # slow / failing upstream or open circuit: answer locally
+            parsed, source = local_structure(text), "local"
+            parsed["fallback_reason"] = str(e)
 
         # Attach transcript if missing
         if "transcript" not in parsed:
@@ -116,9 +131,167 @@ def structure_prescription():
         parsed.setdefault("symptoms", [])
         parsed.setdefault("medicines", [])
         parsed.setdefault("transcript", text)
+        parsed["cache"] = source
 
         return jsonify(parsed)
-    except openai.error.OpenAIError as e:
+    except DatabaseError as e:
+        return jsonify({"error":"Database error", "detail": str(e)}), 500
+    except ModelOutputError as e:
+        return jsonify({"error": str(e), "raw": e.raw}), 500
+    except llm_client.LLMError as e:
         return jsonify({"error":"OpenAI API error", "detail": str(e)}), 500
     except Exception as e:
         return jsonify({"error":"Unexpected server error", "detail": str(e)}), 500
+
+
+def local_structure(text):
+    """
+    The spaCy structurer behind /doctor/ai/structure, in this route's
+    response shape.
+    """
+    result = nlp_engine.structure_text(text)
+    return {
+        "diagnosis": result["diagnosis"],
+        "symptoms": result["symptoms"],
+        "medicines": result["medicines"],
+        "transcript": text,
+    }
+
+
+def model_messages(prompt):
+    return [
+        {"role":"system","content":"You are an assistant that outputs only JSON."},
+        {"role":"user","content": prompt}
+    ]
+
+
+def parse_model_json(content):
+    content = content.strip()
+    # Ensure JSON parse
+    try:
+        return json.loads(content)
+    except Exception:
+        # As a fallback, try to extract JSON substring
+        m = re.search(r"\{.*\}", content, flags=re.S)
+        if m:
+            return json.loads(m.group(0))
+        raise ModelOutputError("OpenAI returned non-JSON response", content)
+
+
+def call_model(prompt):
+    """
+    One chat completion; returns the parsed JSON object.
+    """
+    content = llm_client.get_client().chat(
+        model_messages(prompt),
+        temperature=0.0,
+        max_tokens=700
+    )
+    return parse_model_json(content)
+
+
+# ========================================================================
+#        STREAMING — diagnosis, symptoms, each medicine as SSE events
+# ========================================================================
+@nlp_bp.route("/structure-prescription/stream", methods=["POST"])
+def structure_prescription_stream():
+    """
+    Same input and final result as /structure-prescription, sent as
+    server-sent events so the UI can show each field as it arrives:
+      diagnosis (str), symptoms (list), medicine (dict, one per event),
+      done (the full result + cache, first_field_ms, elapsed_ms), error.
+    Model tokens go through an incremental JSON parser; cache hits and
+    the local fallback emit the same events.
+    """
+    doctor = get_current_doctor()
+    if not doctor:
+        return jsonify({"status": "error", "message": "Unauthorized"}), 401
+
+    body = request.get_json(force=True, silent=True) or {}
+    text = body.get("text", "")
+
+    if not text:
+        return jsonify({"error":"No text provided"}), 400
+
+    # before the stream starts, so errors still get a JSON response
+    try:
+        patient_info = load_patient_info(body.get("patient_id"), doctor["doctor_id"])
+    except DatabaseError as e:
+        return jsonify({"error":"Database error", "detail": str(e)}), 500
+
+    prompt = build_prompt(text, patient_info)
+    key = llm_cache.key(text, patient_info, OPENAI_MODEL, PROMPT_VERSION)
+
+    def generate():
+        start = time.perf_counter()
+        timing = {"first_field_ms": None}
+
+        def emit(event, value):
+            if timing["first_field_ms"] is None:
+                timing["first_field_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            return sse_event(event, value)
+
+        def done(parsed, source):
+            parsed = dict(parsed)
+            parsed.setdefault("diagnosis", "")
+            parsed.setdefault("symptoms", [])
+            parsed.setdefault("medicines", [])
+            parsed.setdefault("transcript", text)
+            parsed["cache"] = source
+            parsed["first_field_ms"] = timing["first_field_ms"]
+            parsed["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+            return sse_event("done", parsed)
+
+        try:
+            hit = llm_cache.peek(key)
+            if hit is not None:
+                parsed, source = hit
+                yield emit("diagnosis", parsed.get("diagnosis", ""))
+                yield emit("symptoms", parsed.get("symptoms", []))
+                for m in parsed.get("medicines", []):
+                    yield emit("medicine", m)
+                yield done(parsed, source)
+                return
+
+            parser = JSONFieldStream()
+            sent = False
+            try:
+                tokens = llm_client.get_client().chat_stream(model_messages(prompt), temperature=0.0, max_tokens=700)
+                for delta in tokens:
+                    for kind, field, value in parser.feed(delta):
+                        if kind == "field" and field in ("diagnosis", "symptoms"):
+                            sent = True
+                            yield emit(field, value)
+                        elif kind == "item" and field == "medicines":
+                            sent = True
+                            yield emit("medicine", value)
+            except llm_client.LLMUnavailable as e:
+                if sent:
+                    yield sse_event("error", {"error": "Model stream interrupted", "detail": str(e)})
+                    return
+                # nothing shown yet: answer locally, same events
+                parsed = {"diagnosis": "", "symptoms": [], "medicines": [], "transcript": text,
+                          "fallback_reason": str(e)}
+                for event, value in nlp_engine.structure_stream(text):
+                    if event == "done":
+                        continue
+                    if event == "medicine":
+                        parsed["medicines"].append(value)
+                    else:
+                        parsed[event] = value
+                    yield emit(event, value)
+                yield done(parsed, "local")
+                return
+
+            parsed = parser.result() or parse_model_json(parser.text)
+            llm_cache.put(key, parsed, (time.perf_counter() - start) * 1000)
+            yield done(parsed, "model")
+
+        except ModelOutputError as e:
+            yield sse_event("error", {"error": str(e), "raw": e.raw})
+        except llm_client.LLMError as e:
+            yield sse_event("error", {"error": "OpenAI API error", "detail": str(e)})
+        except Exception as e:
+            yield sse_event("error", {"error": "Unexpected server error", "detail": str(e)})
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=SSE_HEADERS)
@@ -1,10 +1,11 @@
-from flask import Blueprint, render_template, session, redirect, send_from_directory, request, flash
+from flask import Blueprint, render_template, session, redirect, send_from_directory, request, flash, Response
 import os
-import json
-import database
 from database import connect_db
-from utils.export_utils import export_patient_csv, generate_patient_pdf
+from utils.export_utils import generate_patient_pdf
+from utils.csv_stream import load_csv_patient, stream_patient_csv, csv_response_headers
 from utils.audit_logger import log_action
+from utils.patient_records import load_patient_record
+from utils import queries
 
 patient_bp = Blueprint("patient", __name__, url_prefix="/patient")
 
@@ -30,48 +31,20 @@ def patient_dashboard():
     conn = connect_db()
     cur = conn.cursor(dictionary=True)
 
-    # Refresh full patient record
-    cur.execute("""
-        SELECT p.*, d.name AS doctor_name
-        FROM patients p
-        LEFT JOIN doctors d ON p.doctor_id = d.doctor_id
-        WHERE p.patient_id = %s
-    """, (pid,))
-    patient = cur.fetchone()
-
-    # Prescriptions
-    cur.execute("""
-        SELECT p.*, d.name AS doctor_name
-        FROM prescriptions p
-        JOIN doctors d ON p.doctor_id=d.doctor_id
-        WHERE p.patient_id=%s
-        ORDER BY p.created_at DESC
-    """, (pid,))
-    prescriptions = cur.fetchall()
-
-    for pres in prescriptions:
-        meds = pres.get("medicines")
-        pres["medicines"] = json.loads(meds) if meds else []
-
-    # Lab Reports
-    cur.execute("""
-        SELECT *
-        FROM lab_reports
-        WHERE patient_id=%s
-        ORDER BY upload_date DESC
-    """, (pid,))
-    reports = cur.fetchall()
-
-    # Summary Stats
-    cur.execute("SELECT COUNT(*) AS total FROM prescriptions WHERE patient_id=%s", (pid,))
-    patient["total_prescriptions"] = cur.fetchone()["total"]
-
-    cur.execute("SELECT COUNT(*) AS total FROM lab_reports WHERE patient_id=%s", (pid,))
-    patient["total_reports"] = cur.fetchone()["total"]
+    # Full patient record (patient, prescriptions, reports, stats) in one round trip
+    record = load_patient_record(cur, pid)
 
     cur.close()
     conn.close()
 
+    if not record:
+        session.clear()
+        return redirect("/auth/login")
+
+    patient = record["patient"]
+    prescriptions = record["prescriptions"]
+    reports = record["reports"]
+
     return render_template("patient/dashboard.html",
                            patient=patient,
                            prescriptions=prescriptions,
@@ -89,19 +62,9 @@ def view_prescriptions():
     patient = session["patient"]
 
     conn = connect_db()
-    cur = conn.cursor(dictionary=True)
-
-    cur.execute("""
-        SELECT p.*, d.name AS doctor_name
-        FROM prescriptions p
-        LEFT JOIN doctors d ON p.doctor_id = d.doctor_id
-        WHERE p.patient_id = %s
-        ORDER BY p.created_at DESC
-    """, (patient["patient_id"],))
 
-    prescriptions = cur.fetchall()
+    prescriptions = queries.fetch_all(conn, "patient.prescriptions", (patient["patient_id"],))
 
-    cur.close()
     conn.close()
 
     return render_template("patient/view-prescriptions.html",
@@ -120,19 +83,9 @@ def view_reports():
     patient = session["patient"]
 
     conn = connect_db()
-    cur = conn.cursor(dictionary=True)
 
-    cur.execute("""
-        SELECT lr.*, d.name AS doctor_name
-        FROM lab_reports lr
-        LEFT JOIN doctors d ON lr.doctor_id = d.doctor_id
-        WHERE lr.patient_id = %s
-        ORDER BY lr.upload_date DESC
-    """, (patient["patient_id"],))
+    reports = queries.fetch_all(conn, "patient.reports", (patient["patient_id"],))
 
-    reports = cur.fetchall()
-
-    cur.close()
     conn.close()
 
     return render_template("patient/view-reports.html",
@@ -149,12 +102,9 @@ def download_report(report_id):
         return redirect("/auth/login")
 
     conn = connect_db()
-    cur = conn.cursor(dictionary=True)
 
-    cur.execute("SELECT * FROM lab_reports WHERE report_id=%s", (report_id,))
-    report = cur.fetchone()
+    report = queries.fetch_one(conn, "patient.report", (report_id,))
 
-    cur.close()
     conn.close()
 
     if not report:
@@ -183,38 +133,41 @@ def export_data():
         conn = connect_db()
         cur = conn.cursor(dictionary=True)
 
-        # Prescriptions
-        cur.execute("""
-            SELECT p.*, d.name AS doctor_name
-            FROM prescriptions p
-            LEFT JOIN doctors d ON p.doctor_id = d.doctor_id
-            WHERE p.patient_id = %s
-            ORDER BY p.created_at DESC
-        """, (patient["patient_id"],))
-        prescriptions = cur.fetchall()
-
-        # Reports
-        cur.execute("""
-            SELECT lr.*, d.name AS doctor_name
-            FROM lab_reports lr
-            LEFT JOIN doctors d ON lr.doctor_id = d.doctor_id
-            WHERE lr.patient_id = %s
-            ORDER BY lr.upload_date DESC
-        """, (patient["patient_id"],))
-
-        reports = cur.fetchall()
+        # CSV is streamed row by row straight from the database
+        if export_type == "csv":
+            header = load_csv_patient(cur, patient["patient_id"])
+            cur.close()
+            conn.close()
+
+            if not header:
+                flash("Patient record not found", "danger")
+                return redirect("/patient/export-data")
+
+            log_action("patient", patient["patient_id"], "Exported CSV")
+            return Response(
+                stream_patient_csv(header),
+                mimetype="text/csv",
+                headers=csv_response_headers(f"patient_{header['patient_id']}.csv")
+            )
+
+        record = load_patient_record(cur, patient["patient_id"])
 
         cur.close()
         conn.close()
 
+        if not record:
+            flash("Patient record not found", "danger")
+            return redirect("/patient/export-data")
+
+        patient = record["patient"]
+        prescriptions = record["prescriptions"]
+        reports = record["reports"]
+
         # Generate File
-        if export_type == "csv":
-            filepath = export_patient_csv(patient, prescriptions, reports)
-        else:
-            filepath = generate_patient_pdf(patient, prescriptions, reports)
+        filepath = generate_patient_pdf(patient, prescriptions, reports)
 
         # Log export
-        log_action("patient", patient["patient_id"], f"Exported {export_type.upper()}")
+        log_action("patient", patient["patient_id"], "Exported PDF")
 
         return redirect("/static/exports/" + os.path.basename(filepath))
 
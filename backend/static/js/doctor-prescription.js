@@ -136,8 +136,67 @@ document.addEventListener("DOMContentLoaded", () => {
 
 
     // =====================================================
-    // 3) AI STRUCTURE (Send → AI → formatted)
+    // 3) AI STRUCTURE (Send → AI → formatted, streamed)
     // =====================================================
+    // Server-sent events: diagnosis, symptoms, one per medicine, done.
+    // Each field is shown as soon as it arrives; the final text
+    // replaces the partial preview on "done".
+    function renderPartial(parts) {
+        const meds = parts.medicines.map(m =>
+            ["-", m.name, m.dose, m.form, m.freq, m.duration].filter(Boolean).join(" "));
+
+        preview.innerText =
+            "🩺 Diagnosis:\n" + (parts.diagnosis || "Not detected") + "\n\n" +
+            "🤒 Symptoms:\n" + (parts.symptoms ? (parts.symptoms.join(", ") || "Not detected") : "…") + "\n\n" +
+            "💊 Medicines:\n" + meds.join("\n") + (parts.done ? "" : "\n⏳");
+    }
+
+    async function structureStream(text) {
+        const resp = await fetch("/doctor/ai/structure-stream", {
+            method: "POST",
+            headers: {"Content-Type":"application/json", "Accept":"text/event-stream"},
+            body: JSON.stringify({ text })
+        });
+
+        if (!resp.ok || !resp.body) throw new Error("stream unavailable");
+
+        const reader = resp.body.getReader();
+        const decoder = new TextDecoder();
+        const parts = { diagnosis: null, symptoms: null, medicines: [], done: false };
+        let buffer = "";
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let sep;
+            while ((sep = buffer.indexOf("\n\n")) !== -1) {
+                const frame = buffer.slice(0, sep);
+                buffer = buffer.slice(sep + 2);
+
+                let event = "message", data = "";
+                frame.split("\n").forEach(line => {
+                    if (line.startsWith("event:")) event = line.slice(6).trim();
+                    else if (line.startsWith("data:")) data += line.slice(5).trim();
+                });
+                const payload = data ? JSON.parse(data) : null;
+
+                if (event === "diagnosis") parts.diagnosis = payload;
+                else if (event === "symptoms") parts.symptoms = payload;
+                else if (event === "medicine") parts.medicines.push(payload);
+                else if (event === "error") throw new Error(payload.message);
+                else if (event === "done") {
+                    parts.done = true;
+                    preview.innerText = payload.structured;
+                    return;
+                }
+                renderPartial(parts);
+            }
+        }
+        throw new Error("stream ended early");
+    }
+
     aiBtn.addEventListener("click", async () => {
 
         if (!finalText.trim())
@@ -145,6 +204,12 @@ document.addEventListener("DOMContentLoaded", () => {
 
         preview.innerHTML = "⏳ Processing with AI…";
 
+        try {
+            return await structureStream(finalText);
+        } catch (e) {
+            // fall back to the one-shot endpoint
+        }
+
         const resp = await fetch("/doctor/ai/structure", {
             method: "POST",
             headers: {"Content-Type":"application/json"},
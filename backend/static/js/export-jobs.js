@@ -0,0 +1,76 @@
+// Background export jobs: submit, poll status, then download.
+// Links / forms marked with data-export-job keep their normal href /
+// action as a fallback when JavaScript is off.
+async function runExportJob(body, statusEl) {
+  const setStatus = (msg) => { if (statusEl) statusEl.textContent = msg; };
+
+  setStatus("⏳ Queued...");
+  const res = await fetch("/jobs/export", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(body)
+  });
+  const data = await res.json();
+  if (data.status !== "success") {
+    setStatus("❌ " + (data.message || "Export failed"));
+    return;
+  }
+
+  // Back off to one poll every 3s and give up after ~10 minutes: a job
+  // can be lost (e.g. a restart empties the in-process queue).
+  const MAX_POLLS = 200;
+  let delay = 500;
+  for (let attempt = 0; attempt < MAX_POLLS; attempt++) {
+    await new Promise(r => setTimeout(r, delay));
+    delay = Math.min(delay * 1.5, 3000);
+
+    let poll;
+    try {
+      const pollRes = await fetch(data.status_url);
+      if (pollRes.status === 404) {
+        setStatus("❌ Export job was lost (the server may have restarted). Please try again.");
+        return;
+      }
+      poll = await pollRes.json();
+    } catch (err) {
+      continue;   // server briefly unreachable: keep polling until MAX_POLLS
+    }
+    if (poll.status !== "success") {
+      setStatus("❌ " + (poll.message || "Export failed"));
+      return;
+    }
+
+    const job = poll.job;
+    if (job.status === "succeeded") {
+      setStatus("✅ Ready");
+      window.location = job.download_url;
+      return;
+    }
+    if (job.status === "failed") {
+      setStatus("❌ " + (job.error || "Export failed"));
+      return;
+    }
+    setStatus(job.status === "running" ? "⚙️ Generating..." : "⏳ Queued...");
+  }
+  setStatus("❌ Export is taking too long. Please try again later.");
+}
+
+document.addEventListener("DOMContentLoaded", () => {
+  document.querySelectorAll("a[data-export-job]").forEach(link => {
+    link.addEventListener("click", (e) => {
+      e.preventDefault();
+      const statusEl = document.getElementById(link.dataset.statusTarget || "exportJobStatus");
+      runExportJob({ patient_id: link.dataset.patientId, format: link.dataset.format || "pdf" }, statusEl);
+    });
+  });
+
+  document.querySelectorAll("form[data-export-job]").forEach(form => {
+    form.addEventListener("submit", (e) => {
+      const format = form.querySelector("[name=export_type]").value;
+      // CSV is streamed directly; only PDFs go through the job queue
+      if (format !== "pdf") return;
+      e.preventDefault();
+      runExportJob({ format: format }, document.getElementById("exportJobStatus"));
+    });
+  });
+});
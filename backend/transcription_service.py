@@ -0,0 +1,261 @@
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# ----------------------------------------
+# Upload-based transcription service
+# ----------------------------------------
+# Audio arrives as bytes over HTTP and stays in memory (io.BytesIO) -
+# no shared temp file, so concurrent doctors cannot overwrite each
+# other's recordings. Recognition runs on a bounded thread pool:
+# at most TRANSCRIBE_WORKERS run at once and TRANSCRIBE_QUEUE_SIZE more
+# may wait; beyond that callers get ServiceBusy straight away.
+#
+# Backends are pluggable (EHR_TRANSCRIBE_BACKEND):
+#   google   speech_recognition + Google Web Speech (WAV / AIFF / FLAC)
+#   whisper  OpenAI Whisper API
+#   stub     no network, returns a fixed transcript (tests / local dev)
+
+TRANSCRIBE_BACKEND = os.environ.get("EHR_TRANSCRIBE_BACKEND", "google")
+TRANSCRIBE_WORKERS = int(os.environ.get("EHR_TRANSCRIBE_WORKERS", 4))
+TRANSCRIBE_QUEUE_SIZE = int(os.environ.get("EHR_TRANSCRIBE_QUEUE_SIZE", 16))
+TRANSCRIBE_TIMEOUT = float(os.environ.get("EHR_TRANSCRIBE_TIMEOUT", 60))       # seconds per request
+MAX_AUDIO_BYTES = int(os.environ.get("EHR_TRANSCRIBE_MAX_BYTES", 10 * 1024 * 1024))
+LATENCY_SAMPLES = 500
+
+
+class TranscriptionError(Exception):
+    pass
+
+
+class InvalidAudio(TranscriptionError):
+    """The upload itself is unusable (empty, too large, wrong format)."""
+
+
+class UnintelligibleAudio(TranscriptionError):
+    pass
+
+
+class ServiceBusy(TranscriptionError):
+    pass
+
+
+class TranscriptionTimeout(TranscriptionError):
+    pass
+
+
+class BackendUnavailable(TranscriptionError):
+    """Server-side misconfiguration: unknown backend or missing library."""
+
+
+# ----------------------------------------
+# Backends
+# ----------------------------------------
+class GoogleBackend:
+    name = "google"
+
+    def __init__(self):
+        import speech_recognition as sr
+        self.sr = sr
+
+    def recognize(self, audio, filename, language):
+        recognizer = self.sr.Recognizer()
+        try:
+            with self.sr.AudioFile(audio) as source:
+                data = recognizer.record(source)
+            return recognizer.recognize_google(data, language=language)
+        except ValueError as e:
+            raise InvalidAudio(f"Unsupported audio format (use WAV, AIFF or FLAC): {e}")
+        except self.sr.UnknownValueError:
+            raise UnintelligibleAudio("Could not understand the audio")
+        except self.sr.RequestError as e:
+            raise TranscriptionError(f"Speech recognition error: {e}")
+
+
+class WhisperBackend:
+    name = "whisper"
+
+    def __init__(self):
+        import openai
+        self.openai = openai
+
+    def recognize(self, audio, filename, language):
+        # the API picks the decoder from the file name
+        audio.name = filename or "audio.wav"
+        try:
+            transcript = self.openai.Audio.transcribe("whisper-1", audio, language=language.split("-")[0])
+        except Exception as e:
+            raise TranscriptionError(f"Whisper API error: {e}")
+        return transcript["text"]
+
+
+class StubBackend:
+    name = "stub"
+
+    def __init__(self, text=None, delay=None):
+        self.text = text if text is not None else os.environ.get(
+            "EHR_TRANSCRIBE_STUB_TEXT", "Patient diagnosed with fever. Paracetamol 500mg twice daily for 3 days.")
+        self.delay = delay if delay is not None else float(os.environ.get("EHR_TRANSCRIBE_STUB_DELAY", 0))
+
+    def recognize(self, audio, filename, language):
+        if self.delay:
+            time.sleep(self.delay)
+        if not audio.getbuffer().nbytes:
+            raise UnintelligibleAudio("Empty audio")
+        return self.text
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "whisper": WhisperBackend,
+    "stub": StubBackend,
+}
+
+
+def register_backend(name, factory):
+    """
+    Add a backend: factory() returns an object with
+    recognize(audio: BytesIO, filename, language) -> str.
+    """
+    BACKENDS[name] = factory
+
+
+def create_backend(name):
+    """
+    Instantiate backend `name`; BackendUnavailable if it is unknown or
+    its library is not installed.
+    """
+    if name not in BACKENDS:
+        raise BackendUnavailable(f"Unknown transcription backend: {name}")
+    try:
+        return BACKENDS[name]()
+    except ImportError as e:
+        raise BackendUnavailable(f"Transcription backend {name} is not installed: {e}")
+
+
+# ----------------------------------------
+# Service
+# ----------------------------------------
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+
+class TranscriptionService:
+
+    def __init__(self, backend, workers=TRANSCRIBE_WORKERS, queue_size=TRANSCRIBE_QUEUE_SIZE):
+        self.backend = backend
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._queue_wait_ms = deque(maxlen=LATENCY_SAMPLES)
+        self._recognize_ms = deque(maxlen=LATENCY_SAMPLES)
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "timeouts": 0,
+                       "running": 0, "queued": 0, "max_queued": 0, "audio_bytes": 0}
+
+    def _run(self, audio, filename, language, submitted):
+        started = time.perf_counter()
+        queue_ms = (started - submitted) * 1000
+        with self._lock:
+            self._stats["queued"] -= 1
+            self._stats["running"] += 1
+            self._queue_wait_ms.append(queue_ms)
+        ok = False
+        try:
+            text = self.backend.recognize(audio, filename, language)
+            ok = True
+        finally:
+            recognize_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._stats["running"] -= 1
+                self._stats["completed" if ok else "failed"] += 1
+                self._recognize_ms.append(recognize_ms)
+            self._slots.release()
+        return text, queue_ms, recognize_ms
+
+    def transcribe(self, data, filename=None, language="en-US", timeout=TRANSCRIBE_TIMEOUT):
+        """
+        Transcribe raw audio bytes. Blocks until done or `timeout`.
+        Returns {"text", "backend", "queue_ms", "recognize_ms"}.
+        """
+        if not data:
+            raise InvalidAudio("No audio uploaded")
+        if len(data) > MAX_AUDIO_BYTES:
+            raise InvalidAudio(f"Audio larger than {MAX_AUDIO_BYTES} bytes")
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise ServiceBusy("Transcription queue is full, try again shortly")
+
+        submitted = time.perf_counter()
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["audio_bytes"] += len(data)
+            self._stats["queued"] += 1
+            self._stats["max_queued"] = max(self._stats["max_queued"], self._stats["queued"])
+
+        future = self._executor.submit(self._run, io.BytesIO(data), filename, language, submitted)
+        try:
+            text, queue_ms, recognize_ms = future.result(timeout=timeout)
+        except FutureTimeout:
+            # the worker keeps its slot until the backend returns
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise TranscriptionTimeout(f"Transcription took longer than {timeout}s")
+
+        return {
+            "text": text,
+            "backend": self.backend.name,
+            "queue_ms": round(queue_ms, 2),
+            "recognize_ms": round(recognize_ms, 2),
+        }
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            waits = sorted(self._queue_wait_ms)
+            runs = sorted(self._recognize_ms)
+        data.update({
+            "backend": self.backend.name,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_wait_ms_p50": round(_percentile(waits, 0.50), 2),
+            "queue_wait_ms_p95": round(_percentile(waits, 0.95), 2),
+            "recognize_ms_p50": round(_percentile(runs, 0.50), 2),
+            "recognize_ms_p95": round(_percentile(runs, 0.95), 2),
+            "recognize_ms_max": round(runs[-1], 2) if runs else 0.0,
+        })
+        return data
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """
+    The process-wide service for EHR_TRANSCRIBE_BACKEND, created on
+    first use so the backend's library is only imported when needed.
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = TranscriptionService(create_backend(TRANSCRIBE_BACKEND))
+    return _service
+
+
+def transcribe(data, filename=None, language="en-US", timeout=TRANSCRIBE_TIMEOUT):
+    return get_service().transcribe(data, filename, language, timeout)
+
+
+def stats():
+    if _service is None:
+        return {"backend": TRANSCRIBE_BACKEND, "started": False}
+    return _service.stats()
@@ -1,26 +1,148 @@
+import os
+import queue
+import atexit
+import threading
+import time
 import database
 from datetime import datetime
 
+# Background writer settings (override with environment variables)
+AUDIT_QUEUE_SIZE = int(os.environ.get("EHR_AUDIT_QUEUE_SIZE", 10000))
+AUDIT_BATCH_SIZE = int(os.environ.get("EHR_AUDIT_BATCH_SIZE", 200))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("EHR_AUDIT_FLUSH_INTERVAL", 1.0))      # seconds
+AUDIT_ENQUEUE_TIMEOUT = float(os.environ.get("EHR_AUDIT_ENQUEUE_TIMEOUT", 0.05))   # seconds
+
+_queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+_stop = threading.Event()
+_lock = threading.Lock()
+_writer = None
+_stats = {"queued": 0, "flushed": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+
 def log_action(user_role, user_id, action):
     """
-    Records an activity log entry in the activity_logs table.
+    Queues an activity log entry for the activity_logs table.
     user_role: "admin" | "doctor" | "patient"
     user_id: int
     action: string describing the activity
+
+    The row is written by a background thread in multi-row batches, so
+    the calling request never touches the database. Full-queue policy:
+    wait at most AUDIT_ENQUEUE_TIMEOUT for space, then drop the new
+    entry and count it under "dropped" - clinical requests are never
+    held up by audit logging.
     """
+    _ensure_writer()
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
     try:
-        conn = database.connect_db()
-        cursor = conn.cursor()
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        _queue.put((user_role, user_id, action, timestamp), timeout=AUDIT_ENQUEUE_TIMEOUT)
+        _bump("queued")
+    except queue.Full:
+        _bump("dropped")
+        print(f"[AuditLogger] Queue full, dropped action: {action}")
+
+
+def audit_stats():
+    with _lock:
+        data = dict(_stats)
+    data["pending"] = _queue.qsize()
+    data["capacity"] = AUDIT_QUEUE_SIZE
+    data["writer_alive"] = bool(_writer and _writer.is_alive())
+    return data
+
+
+def flush(timeout=5.0):
+    """
+    Block until everything queued so far is written (or timeout).
+    """
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return _queue.unfinished_tasks == 0
+
+
+def shutdown(timeout=5.0):
+    """
+    Stop the writer after draining the queue. Registered with atexit.
+    """
+    _stop.set()
+    if _writer is not None:
+        _writer.join(timeout)
+
+
+# ----------------------------------------
+# Background Writer
+# ----------------------------------------
+def _bump(key, n=1):
+    with _lock:
+        _stats[key] += n
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _lock:
+        if _writer is None or not _writer.is_alive():
+            _stop.clear()
+            _writer = threading.Thread(target=_run, name="audit-writer", daemon=True)
+            _writer.start()
+
+
+def _next_batch():
+    batch = []
+    deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL
+    while len(batch) < AUDIT_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
 
-        cursor.execute("""
-            INSERT INTO activity_logs (user_role, user_id, action, timestamp)
-            VALUES (%s, %s, %s, %s)
-        """, (user_role, user_id, action, timestamp))
 
-        conn.commit()
-        cursor.close()
+def _write(conn, batch):
+    cursor = conn.cursor()
+    placeholders = ", ".join(["(%s, %s, %s, %s)"] * len(batch))
+    params = [value for row in batch for value in row]
+    cursor.execute(f"""
+        INSERT INTO activity_logs (user_role, user_id, action, timestamp)
+        VALUES {placeholders}
+    """, params)
+    conn.commit()
+    cursor.close()
+
+
+def _run():
+    conn = None
+
+    while not (_stop.is_set() and _queue.empty()):
+        batch = _next_batch()
+        if not batch:
+            continue
+
+        for attempt in range(2):
+            try:
+                if conn is None or not conn.is_connected():
+                    conn = database.connect_db()
+                _write(conn, batch)
+                _bump("flushed", len(batch))
+                _bump("batches")
+                break
+            except Exception as e:
+                conn = None
+                if attempt:
+                    _bump("failed", len(batch))
+                    print(f"[AuditLogger] Failed to record {len(batch)} actions: {e}")
+
+        for _ in batch:
+            _queue.task_done()
+
+    if conn is not None:
         conn.close()
 
-    except Exception as e:
-        print(f"[AuditLogger] Failed to record action: {e}")
+
+atexit.register(shutdown)
@@ -0,0 +1,376 @@
+import io
+import os
+import re
+import time
+import uuid
+import zipfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+import click
+
+import database
+from utils.export_utils import generate_patient_pdf, write_patient_csv
+from utils.patient_records import load_patient_record
+
+# ----------------------------------------
+# Bulk export (many patients -> one ZIP)
+# ----------------------------------------
+# Patient records are loaded on the app side and rendered (summary PDF +
+# CSV) in a shared process pool, so a large export uses every core and
+# never blocks on the GIL. Finished patients are written into the ZIP
+# as they complete - straight into the HTTP response, or into a file -
+# with at most PENDING_PER_WORKER records queued per worker, so memory
+# does not grow with the size of the export.
+#
+#   flask bulk-export --doctor-id 3 --out panel.zip
+#
+# Background ZIPs go to BULK_EXPORT_DIR, outside static/ and the export
+# cache: they are only served through /admin/bulk-export/<id>/download.
+
+BULK_EXPORT_WORKERS = int(os.environ.get("EHR_BULK_EXPORT_WORKERS", os.cpu_count() or 2))
+BULK_EXPORT_MAX_ACTIVE = int(os.environ.get("EHR_BULK_EXPORT_MAX_ACTIVE", 2))    # concurrent exports
+BULK_EXPORT_MAX_PATIENTS = int(os.environ.get("EHR_BULK_EXPORT_MAX_PATIENTS", 50000))
+BULK_EXPORT_DIR = os.environ.get("EHR_BULK_EXPORT_DIR", os.path.join(os.getcwd(), "exports", "bulk"))
+PENDING_PER_WORKER = 2
+PROGRESS_KEEP = 50          # finished exports whose progress stays queryable
+PROGRESS_LOG_EVERY = 250
+
+_EXPORT_ID_RE = re.compile(r"^[0-9a-f]{12}$")
+
+
+class BulkExportBusy(Exception):
+    pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(BULK_EXPORT_MAX_ACTIVE)
+_progress = OrderedDict()
+_progress_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, not fork: the app process is multi-threaded
+            _executor = ProcessPoolExecutor(max_workers=BULK_EXPORT_WORKERS,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def shutdown():
+    _reset_executor()
+
+
+# ---------- worker side ----------
+def _render_patient(record):
+    """
+    Runs in a pool process. Returns (patient_id, pdf_path, csv_text).
+    The PDF goes through the export cache, so unchanged records are
+    not rendered again.
+    """
+    patient = record["patient"]
+    pdf_path = generate_patient_pdf(patient, record["prescriptions"], record["reports"])
+    buf = io.StringIO()
+    write_patient_csv(buf, patient, record["prescriptions"], record["reports"])
+    return patient["patient_id"], pdf_path, buf.getvalue()
+
+
+# ---------- app side ----------
+def resolve_patient_ids(cursor, doctor_id=None, patient_ids=None, everyone=False):
+    """
+    Patient IDs for an export: an explicit list, a doctor's panel, or
+    (everyone=True) the whole hospital. Unknown IDs are dropped.
+    """
+    if patient_ids:
+        ids = sorted({int(p) for p in patient_ids})
+        placeholders = ", ".join(["%s"] * len(ids))
+        cursor.execute(f"SELECT patient_id FROM patients WHERE patient_id IN ({placeholders}) ORDER BY patient_id", ids)
+    elif doctor_id is not None:
+        cursor.execute("SELECT patient_id FROM patients WHERE doctor_id=%s ORDER BY patient_id", (doctor_id,))
+    elif everyone:
+        cursor.execute("SELECT patient_id FROM patients ORDER BY patient_id")
+    else:
+        return []
+    return [row["patient_id"] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+
+
+class _ZipSink:
+    """
+    Write-only, non-seekable target for ZipFile; drain() hands back
+    the bytes written since the last call.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class BulkExport:
+    """
+    One bulk export. Construct it (this takes one of the
+    BULK_EXPORT_MAX_ACTIVE slots or raises BulkExportBusy), then either
+    iterate stream() or call write_to(path). release() frees the slot
+    and is safe to call more than once.
+    """
+
+    def __init__(self, patient_ids, label="export"):
+        if len(patient_ids) > BULK_EXPORT_MAX_PATIENTS:
+            raise ValueError(f"At most {BULK_EXPORT_MAX_PATIENTS} patients per export")
+        if not _slots.acquire(blocking=False):
+            raise BulkExportBusy(f"{BULK_EXPORT_MAX_ACTIVE} bulk exports already running")
+
+        self.id = uuid.uuid4().hex[:12]
+        self.label = label
+        self.patient_ids = list(patient_ids)
+        self._released = False
+        self._started = None
+        self.errors = []
+        self.progress = {
+            "id": self.id,
+            "label": label,
+            "status": "queued",
+            "total": len(self.patient_ids),
+            "done": 0,
+            "failed": 0,
+            "workers": BULK_EXPORT_WORKERS,
+            "file": None,
+        }
+        with _progress_lock:
+            _progress[self.id] = self.progress
+            while len(_progress) > PROGRESS_KEEP + BULK_EXPORT_MAX_ACTIVE:
+                _progress.popitem(last=False)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            _slots.release()
+
+    # ---------- progress ----------
+    def _update(self, **changes):
+        with _progress_lock:
+            self.progress.update(changes)
+            finished = self.progress["done"] + self.progress["failed"]
+            elapsed = time.monotonic() - self._started if self._started else 0.0
+            rate = finished / elapsed if elapsed > 0 else 0.0
+            self.progress["elapsed_s"] = round(elapsed, 2)
+            self.progress["per_second"] = round(rate, 2)
+            self.progress["eta_s"] = round((self.progress["total"] - finished) / rate, 1) if rate else None
+            self.progress["percent"] = round(100.0 * finished / self.progress["total"], 1) if self.progress["total"] else 100.0
+
+    def _finished_one(self, ok):
+        key = "done" if ok else "failed"
+        with _progress_lock:
+            self.progress[key] += 1
+            finished = self.progress["done"] + self.progress["failed"]
+        self._update()
+        if finished % PROGRESS_LOG_EVERY == 0 or finished == self.progress["total"]:
+            print(f"📦 Bulk export {self.id}: {finished}/{self.progress['total']} patients")
+
+    # ---------- pipeline ----------
+    def _records(self):
+        with database.pooled_connection() as conn:
+            cur = conn.cursor(dictionary=True)
+            try:
+                for pid in self.patient_ids:
+                    try:
+                        record = load_patient_record(cur, pid)
+                    except Exception as e:
+                        self.errors.append((pid, f"load failed: {e}"))
+                        self._finished_one(False)
+                        continue
+                    if record is None:
+                        self.errors.append((pid, "patient not found"))
+                        self._finished_one(False)
+                        continue
+                    yield record
+            finally:
+                cur.close()
+
+    def _results(self):
+        """
+        Yield (patient_id, pdf_path, csv_text) in completion order, with
+        at most PENDING_PER_WORKER records per worker in flight.
+        """
+        executor = _get_executor()
+        limit = BULK_EXPORT_WORKERS * PENDING_PER_WORKER
+        records = self._records()
+        pending = {}
+
+        def fill():
+            while len(pending) < limit:
+                record = next(records, None)
+                if record is None:
+                    return
+                pending[executor.submit(_render_patient, record)] = record["patient"]["patient_id"]
+
+        try:
+            fill()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pid = pending.pop(future)
+                    try:
+                        yield future.result()
+                    except BrokenProcessPool:
+                        _reset_executor()
+                        raise
+                    except Exception as e:
+                        self.errors.append((pid, f"render failed: {e}"))
+                        self._finished_one(False)
+                fill()
+        finally:
+            for future in pending:
+                future.cancel()
+            records.close()
+
+    def _write_zip(self, fileobj):
+        """
+        Generator: writes one patient at a time into `fileobj` and yields
+        after each, so a streaming caller can flush what was written.
+        """
+        self._started = time.monotonic()
+        self._update(status="running")
+        try:
+            with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for pid, pdf_path, csv_text in self._results():
+                    folder = f"patient_{pid}"
+                    # PDFs are already compressed
+                    zf.write(pdf_path, f"{folder}/summary.pdf", compress_type=zipfile.ZIP_STORED)
+                    zf.writestr(f"{folder}/record.csv", csv_text)
+                    self._finished_one(True)
+                    yield
+
+                manifest = [f"export,{self.id}", f"patients,{self.progress['total']}",
+                            f"exported,{self.progress['done']}", f"failed,{self.progress['failed']}"]
+                manifest += [f"error,{pid},{msg}" for pid, msg in self.errors]
+                zf.writestr("manifest.csv", "\n".join(manifest) + "\n")
+            self._update(status="finished")
+            yield
+        except GeneratorExit:
+            self._update(status="cancelled")
+            raise
+        except Exception as e:
+            self._update(status="failed", error=str(e))
+            raise
+        finally:
+            self.release()
+
+    def stream(self):
+        """
+        ZIP bytes, produced as patients finish rendering.
+        """
+        sink = _ZipSink()
+        for _ in self._write_zip(sink):
+            data = sink.drain()
+            if data:
+                yield data
+
+    def write_to(self, path):
+        """
+        Write the ZIP to `path` (atomically) and return it.
+        """
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                for _ in self._write_zip(f):
+                    pass
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._update(file=os.path.basename(path))
+        return path
+
+    def write_in_background(self):
+        """
+        Write into BULK_EXPORT_DIR on a daemon thread; poll
+        get_progress() until it is finished, then use export_path().
+        """
+        os.makedirs(BULK_EXPORT_DIR, exist_ok=True)
+        path = os.path.join(BULK_EXPORT_DIR, f"bulk_{self.label}_{self.id}.zip")
+
+        def run():
+            try:
+                self.write_to(path)
+            except Exception as e:
+                print(f"❌ Bulk export {self.id} failed: {e}")
+
+        threading.Thread(target=run, name=f"bulk-export-{self.id}", daemon=True).start()
+        return path
+
+
+def get_progress(export_id=None):
+    with _progress_lock:
+        if export_id is not None:
+            entry = _progress.get(export_id)
+            return dict(entry) if entry else None
+        return [dict(p) for p in _progress.values()]
+
+
+def export_path(export_id):
+    """
+    Path of the finished background ZIP for `export_id`, or None.
+    """
+    if not _EXPORT_ID_RE.match(export_id or ""):
+        return None
+    try:
+        names = os.listdir(BULK_EXPORT_DIR)
+    except FileNotFoundError:
+        return None
+    suffix = f"_{export_id}.zip"
+    for name in names:
+        if name.startswith("bulk_") and name.endswith(suffix):
+            return os.path.join(BULK_EXPORT_DIR, name)
+    return None
+
+
+def init_app(app):
+    @app.cli.command("bulk-export")
+    @click.option("--doctor-id", type=int, help="Export this doctor's whole panel.")
+    @click.option("--patients", help="Comma-separated patient IDs.")
+    @click.option("--all", "everyone", is_flag=True, help="Export every patient.")
+    @click.option("--out", required=True, type=click.Path(dir_okay=False), help="ZIP file to write.")
+    def bulk_export_command(doctor_id, patients, everyone, out):
+        """Render patient PDFs + CSVs in parallel into one ZIP file."""
+        ids = [p for p in (patients or "").split(",") if p.strip()]
+        conn = database.connect_db()
+        cur = conn.cursor(dictionary=True)
+        patient_ids = resolve_patient_ids(cur, doctor_id, ids, everyone)
+        cur.close()
+        conn.close()
+
+        if not patient_ids:
+            raise click.UsageError("No patients selected")
+
+        export = BulkExport(patient_ids, label=f"doctor_{doctor_id}" if doctor_id else "patients")
+        try:
+            export.write_to(out)
+        finally:
+            shutdown()
+        p = export.progress
+        print(f"✅ Wrote {out}: {p['done']} exported, {p['failed']} failed in {p['elapsed_s']}s")
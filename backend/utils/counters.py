@@ -0,0 +1,302 @@
+import database
+
+# ----------------------------------------
+# Materialized dashboard counters
+# ----------------------------------------
+# dashboard_counters holds one row per (scope, scope_id, name):
+#   ("global", 0, "patients")        -> total patients
+#   ("doctor", <doctor_id>, "ai_logs") -> AI log rows for that doctor
+# MySQL triggers keep the rows current on every INSERT / DELETE (and on
+# UPDATEs that move a row to another doctor), so dashboards read a few
+# primary-key rows instead of running COUNT(*) scans.
+#
+# patient_visit_stats is the per-patient equivalent (last visit,
+# prescription and report counts, owning doctor), indexed on
+# (doctor_id, last_visit) for the doctor dashboard's recent patients.
+
+# table -> counter name, and whether it is also counted per doctor
+COUNTED_TABLES = {
+    "doctors": ("doctors", False),
+    "patients": ("patients", True),
+    "prescriptions": ("prescriptions", True),
+    "lab_reports": ("lab_reports", True),
+    "ai_logs": ("ai_logs", True),
+}
+
+GLOBAL_COUNTERS = ("doctors", "patients", "prescriptions", "lab_reports")
+DOCTOR_COUNTERS = ("patients", "prescriptions", "lab_reports", "ai_logs")
+
+COUNTERS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS dashboard_counters (
+    scope ENUM('global','doctor') NOT NULL,
+    scope_id INT NOT NULL,
+    name VARCHAR(50) NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, scope_id, name)
+)
+"""
+
+PATIENT_STATS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS patient_visit_stats (
+    patient_id INT PRIMARY KEY,
+    doctor_id INT,
+    last_visit TIMESTAMP NULL DEFAULT NULL,
+    prescription_count INT NOT NULL DEFAULT 0,
+    report_count INT NOT NULL DEFAULT 0,
+    KEY idx_pvs_doctor_last_visit (doctor_id, last_visit)
+)
+"""
+
+_PATIENT_DOCTOR = "(SELECT doctor_id FROM patients WHERE patient_id = {row}.patient_id)"
+_LAST_VISIT = "(SELECT MAX(created_at) FROM prescriptions WHERE patient_id = {row}.patient_id)"
+
+PATIENT_STATS_TRIGGERS = {
+    "trg_patients_stats_insert": """
+        CREATE TRIGGER trg_patients_stats_insert AFTER INSERT ON patients
+        FOR EACH ROW BEGIN
+            INSERT INTO patient_visit_stats (patient_id, doctor_id) VALUES (NEW.patient_id, NEW.doctor_id)
+            ON DUPLICATE KEY UPDATE doctor_id = NEW.doctor_id;
+        END""",
+    "trg_patients_stats_update": """
+        CREATE TRIGGER trg_patients_stats_update AFTER UPDATE ON patients
+        FOR EACH ROW BEGIN
+            IF NOT (OLD.doctor_id <=> NEW.doctor_id) THEN
+                UPDATE patient_visit_stats SET doctor_id = NEW.doctor_id WHERE patient_id = NEW.patient_id;
+            END IF;
+        END""",
+    "trg_patients_stats_delete": """
+        CREATE TRIGGER trg_patients_stats_delete AFTER DELETE ON patients
+        FOR EACH ROW BEGIN
+            DELETE FROM patient_visit_stats WHERE patient_id = OLD.patient_id;
+        END""",
+    "trg_prescriptions_stats_insert": f"""
+        CREATE TRIGGER trg_prescriptions_stats_insert AFTER INSERT ON prescriptions
+        FOR EACH ROW BEGIN
+            INSERT INTO patient_visit_stats (patient_id, doctor_id, last_visit, prescription_count)
+            VALUES (NEW.patient_id, {_PATIENT_DOCTOR.format(row="NEW")}, NEW.created_at, 1)
+            ON DUPLICATE KEY UPDATE
+                prescription_count = prescription_count + 1,
+                last_visit = GREATEST(COALESCE(last_visit, NEW.created_at), NEW.created_at);
+        END""",
+    "trg_prescriptions_stats_update": f"""
+        CREATE TRIGGER trg_prescriptions_stats_update AFTER UPDATE ON prescriptions
+        FOR EACH ROW BEGIN
+            IF NOT (OLD.patient_id <=> NEW.patient_id) THEN
+                UPDATE patient_visit_stats
+                SET prescription_count = prescription_count - 1, last_visit = {_LAST_VISIT.format(row="OLD")}
+                WHERE patient_id = OLD.patient_id;
+                UPDATE patient_visit_stats
+                SET prescription_count = prescription_count + 1, last_visit = {_LAST_VISIT.format(row="NEW")}
+                WHERE patient_id = NEW.patient_id;
+            ELSEIF NOT (OLD.created_at <=> NEW.created_at) THEN
+                UPDATE patient_visit_stats SET last_visit = {_LAST_VISIT.format(row="NEW")}
+                WHERE patient_id = NEW.patient_id;
+            END IF;
+        END""",
+    "trg_prescriptions_stats_delete": f"""
+        CREATE TRIGGER trg_prescriptions_stats_delete AFTER DELETE ON prescriptions
+        FOR EACH ROW BEGIN
+            UPDATE patient_visit_stats
+            SET prescription_count = prescription_count - 1, last_visit = {_LAST_VISIT.format(row="OLD")}
+            WHERE patient_id = OLD.patient_id;
+        END""",
+    "trg_lab_reports_stats_insert": f"""
+        CREATE TRIGGER trg_lab_reports_stats_insert AFTER INSERT ON lab_reports
+        FOR EACH ROW BEGIN
+            INSERT INTO patient_visit_stats (patient_id, doctor_id, report_count)
+            VALUES (NEW.patient_id, {_PATIENT_DOCTOR.format(row="NEW")}, 1)
+            ON DUPLICATE KEY UPDATE report_count = report_count + 1;
+        END""",
+    "trg_lab_reports_stats_update": """
+        CREATE TRIGGER trg_lab_reports_stats_update AFTER UPDATE ON lab_reports
+        FOR EACH ROW BEGIN
+            IF NOT (OLD.patient_id <=> NEW.patient_id) THEN
+                UPDATE patient_visit_stats SET report_count = report_count - 1 WHERE patient_id = OLD.patient_id;
+                UPDATE patient_visit_stats SET report_count = report_count + 1 WHERE patient_id = NEW.patient_id;
+            END IF;
+        END""",
+    "trg_lab_reports_stats_delete": """
+        CREATE TRIGGER trg_lab_reports_stats_delete AFTER DELETE ON lab_reports
+        FOR EACH ROW BEGIN
+            UPDATE patient_visit_stats SET report_count = report_count - 1 WHERE patient_id = OLD.patient_id;
+        END""",
+}
+
+# Doctor dashboard "recent patients": at most 2 * limit index rows are read
+# from patient_visit_stats, however many patients the doctor has.
+RECENT_PATIENTS_SQL = """
+    SELECT
+        p.patient_id,
+        p.first_name,
+        p.last_name,
+        TIMESTAMPDIFF(YEAR, p.dob, CURDATE()) AS age,
+        p.phone,
+        p.address,
+        s.last_visit,
+        s.prescription_count,
+        s.report_count
+    FROM (
+        (SELECT patient_id, last_visit, prescription_count, report_count
+         FROM patient_visit_stats
+         WHERE doctor_id=%(did)s AND last_visit IS NOT NULL
+         ORDER BY last_visit DESC
+         LIMIT %(limit)s)
+        UNION ALL
+        (SELECT patient_id, last_visit, prescription_count, report_count
+         FROM patient_visit_stats
+         WHERE doctor_id=%(did)s AND last_visit IS NULL
+         LIMIT %(limit)s)
+    ) s
+    JOIN patients p ON p.patient_id = s.patient_id
+    ORDER BY (s.last_visit IS NULL), s.last_visit DESC
+    LIMIT %(limit)s
+"""
+
+
+def _bump(scope, scope_id, name, delta):
+    return (f"INSERT INTO dashboard_counters (scope, scope_id, name, value) "
+            f"VALUES ('{scope}', {scope_id}, '{name}', {delta}) "
+            f"ON DUPLICATE KEY UPDATE value = value + ({delta});")
+
+
+def _trigger_sql(table, name, per_doctor):
+    triggers = {}
+
+    for event, row, delta in (("INSERT", "NEW", 1), ("DELETE", "OLD", -1)):
+        body = _bump("global", 0, name, delta)
+        if per_doctor:
+            body += (f" IF {row}.doctor_id IS NOT NULL THEN "
+                     f"{_bump('doctor', f'{row}.doctor_id', name, delta)} END IF;")
+        triggers[f"trg_{table}_count_{event.lower()}"] = (
+            f"CREATE TRIGGER trg_{table}_count_{event.lower()} AFTER {event} ON {table} "
+            f"FOR EACH ROW BEGIN {body} END"
+        )
+
+    if per_doctor:
+        body = ("IF NOT (OLD.doctor_id <=> NEW.doctor_id) THEN "
+                f"IF OLD.doctor_id IS NOT NULL THEN {_bump('doctor', 'OLD.doctor_id', name, -1)} END IF; "
+                f"IF NEW.doctor_id IS NOT NULL THEN {_bump('doctor', 'NEW.doctor_id', name, 1)} END IF; "
+                "END IF;")
+        triggers[f"trg_{table}_count_update"] = (
+            f"CREATE TRIGGER trg_{table}_count_update AFTER UPDATE ON {table} "
+            f"FOR EACH ROW BEGIN {body} END"
+        )
+
+    return triggers
+
+
+def install(cursor):
+    """
+    Create the counters table and (re)create its triggers.
+    Safe to run multiple times.
+    """
+    cursor.execute(COUNTERS_TABLE_SQL)
+    cursor.execute(PATIENT_STATS_TABLE_SQL)
+
+    triggers = dict(PATIENT_STATS_TRIGGERS)
+    for table, (name, per_doctor) in COUNTED_TABLES.items():
+        triggers.update(_trigger_sql(table, name, per_doctor))
+
+    for trigger, sql in triggers.items():
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute(sql)
+
+    cursor.execute("SELECT (SELECT COUNT(*) FROM dashboard_counters), (SELECT COUNT(*) FROM patient_visit_stats)")
+    counters_rows, stats_rows = cursor.fetchone()
+    if not counters_rows or not stats_rows:
+        _rebuild(cursor)
+
+
+def _rebuild(cursor):
+    cursor.execute("DELETE FROM dashboard_counters")
+
+    for table, (name, per_doctor) in COUNTED_TABLES.items():
+        cursor.execute(f"""
+            INSERT INTO dashboard_counters (scope, scope_id, name, value)
+            SELECT 'global', 0, %s, COUNT(*) FROM {table}
+        """, (name,))
+
+        if per_doctor:
+            cursor.execute(f"""
+                INSERT INTO dashboard_counters (scope, scope_id, name, value)
+                SELECT 'doctor', doctor_id, %s, COUNT(*)
+                FROM {table}
+                WHERE doctor_id IS NOT NULL
+                GROUP BY doctor_id
+            """, (name,))
+
+    # No table aliases here: LOCK TABLES would require them to be locked too
+    cursor.execute("DELETE FROM patient_visit_stats")
+    cursor.execute("""
+        INSERT INTO patient_visit_stats
+            (patient_id, doctor_id, last_visit, prescription_count, report_count)
+        SELECT patients.patient_id, patients.doctor_id, pr.last_visit,
+               COALESCE(pr.total, 0), COALESCE(lr.total, 0)
+        FROM patients
+        LEFT JOIN (
+            SELECT patient_id, MAX(created_at) AS last_visit, COUNT(*) AS total
+            FROM prescriptions GROUP BY patient_id
+        ) pr ON pr.patient_id = patients.patient_id
+        LEFT JOIN (
+            SELECT patient_id, COUNT(*) AS total
+            FROM lab_reports GROUP BY patient_id
+        ) lr ON lr.patient_id = patients.patient_id
+    """)
+
+
+def rebuild():
+    """
+    Recompute every counter and patient_visit_stats from the base tables
+    (use if they drift).
+    Tables are read-locked while counting so no write is missed.
+    """
+    conn = database.connect_db()
+    cursor = conn.cursor()
+
+    try:
+        tables = ", ".join(f"{t} READ" for t in COUNTED_TABLES)
+        cursor.execute(f"LOCK TABLES dashboard_counters WRITE, patient_visit_stats WRITE, {tables}")
+        _rebuild(cursor)
+        conn.commit()
+        cursor.execute("UNLOCK TABLES")
+    except Exception:
+        conn.rollback()
+        cursor.execute("UNLOCK TABLES")
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_counters(cursor, scope="global", scope_id=0, names=GLOBAL_COUNTERS):
+    """
+    Read precomputed counters with one primary-key lookup.
+    Works with dictionary and tuple cursors; missing counters are 0.
+    """
+    cursor.execute("""
+        SELECT name, value FROM dashboard_counters
+        WHERE scope=%s AND scope_id=%s
+    """, (scope, scope_id))
+
+    values = {name: 0 for name in names}
+    for row in cursor.fetchall():
+        name, value = (row["name"], row["value"]) if isinstance(row, dict) else row
+        if name in values:
+            values[name] = int(value)
+    return values
+
+
+def recent_patients(cursor, doctor_id, limit=8):
+    """
+    Most recently seen patients of a doctor (never-seen patients last).
+    """
+    cursor.execute(RECENT_PATIENTS_SQL, {"did": doctor_id, "limit": int(limit)})
+    return cursor.fetchall()
+
+
+def init_app(app):
+    @app.cli.command("rebuild-counters")
+    def rebuild_counters_command():
+        """Recompute dashboard counters and patient visit stats."""
+        rebuild()
+        print("✅ Dashboard counters rebuilt")
@@ -0,0 +1,171 @@
+import io
+import csv
+
+import database
+from utils.export_utils import medicines_text
+from utils.patient_records import decode_medicines
+
+# ----------------------------------------
+# Streaming CSV exports
+# ----------------------------------------
+# Rows are read from an unbuffered cursor FETCH_SIZE at a time and
+# written straight into the response, so memory stays flat and the
+# first bytes go out before the last row has been read, however many
+# years of records a patient (or a doctor's panel) has. Each stream
+# checks out its own pooled connection: the request connection is
+# returned at teardown, before a streamed body is sent.
+
+FETCH_SIZE = 500
+
+PATIENT_HEADER_SQL = "SELECT patient_id, first_name, last_name, username FROM patients WHERE patient_id=%s"
+
+PATIENT_PRESCRIPTIONS_SQL = """
+    SELECT pr.created_at, d.name AS doctor_name, pr.diagnosis, pr.prescription_text, pr.medicines
+    FROM prescriptions pr
+    LEFT JOIN doctors d ON pr.doctor_id = d.doctor_id
+    WHERE pr.patient_id = %s
+    ORDER BY pr.created_at DESC
+"""
+
+PATIENT_REPORTS_SQL = """
+    SELECT r.upload_date, r.report_name, r.report_file, d.name AS doctor_name
+    FROM lab_reports r
+    LEFT JOIN doctors d ON r.doctor_id = d.doctor_id
+    WHERE r.patient_id = %s
+    ORDER BY r.upload_date DESC
+"""
+
+PANEL_PRESCRIPTIONS_SQL = """
+    SELECT pa.patient_id, pa.first_name, pa.last_name,
+           pr.created_at, d.name AS doctor_name, pr.diagnosis, pr.prescription_text, pr.medicines
+    FROM patients pa
+    JOIN prescriptions pr ON pr.patient_id = pa.patient_id
+    LEFT JOIN doctors d ON pr.doctor_id = d.doctor_id
+    WHERE pa.doctor_id = %s
+    ORDER BY pa.patient_id, pr.created_at DESC
+"""
+
+PANEL_REPORTS_SQL = """
+    SELECT pa.patient_id, pa.first_name, pa.last_name,
+           r.upload_date, r.report_name, r.report_file, d.name AS doctor_name
+    FROM patients pa
+    JOIN lab_reports r ON r.patient_id = pa.patient_id
+    LEFT JOIN doctors d ON r.doctor_id = d.doctor_id
+    WHERE pa.doctor_id = %s
+    ORDER BY pa.patient_id, r.upload_date DESC
+"""
+
+
+class _CsvBuffer:
+    """
+    csv.writer target that hands back what has been written so far.
+    """
+
+    def __init__(self):
+        self._buf = io.StringIO()
+        self.writer = csv.writer(self._buf)
+
+    def drain(self):
+        data = self._buf.getvalue()
+        self._buf.seek(0)
+        self._buf.truncate()
+        return data
+
+
+def _rows(cursor, sql, params, size):
+    """
+    Yield batches of rows from an unbuffered cursor. The result set is
+    always read to the end so the next query can run on the connection.
+    """
+    cursor.execute(sql, params)
+    while True:
+        batch = cursor.fetchmany(size)
+        if not batch:
+            return
+        yield batch
+
+
+def _stream(sections, size):
+    """
+    sections: list of (title_rows, sql, params, row_fn). Each SQL result
+    is streamed in turn; row_fn turns a row dict into a CSV row.
+    """
+    out = _CsvBuffer()
+    with database.pooled_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            for title_rows, sql, params, row_fn in sections:
+                for row in title_rows:
+                    out.writer.writerow(row)
+                for batch in _rows(cursor, sql, params, size):
+                    for row in batch:
+                        out.writer.writerow(row_fn(row))
+                    yield out.drain()
+            yield out.drain()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                # client went away mid-result; release() discards the connection
+                pass
+
+
+def _prescription_row(row):
+    return [row["created_at"], row.get("doctor_name") or "", row.get("diagnosis") or "",
+            row.get("prescription_text") or "", medicines_text(decode_medicines(row.get("medicines")))]
+
+
+def _report_row(row):
+    return [row["upload_date"], row.get("report_name") or "", row.get("report_file") or "", row.get("doctor_name") or ""]
+
+
+def _panel_row(row_fn):
+    return lambda row: [row["patient_id"], f"{row.get('first_name','')} {row.get('last_name','')}"] + row_fn(row)
+
+
+def load_csv_patient(cursor, patient_id):
+    """
+    The patient fields the CSV header needs, or None.
+    """
+    cursor.execute(PATIENT_HEADER_SQL, (patient_id,))
+    return cursor.fetchone()
+
+
+def stream_patient_csv(patient, size=FETCH_SIZE):
+    """
+    Same layout as export_patient_csv(), generated chunk by chunk.
+    `patient` only needs patient_id, first_name, last_name, username.
+    """
+    pid = patient["patient_id"]
+    return _stream([
+        ([["Patient ID", pid],
+          ["Name", f"{patient.get('first_name','')} {patient.get('last_name','')}"],
+          ["Username", patient.get("username", "")],
+          [],
+          ["Prescriptions"],
+          ["Date", "Doctor", "Diagnosis", "Prescription", "Medicines"]],
+         PATIENT_PRESCRIPTIONS_SQL, (pid,), _prescription_row),
+        ([[], ["Lab Reports"], ["Date", "Name", "File", "Doctor"]],
+         PATIENT_REPORTS_SQL, (pid,), _report_row),
+    ], size)
+
+
+def stream_panel_csv(doctor_id, size=FETCH_SIZE):
+    """
+    Every prescription and lab report of a doctor's patients, with the
+    patient in the first two columns.
+    """
+    return _stream([
+        ([["Prescriptions"],
+          ["Patient ID", "Patient", "Date", "Doctor", "Diagnosis", "Prescription", "Medicines"]],
+         PANEL_PRESCRIPTIONS_SQL, (doctor_id,), _panel_row(_prescription_row)),
+        ([[], ["Lab Reports"], ["Patient ID", "Patient", "Date", "Name", "File", "Doctor"]],
+         PANEL_REPORTS_SQL, (doctor_id,), _panel_row(_report_row)),
+    ], size)
+
+
+def csv_response_headers(filename):
+    return {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "X-Accel-Buffering": "no",
+    }
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# Defaults (override with environment variables)
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get("EHR_EXPORT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+EXPORT_CACHE_MAX_AGE = float(os.environ.get("EHR_EXPORT_CACHE_MAX_AGE", 7 * 24 * 3600))       # seconds
+EXPORT_CACHE_SWEEP_INTERVAL = float(os.environ.get("EHR_EXPORT_CACHE_SWEEP_INTERVAL", 60))    # seconds
+
+
+class ExportCache:
+    """
+    Content-addressed file cache for generated exports.
+
+    A file is named after a hash of (kind, layout version, data), so an
+    unchanged record maps to the same file and is served from disk.
+    Hits refresh the file's mtime; sweeps delete files older than
+    max_age and then the least recently used ones until the directory
+    is under max_bytes. Sweeps cover every file in the directory, so
+    stale exports written by older code are cleaned up too.
+    """
+
+    def __init__(self, directory, version="1", max_bytes=EXPORT_CACHE_MAX_BYTES,
+                 max_age=EXPORT_CACHE_MAX_AGE, sweep_interval=EXPORT_CACHE_SWEEP_INTERVAL):
+        self.directory = directory
+        self.version = version
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._last_sweep = 0.0
+        self._stats = {"hits": 0, "misses": 0, "evicted_files": 0, "evicted_bytes": 0, "sweeps": 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, kind, payload):
+        raw = json.dumps([kind, self.version, payload], sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def _key_lock(self, name):
+        with self._lock:
+            return self._key_locks.setdefault(name, threading.Lock())
+
+    def _bump(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def get_or_render(self, kind, payload, render, ext="pdf", prefix=None):
+        """
+        Return the path of the cached export for `payload`, calling
+        render(path) to create it on a miss. Rendering goes to a temp
+        file that is renamed into place, so readers never see half a file.
+        """
+        name = f"{prefix or kind}_{self.key(kind, payload)}.{ext}"
+        path = os.path.join(self.directory, name)
+
+        with self._key_lock(name):
+            if os.path.exists(path):
+                os.utime(path, None)
+                self._bump("hits")
+                return path
+
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                render(tmp)
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            self._bump("misses")
+
+        with self._lock:
+            self._key_locks.pop(name, None)
+
+        self.maybe_sweep()
+        return path
+
+    def get_or_render_many(self, kind, payloads, render_many, ext="pdf", prefixes=None):
+        """
+        Batch get_or_render(): render_many(payloads) -> list of bytes is
+        called once with every payload not already on disk. Returns the
+        paths in input order.
+        """
+        prefixes = prefixes or [None] * len(payloads)
+        names = [f"{prefix or kind}_{self.key(kind, payload)}.{ext}" for payload, prefix in zip(payloads, prefixes)]
+        paths = [os.path.join(self.directory, name) for name in names]
+
+        missing = {}            # name -> payload, first occurrence wins
+        for name, path, payload in zip(names, paths, payloads):
+            if name in missing:
+                continue
+            if os.path.exists(path):
+                os.utime(path, None)
+                self._bump("hits")
+            else:
+                missing[name] = payload
+        if not missing:
+            return paths
+
+        rendered = render_many(list(missing.values()))
+        for name, data in zip(missing, rendered):
+            path = os.path.join(self.directory, name)
+            with self._key_lock(name):
+                if not os.path.exists(path):
+                    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    try:
+                        with open(tmp, "wb") as f:
+                            f.write(data)
+                        os.replace(tmp, path)
+                    finally:
+                        if os.path.exists(tmp):
+                            os.remove(tmp)
+            with self._lock:
+                self._key_locks.pop(name, None)
+        self._bump("misses", len(missing))
+
+        self.maybe_sweep()
+        return paths
+
+    def maybe_sweep(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+        self.sweep()
+
+    def sweep(self):
+        """
+        Evict by age, then least-recently-used until under max_bytes.
+        """
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            st = entry.stat()
+            files.append((st.st_mtime, st.st_size, entry.path))
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        evicted = evicted_bytes = 0
+
+        for mtime, size, path in files:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+            evicted_bytes += size
+
+        with self._lock:
+            self._stats["sweeps"] += 1
+            self._stats["evicted_files"] += evicted
+            self._stats["evicted_bytes"] += evicted_bytes
+            self._stats["size_bytes"] = total
+            self._stats["files"] = len(files) - evicted
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        lookups = data["hits"] + data["misses"]
+        data["hit_ratio"] = round(data["hits"] / lookups, 3) if lookups else 0.0
+        data["max_bytes"] = self.max_bytes
+        data["max_age_seconds"] = self.max_age
+        return data
@@ -0,0 +1,69 @@
+import os
+import time
+import shutil
+import secrets
+
+import database
+from utils.jobs import job_queue, JobError, JOB_TTL
+from utils.export_utils import generate_patient_pdf, write_patient_csv
+from utils.patient_records import load_patient_record
+
+# ----------------------------------------
+# Export job handlers
+# ----------------------------------------
+# Results are random file names under JOB_EXPORT_DIR - outside static/
+# and the export cache, so they are only reachable through the
+# ownership-checked /jobs/<id>/download and are not swept by the cache
+# before the job expires. Files older than JOB_TTL are removed as new
+# jobs run.
+
+EXPORT_FORMATS = ("pdf", "csv")
+JOB_EXPORT_DIR = os.environ.get("EHR_JOB_EXPORT_DIR", os.path.join(os.getcwd(), "exports", "jobs"))
+
+
+def _sweep(now):
+    try:
+        entries = list(os.scandir(JOB_EXPORT_DIR))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > JOB_TTL:
+                os.remove(entry.path)
+        except OSError:
+            continue
+
+
+@job_queue.handler("patient_export")
+def patient_export(patient_id, fmt="pdf"):
+    if fmt not in EXPORT_FORMATS:
+        raise JobError(f"Unknown export format: {fmt}")
+
+    with database.pooled_connection() as conn:
+        cur = conn.cursor(dictionary=True)
+        try:
+            record = load_patient_record(cur, patient_id)
+        finally:
+            cur.close()
+
+    if not record:
+        raise JobError("Patient record not found")
+
+    os.makedirs(JOB_EXPORT_DIR, exist_ok=True)
+    _sweep(time.time())
+
+    name = f"patient_{patient_id}_{secrets.token_hex(16)}.{fmt}"
+    path = os.path.join(JOB_EXPORT_DIR, name)
+    tmp = path + ".tmp"
+    try:
+        if fmt == "pdf":
+            # rendered (or reused) through the export cache, then copied out
+            shutil.copyfile(generate_patient_pdf(record["patient"], record["prescriptions"], record["reports"]), tmp)
+        else:
+            with open(tmp, "w", newline="", encoding="utf-8") as f:
+                write_patient_csv(f, record["patient"], record["prescriptions"], record["reports"])
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return name
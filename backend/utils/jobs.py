@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+
+# ----------------------------------------
+# Background job queue (in-process)
+# ----------------------------------------
+# Long-running work (PDF / CSV exports) is submitted here instead of
+# running inside the HTTP request. The caller gets a job id back and
+# polls its status. Jobs run on a small pool of daemon threads fed by
+# a bounded queue; nothing beyond the app process is needed.
+#
+#   - identical jobs (same kind + params) that are still queued or
+#     running are deduplicated: the second caller gets the same job
+#   - a handler failure is retried with exponential backoff, unless it
+#     raises JobError (a permanent failure, e.g. record not found)
+#   - finished jobs are kept for JOB_TTL seconds, then forgotten
+
+JOB_WORKERS = int(os.environ.get("EHR_JOB_WORKERS", 4))
+JOB_QUEUE_SIZE = int(os.environ.get("EHR_JOB_QUEUE_SIZE", 200))
+JOB_MAX_ATTEMPTS = int(os.environ.get("EHR_JOB_MAX_ATTEMPTS", 3))
+JOB_RETRY_DELAY = float(os.environ.get("EHR_JOB_RETRY_DELAY", 1.0))   # seconds, doubled per retry
+JOB_TTL = float(os.environ.get("EHR_JOB_TTL", 3600))                   # seconds a finished job is kept
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class JobError(Exception):
+    """
+    Raised by a handler for a failure that retrying cannot fix.
+    """
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    __slots__ = ("id", "kind", "params", "key", "owners", "status", "attempts",
+                 "result", "error", "created_at", "started_at", "finished_at")
+
+    def __init__(self, kind, params, key, owner):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.key = key
+        self.owners = {owner}
+        self.status = QUEUED
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+
+    def __init__(self, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE,
+                 max_attempts=JOB_MAX_ATTEMPTS, retry_delay=JOB_RETRY_DELAY, ttl=JOB_TTL):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.ttl = ttl
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._handlers = {}
+        self._jobs = {}          # job id -> Job
+        self._inflight = {}      # dedup key -> Job (queued or running)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stats = {"submitted": 0, "deduplicated": 0, "rejected": 0,
+                       "succeeded": 0, "failed": 0, "retries": 0}
+
+    def handler(self, kind):
+        """
+        Decorator registering fn(**params) -> result for a job kind.
+        """
+        def register(fn):
+            self._handlers[kind] = fn
+            return fn
+        return register
+
+    def _start(self):
+        # under self._lock
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _purge(self, now):
+        # under self._lock
+        expired = [jid for jid, job in self._jobs.items()
+                   if job.finished_at and now - job.finished_at > self.ttl]
+        for jid in expired:
+            del self._jobs[jid]
+
+    # ---------- submitting ----------
+    def submit(self, kind, params, owner):
+        """
+        Queue a job (or join an identical in-flight one) and return it.
+        `owner` is any hashable identity allowed to read the job.
+        Raises QueueFull when the queue is at capacity.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        key = kind + ":" + json.dumps(params, sort_keys=True, default=str)
+
+        with self._lock:
+            self._start()
+            self._purge(time.time())
+
+            job = self._inflight.get(key)
+            if job is not None:
+                job.owners.add(owner)
+                self._stats["deduplicated"] += 1
+                return job
+
+            job = Job(kind, params, key, owner)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self._stats["rejected"] += 1
+                raise QueueFull(f"Job queue is full ({self._queue.maxsize} jobs)")
+
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            self._stats["submitted"] += 1
+            return job
+
+    def get(self, job_id, owner=None):
+        """
+        The job, or None if unknown, expired or not visible to `owner`.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (owner is not None and owner not in job.owners):
+            return None
+        return job
+
+    # ---------- running ----------
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        fn = self._handlers[job.kind]
+        job.status = RUNNING
+        job.started_at = time.time()
+
+        while True:
+            job.attempts += 1
+            try:
+                result = fn(**job.params)
+            except JobError as e:
+                self._finish(job, FAILED, error=str(e))
+                return
+            except Exception as e:
+                if job.attempts >= self.max_attempts:
+                    print(f"❌ Job {job.kind} {job.id} failed after {job.attempts} attempts: {e}")
+                    self._finish(job, FAILED, error=str(e))
+                    return
+                with self._lock:
+                    self._stats["retries"] += 1
+                time.sleep(self.retry_delay * (2 ** (job.attempts - 1)))
+                continue
+
+            self._finish(job, SUCCEEDED, result=result)
+            return
+
+    def _finish(self, job, status, result=None, error=None):
+        with self._lock:
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            job.status = status
+            self._inflight.pop(job.key, None)
+            self._stats[status] += 1
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["queued"] = self._queue.qsize()
+            data["queue_size"] = self._queue.maxsize
+            data["running"] = sum(1 for j in self._inflight.values() if j.status == RUNNING)
+            data["workers"] = self.workers
+            data["tracked"] = len(self._jobs)
+        return data
+
+
+job_queue = JobQueue()
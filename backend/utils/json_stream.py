@@ -0,0 +1,136 @@
+import json
+
+# ----------------------------------------
+# Incremental JSON object parser
+# ----------------------------------------
+# Fed a model's output token by token, reports each top-level field of
+# the JSON object as soon as its value is complete, and each element of
+# a top-level array as soon as that element is complete - so
+# {"diagnosis": ..., "medicines": [{...}, {...}]} produces the diagnosis
+# and then every medicine without waiting for the closing brace.
+# Anything before the first "{" (e.g. a ```json fence) is skipped.
+
+
+class JSONFieldStream:
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self._pos = 0
+        self._start = None          # index of the top-level "{"
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"        # key / colon / value / in_value (at depth 1)
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+        self._item_start = None
+        self._in_array = False
+
+    def _load(self, raw):
+        try:
+            return True, json.loads(raw)
+        except ValueError:
+            return False, None
+
+    def feed(self, chunk):
+        """
+        Add text; returns a list of ("field", key, value) and
+        ("item", key, value) events completed by it.
+        """
+        events = []
+        self.text += chunk
+        text = self.text
+        i = self._pos
+
+        while i < len(text) and not self.done:
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key" and self._key_start is not None:
+                        ok, self._key = self._load(text[self._key_start:i + 1])
+                        self._key_start = None
+                        self._expect = "colon"
+                i += 1
+                continue
+
+            if self._start is None:
+                if c == "{":
+                    self._start = i
+                    self._depth = 1
+                i += 1
+                continue
+
+            if self._depth == 1:
+                if self._expect == "key":
+                    if c == '"':
+                        self._key_start = i
+                        self._in_string = True
+                    elif c == "}":
+                        self._depth = 0
+                        self.done = True
+                    i += 1
+                    continue
+                if self._expect == "colon":
+                    if c == ":":
+                        self._expect = "value"
+                    i += 1
+                    continue
+                if self._expect == "value":
+                    if c.isspace():
+                        i += 1
+                        continue
+                    self._value_start = i
+                    self._expect = "in_value"
+                    self._in_array = c == "["
+                    # fall through: the first char is processed below
+                elif c in ",}":
+                    # end of a top-level value
+                    ok, value = self._load(text[self._value_start:i])
+                    if ok:
+                        events.append(("field", self._key, value))
+                    self._expect = "key"
+                    self._key = None
+                    self._in_array = False
+                    if c == "}":
+                        self._depth = 0
+                        self.done = True
+                    i += 1
+                    continue
+
+            if self._depth == 2 and self._in_array:
+                if c in ",]":
+                    if self._item_start is not None:
+                        ok, value = self._load(text[self._item_start:i])
+                        if ok:
+                            events.append(("item", self._key, value))
+                        self._item_start = None
+                elif self._item_start is None and not c.isspace():
+                    self._item_start = i
+
+            if c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+            i += 1
+
+        self._pos = i
+        return events
+
+    def result(self):
+        """
+        The whole object once complete, else None.
+        """
+        if not self.done or self._start is None:
+            return None
+        ok, value = self._load(self.text[self._start:self._pos])
+        return value if ok and isinstance(value, dict) else None
@@ -0,0 +1,274 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# ----------------------------------------
+# LLM result cache
+# ----------------------------------------
+# Model results are keyed on (normalized text, patient context, model,
+# prompt version). Lookups go memory LRU -> on-disk SQLite store -> the
+# model; identical requests that arrive while a call is in flight wait
+# for that call instead of starting their own (single-flight). Each
+# entry remembers how long the original call took, so hits can report
+# the latency they saved.
+#
+# Entries hold model output, transcript included, so they do not outlive
+# LLM_CACHE_TTL on disk: a background thread deletes expired rows every
+# LLM_CACHE_SWEEP_INTERVAL and trims the oldest beyond LLM_CACHE_MAX_ROWS.
+#
+#   flask sweep-llm-cache
+
+LLM_CACHE_PATH = os.environ.get("EHR_LLM_CACHE_PATH", os.path.join(os.getcwd(), "cache", "llm_cache.sqlite"))
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get("EHR_LLM_CACHE_MEMORY_ENTRIES", 2000))
+LLM_CACHE_TTL = float(os.environ.get("EHR_LLM_CACHE_TTL", 30 * 24 * 3600))     # seconds
+LLM_CACHE_MAX_ROWS = int(os.environ.get("EHR_LLM_CACHE_MAX_ROWS", 50000))
+LLM_CACHE_SWEEP_INTERVAL = int(os.environ.get("EHR_LLM_CACHE_SWEEP_INTERVAL", 600))   # seconds
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    Whitespace and case differences do not change the dictation.
+    """
+    return _SPACE_RE.sub(" ", (text or "")).strip().casefold()
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class LLMCache:
+
+    def __init__(self, path=LLM_CACHE_PATH, memory_entries=LLM_CACHE_MEMORY_ENTRIES, ttl=LLM_CACHE_TTL,
+                 max_rows=LLM_CACHE_MAX_ROWS):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._sweeper = None
+        self._memory = OrderedDict()     # key -> (value, latency_ms, created_at)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "shared_calls": 0, "misses": 0,
+                       "errors": 0, "saved_ms": 0.0, "model_ms": 0.0, "swept": 0}
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with self._db() as db:
+                db.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        latency_ms REAL NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache (created_at)")
+
+    # ---------- keys ----------
+    @staticmethod
+    def key(text, context=None, model="", prompt_version=""):
+        raw = json.dumps([normalize_text(text), context or {}, model, prompt_version],
+                         sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ---------- disk store ----------
+    def _db(self):
+        # one SQLite connection per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def _disk_get(self, key):
+        if not self.path:
+            return None
+        row = self._db().execute("SELECT value, latency_ms, created_at FROM llm_cache WHERE key=?",
+                                 (key,)).fetchone()
+        if row is None or time.time() - row[2] > self.ttl:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def _disk_put(self, key, value, latency_ms, created_at):
+        if not self.path:
+            return
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO llm_cache (key, value, latency_ms, created_at) VALUES (?, ?, ?, ?)",
+                       (key, json.dumps(value, default=str), latency_ms, created_at))
+
+    # ---------- memory LRU ----------
+    def _remember(self, key, entry):
+        # under self._lock
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # ---------- lookup ----------
+    def get_or_call(self, key, call):
+        """
+        Return (value, source) where source is "memory", "disk",
+        "shared" (joined an identical in-flight call) or "model".
+        `call()` runs at most once per key at a time; exceptions are
+        passed to every waiting caller and nothing is cached.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[2] <= self.ttl:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                self._stats["saved_ms"] += entry[1]
+                return entry[0], "memory"
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            with self._lock:
+                self._stats["shared_calls"] += 1
+            return flight.value, "shared"
+
+        try:
+            entry = self._disk_get(key)
+            if entry is not None:
+                with self._lock:
+                    self._remember(key, entry)
+                    self._stats["disk_hits"] += 1
+                    self._stats["saved_ms"] += entry[1]
+                flight.value = entry[0]
+                return entry[0], "disk"
+
+            start = time.perf_counter()
+            value = call()
+            latency_ms = (time.perf_counter() - start) * 1000
+            entry = (value, latency_ms, time.time())
+            self._disk_put(key, *entry)
+            with self._lock:
+                self._remember(key, entry)
+                self._stats["misses"] += 1
+                self._stats["model_ms"] += latency_ms
+            flight.value = value
+            return value, "model"
+
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def peek(self, key):
+        """
+        (value, "memory"|"disk") if cached, else None. For streaming
+        callers, which cannot share a flight and store via put().
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[2] <= self.ttl:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                self._stats["saved_ms"] += entry[1]
+                return entry[0], "memory"
+
+        entry = self._disk_get(key)
+        if entry is None:
+            return None
+        with self._lock:
+            self._remember(key, entry)
+            self._stats["disk_hits"] += 1
+            self._stats["saved_ms"] += entry[1]
+        return entry[0], "disk"
+
+    def put(self, key, value, latency_ms):
+        entry = (value, latency_ms, time.time())
+        self._disk_put(key, *entry)
+        with self._lock:
+            self._remember(key, entry)
+            self._stats["misses"] += 1
+            self._stats["model_ms"] += latency_ms
+
+    # ---------- expiry ----------
+    def sweep(self):
+        """
+        Drop expired entries from memory and disk, then the oldest rows
+        beyond max_rows; returns rows deleted.
+        """
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for key in [key for key, entry in self._memory.items() if entry[2] < cutoff]:
+                del self._memory[key]
+        if not self.path:
+            return 0
+        with self._db() as db:
+            removed = db.execute("DELETE FROM llm_cache WHERE created_at < ?", (cutoff,)).rowcount
+            removed += db.execute("""
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_rows,)).rowcount
+        with self._lock:
+            self._stats["swept"] += removed
+        return removed
+
+    def start_sweeper(self, interval=LLM_CACHE_SWEEP_INTERVAL):
+        if self._sweeper is not None or not self.path:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print("❌ LLM cache sweep failed:", e)
+                time.sleep(interval)
+
+        self._sweeper = threading.Thread(target=run, name="llm-cache-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["memory_entries"] = len(self._memory)
+            data["inflight"] = len(self._inflight)
+        hits = data["memory_hits"] + data["disk_hits"] + data["shared_calls"]
+        lookups = hits + data["misses"]
+        data["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        data["saved_ms"] = round(data["saved_ms"], 1)
+        data["model_ms"] = round(data["model_ms"], 1)
+        data["avg_model_ms"] = round(data["model_ms"] / data["misses"], 1) if data["misses"] else 0.0
+        return data
+
+
+llm_cache = LLMCache()
+
+
+def init_app(app):
+    llm_cache.start_sweeper()
+
+    @app.cli.command("sweep-llm-cache")
+    def sweep_llm_cache_command():
+        """Delete expired (and surplus) LLM cache entries."""
+        print(f"✅ Removed {llm_cache.sweep()} LLM cache entries")
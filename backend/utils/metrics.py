@@ -0,0 +1,196 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+
+from flask import g, request, Response
+
+# ----------------------------------------
+# Request metrics (Prometheus text format)
+# ----------------------------------------
+# Per endpoint (blueprint.view, e.g. doctor.ai_structure) and method:
+# request count by status, 5xx errors, a latency histogram and a
+# response size histogram; plus requests in flight. Served at /metrics
+# in the Prometheus text exposition format (0.0.4).
+#
+# Recording is one bisect and one uncontended per-series lock per
+# request - a few microseconds - so it stays on in production. Latency
+# is measured up to the response object; streamed bodies are not
+# included, and responses without a Content-Length are not sized.
+#
+# EHR_METRICS_TOKEN, when set, must be sent as "Authorization: Bearer ..."
+# to read /metrics.
+
+METRICS_ENABLED = os.environ.get("EHR_METRICS", "1") == "1"
+METRICS_TOKEN = os.environ.get("EHR_METRICS_TOKEN")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)       # seconds
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)                  # bytes
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Series:
+    __slots__ = ("lock", "statuses", "errors", "latency", "latency_sum", "sizes", "size_sum", "size_count")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statuses = {}
+        self.errors = 0
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)     # per bucket, last is +Inf
+        self.latency_sum = 0.0
+        self.sizes = [0] * (len(SIZE_BUCKETS) + 1)
+        self.size_sum = 0
+        self.size_count = 0
+
+
+_series = {}                    # (endpoint, method) -> _Series
+_series_lock = threading.Lock()
+_in_flight = [0]
+_in_flight_lock = threading.Lock()
+_started = time.time()
+
+
+def _get_series(key):
+    series = _series.get(key)
+    if series is None:
+        with _series_lock:
+            series = _series.setdefault(key, _Series())
+    return series
+
+
+def observe(endpoint, method, status, seconds, size=None):
+    latency_bucket = bisect_left(LATENCY_BUCKETS, seconds)
+    size_bucket = bisect_left(SIZE_BUCKETS, size) if size is not None else None
+    series = _get_series((endpoint, method))
+    with series.lock:
+        series.statuses[status] = series.statuses.get(status, 0) + 1
+        if status >= 500:
+            series.errors += 1
+        series.latency[latency_bucket] += 1
+        series.latency_sum += seconds
+        if size_bucket is not None:
+            series.sizes[size_bucket] += 1
+            series.size_sum += size
+            series.size_count += 1
+
+
+# ----------------------------------------
+# Flask hooks
+# ----------------------------------------
+def _before():
+    g._metrics_start = time.perf_counter()
+    with _in_flight_lock:
+        _in_flight[0] += 1
+
+
+def _after(response):
+    start = g.pop("_metrics_start", None)
+    if start is not None:
+        with _in_flight_lock:
+            _in_flight[0] -= 1
+        # unmatched URLs share one series so 404 scans cannot add labels
+        endpoint = request.endpoint if request.url_rule is not None else "unmatched"
+        observe(endpoint or "unmatched", request.method, response.status_code,
+                time.perf_counter() - start, response.content_length)
+    return response
+
+
+def _teardown(exc=None):
+    # request ended without reaching after_request
+    if g.pop("_metrics_start", None) is not None:
+        with _in_flight_lock:
+            _in_flight[0] -= 1
+
+
+# ----------------------------------------
+# Exposition
+# ----------------------------------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _bound(b):
+    return repr(float(b)) if isinstance(b, float) else str(b)
+
+
+def render():
+    with _series_lock:
+        items = sorted(_series.items())
+    with _in_flight_lock:
+        in_flight = _in_flight[0]
+
+    requests_out, errors_out, latency_out, size_out = [], [], [], []
+    for (endpoint, method), series in items:
+        with series.lock:
+            statuses = sorted(series.statuses.items())
+            errors = series.errors
+            latency = list(series.latency)
+            latency_sum = series.latency_sum
+            sizes = list(series.sizes)
+            size_sum, size_count = series.size_sum, series.size_count
+
+        blueprint = endpoint.split(".", 1)[0] if "." in endpoint else ""
+        base = {"endpoint": endpoint, "blueprint": blueprint, "method": method}
+
+        for status, count in statuses:
+            requests_out.append(f"ehr_http_requests_total{_labels(**base, status=status)} {count}")
+        errors_out.append(f"ehr_http_request_errors_total{_labels(**base)} {errors}")
+
+        total = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), latency):
+            total += count
+            le = bound if bound == "+Inf" else _bound(bound)
+            latency_out.append(f"ehr_http_request_duration_seconds_bucket{_labels(**base, le=le)} {total}")
+        latency_out.append(f"ehr_http_request_duration_seconds_sum{_labels(**base)} {latency_sum!r}")
+        latency_out.append(f"ehr_http_request_duration_seconds_count{_labels(**base)} {total}")
+
+        if size_count:
+            total = 0
+            for bound, count in zip(SIZE_BUCKETS + ("+Inf",), sizes):
+                total += count
+                le = bound if bound == "+Inf" else _bound(bound)
+                size_out.append(f"ehr_http_response_size_bytes_bucket{_labels(**base, le=le)} {total}")
+            size_out.append(f"ehr_http_response_size_bytes_sum{_labels(**base)} {size_sum}")
+            size_out.append(f"ehr_http_response_size_bytes_count{_labels(**base)} {size_count}")
+
+    lines = [
+        "# HELP ehr_http_requests_total HTTP requests by endpoint, method and status.",
+        "# TYPE ehr_http_requests_total counter",
+        *requests_out,
+        "# HELP ehr_http_request_errors_total HTTP requests answered with a 5xx status.",
+        "# TYPE ehr_http_request_errors_total counter",
+        *errors_out,
+        "# HELP ehr_http_request_duration_seconds Time to produce the response (streamed bodies excluded).",
+        "# TYPE ehr_http_request_duration_seconds histogram",
+        *latency_out,
+        "# HELP ehr_http_response_size_bytes Response body size where Content-Length is known.",
+        "# TYPE ehr_http_response_size_bytes histogram",
+        *size_out,
+        "# HELP ehr_http_requests_in_flight Requests currently being handled.",
+        "# TYPE ehr_http_requests_in_flight gauge",
+        f"ehr_http_requests_in_flight {in_flight}",
+        "# HELP ehr_process_start_time_seconds Start time of the process since the epoch.",
+        "# TYPE ehr_process_start_time_seconds gauge",
+        f"ehr_process_start_time_seconds {_started!r}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view():
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response("Unauthorized\n", status=401, mimetype="text/plain")
+    return Response(render(), content_type=CONTENT_TYPE)
+
+
+def init_app(app):
+    if not METRICS_ENABLED:
+        return
+    app.before_request(_before)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
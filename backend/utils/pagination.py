@@ -0,0 +1,82 @@
+import base64
+import json
+from datetime import date, datetime
+
+# ----------------------------------------
+# Keyset (cursor) pagination
+# ----------------------------------------
+# Pages are addressed by the (sort value, primary key) of the last row
+# already shown, never by OFFSET, so page 500 costs the same index range
+# read as page 1. The cursor is an opaque url-safe token.
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(sort_value, pk):
+    if isinstance(sort_value, (datetime, date)):
+        sort_value = sort_value.isoformat(sep=" ") if isinstance(sort_value, datetime) else sort_value.isoformat()
+    raw = json.dumps([sort_value, pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """
+    Returns (sort_value, pk), or None for a missing / malformed cursor.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_value, pk = json.loads(raw)
+        return sort_value, pk
+    except (ValueError, TypeError):
+        return None
+
+
+def page_size(value, default=PAGE_SIZE):
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+
+def keyset_page(cursor, select_sql, sort_col, pk_col, where=None, params=None,
+                after=None, descending=True, limit=PAGE_SIZE):
+    """
+    Run one page of `select_sql` ordered by (sort_col, pk_col).
+
+    select_sql  SELECT ... FROM ... JOIN ... (no WHERE / ORDER / LIMIT)
+    sort_col    SQL expression to sort on (must be NOT NULL)
+    pk_col      unique tie-breaker, e.g. "p.patient_id"
+    where       list of SQL conditions ANDed together
+    after       cursor token from the previous page
+    Row dicts must expose the sort and pk columns under their bare
+    names (the part after the dot). Returns (rows, next_cursor).
+    """
+    where = list(where or [])
+    params = list(params or [])
+
+    position = decode_cursor(after)
+    if position is not None:
+        op = "<" if descending else ">"
+        where.append(f"({sort_col} {op} %s OR ({sort_col} = %s AND {pk_col} {op} %s))")
+        params += [position[0], position[0], position[1]]
+
+    order = "DESC" if descending else "ASC"
+    sql = select_sql
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {sort_col} {order}, {pk_col} {order} LIMIT %s"
+    params.append(limit + 1)
+
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[sort_col.split(".")[-1]], last[pk_col.split(".")[-1]])
+
+    return rows, next_cursor
@@ -0,0 +1,92 @@
+import json
+import time
+
+from utils import sql_profiler
+
+# ----------------------------------------
+# Patient record repository
+# ----------------------------------------
+# One place that loads a full patient record (patient + doctor name,
+# prescriptions, lab reports, summary stats) for the patient dashboard,
+# the admin details page and the PDF/CSV exports. All three SELECTs go
+# to the server as one multi-statement call, i.e. one round trip.
+
+PATIENT_RECORD_SQL = """
+    SELECT p.*, d.name AS doctor_name
+    FROM patients p
+    LEFT JOIN doctors d ON p.doctor_id = d.doctor_id
+    WHERE p.patient_id = %(pid)s;
+
+    SELECT pr.*, d.name AS doctor_name
+    FROM prescriptions pr
+    LEFT JOIN doctors d ON pr.doctor_id = d.doctor_id
+    WHERE pr.patient_id = %(pid)s
+    ORDER BY pr.created_at DESC;
+
+    SELECT r.*, d.name AS doctor_name
+    FROM lab_reports r
+    LEFT JOIN doctors d ON r.doctor_id = d.doctor_id
+    WHERE r.patient_id = %(pid)s
+    ORDER BY r.upload_date DESC
+"""
+
+
+def decode_medicines(value):
+    """
+    prescriptions.medicines is a JSON column; return it as a list.
+    """
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    try:
+        return json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+
+
+def _result_sets(cursor, sql, params):
+    # the per-statement fetches happen on cursors the SQL profiler never
+    # sees, so the whole read is timed here and recorded as one entry
+    cursor = sql_profiler.unwrap(cursor)
+    sets = []
+    start = time.perf_counter()
+    try:
+        try:
+            # mysql-connector < 9.2
+            results = cursor.execute(sql, params, multi=True)
+            sets = [res.fetchall() if res.with_rows else [] for res in results]
+        except TypeError:
+            # mysql-connector >= 9.2 replaced multi=True with map_results
+            cursor.execute(sql, params, map_results=True)
+            sets = [rows for _statement, rows in cursor.fetchsets()]
+        return sets
+    finally:
+        sql_profiler.record(sql, (time.perf_counter() - start) * 1000, sum(len(rows) for rows in sets))
+
+
+def load_patient_record(cursor, patient_id):
+    """
+    Load everything the patient views need in one round trip.
+    `cursor` must be a dictionary cursor. Returns None if the patient
+    does not exist, otherwise a dict with "patient", "prescriptions"
+    and "reports". The patient dict also carries total_prescriptions,
+    total_reports and last_visit.
+    """
+    patient_rows, prescriptions, reports = _result_sets(cursor, PATIENT_RECORD_SQL, {"pid": patient_id})
+
+    if not patient_rows:
+        return None
+
+    patient = patient_rows[0]
+
+    for pres in prescriptions:
+        pres["medicines"] = decode_medicines(pres.get("medicines"))
+
+    patient["total_prescriptions"] = len(prescriptions)
+    patient["total_reports"] = len(reports)
+    patient["last_visit"] = prescriptions[0]["created_at"] if prescriptions else "-"
+
+    return {
+        "patient": patient,
+        "prescriptions": prescriptions,
+        "reports": reports
+    }
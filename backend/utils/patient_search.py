@@ -0,0 +1,220 @@
+import re
+import threading
+from bisect import bisect_left, insort
+
+import database
+
+# ----------------------------------------
+# In-memory patient typeahead index
+# ----------------------------------------
+# Per doctor, every patient contributes lowercase tokens to sorted
+# lists of (token, patient_id):
+#   names   - first / last name words
+#   others  - username and phone digits
+#   suffix  - phone digits reversed, so "last 4 digits" is a prefix lookup
+# A query is a bisect into each list plus a walk over the matching
+# run, stopped at `limit` results (or SCAN_LIMIT entries), so the cost
+# does not grow with the size of the panel. Name matches rank first,
+# then username/phone, then phone-suffix; each tier is alphabetical
+# with exact token matches ahead of longer ones.
+
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+SCAN_LIMIT = 2000
+
+PUBLIC_FIELDS = ("patient_id", "first_name", "last_name", "username", "phone")
+
+_WORD_RE = re.compile(r"[^\W_]+")
+_DIGITS_RE = re.compile(r"\D+")
+
+
+def _words(text):
+    return _WORD_RE.findall((text or "").lower())
+
+
+def _digits(text):
+    return _DIGITS_RE.sub("", text or "")
+
+
+class _DoctorIndex:
+    __slots__ = ("names", "others", "suffix")
+
+    def __init__(self):
+        self.names = []
+        self.others = []
+        self.suffix = []
+
+
+class PatientSearchIndex:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._docs = {}          # patient_id -> public fields + doctor_id + tokens
+        self._doctors = {}       # doctor_id -> _DoctorIndex
+
+    # ---------- building ----------
+    def _tokens(self, patient):
+        names = set(_words(patient.get("first_name")) + _words(patient.get("last_name")))
+        others = set(_words(patient.get("username")))
+        phone = _digits(patient.get("phone"))
+        if phone:
+            others.add(phone)
+        return names, others, phone[::-1]
+
+    def _add(self, patient, bulk=False):
+        pid = patient["patient_id"]
+        did = patient.get("doctor_id")
+        names, others, suffix = self._tokens(patient)
+
+        doc = {k: patient.get(k) for k in PUBLIC_FIELDS}
+        doc["doctor_id"] = did
+        doc["_tokens"] = (names, others, suffix)
+        self._docs[pid] = doc
+
+        if did is None:
+            return
+        idx = self._doctors.setdefault(did, _DoctorIndex())
+        add = list.append if bulk else insort
+        for tok in names:
+            add(idx.names, (tok, pid))
+        for tok in others:
+            add(idx.others, (tok, pid))
+        if suffix:
+            add(idx.suffix, (suffix, pid))
+
+    def _remove(self, pid):
+        doc = self._docs.pop(pid, None)
+        if not doc or doc["doctor_id"] is None:
+            return
+        idx = self._doctors.get(doc["doctor_id"])
+        if not idx:
+            return
+
+        names, others, suffix = doc["_tokens"]
+        for lst, toks in ((idx.names, names), (idx.others, others), (idx.suffix, [suffix] if suffix else [])):
+            for tok in toks:
+                i = bisect_left(lst, (tok, pid))
+                if i < len(lst) and lst[i] == (tok, pid):
+                    del lst[i]
+
+    def load(self, cursor=None):
+        """
+        (Re)build the whole index from the patients table.
+        """
+        conn = None
+        if cursor is None:
+            conn = database.connect_db()
+            cursor = conn.cursor(dictionary=True)
+
+        cursor.execute("SELECT patient_id, doctor_id, first_name, last_name, username, phone FROM patients")
+        rows = cursor.fetchall()
+
+        if conn is not None:
+            cursor.close()
+            conn.close()
+
+        with self._lock:
+            self._docs = {}
+            self._doctors = {}
+            for row in rows:
+                self._add(row, bulk=True)
+            for idx in self._doctors.values():
+                idx.names.sort()
+                idx.others.sort()
+                idx.suffix.sort()
+            self._loaded = True
+        return len(rows)
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.load()
+
+    # ---------- incremental updates ----------
+    def upsert(self, patient):
+        """
+        Add or replace one patient (dict with patient_id, doctor_id and
+        the searchable fields). No-op until the index has been loaded.
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            self._remove(patient["patient_id"])
+            self._add(patient)
+
+    def remove(self, patient_id):
+        with self._lock:
+            if self._loaded:
+                self._remove(patient_id)
+
+    # ---------- querying ----------
+    def _matches(self, doc, words):
+        names, others, suffix = doc["_tokens"]
+        for w in words:
+            if not (any(t.startswith(w) for t in names)
+                    or any(t.startswith(w) for t in others)
+                    or (w.isdigit() and suffix.startswith(w[::-1]))):
+                return False
+        return True
+
+    @staticmethod
+    def _run_size(lst, key):
+        return bisect_left(lst, (key + "\uffff",)) - bisect_left(lst, (key,))
+
+    def search(self, doctor_id, query, limit=SEARCH_LIMIT):
+        """
+        Ranked typeahead over one doctor's patients.
+        Every query word must prefix-match a name, username or phone
+        token (or be a phone suffix).
+        """
+        self.ensure_loaded()
+        words = _words(query)
+        if not words:
+            return []
+        limit = max(1, min(int(limit), MAX_SEARCH_LIMIT))
+
+        with self._lock:
+            idx = self._doctors.get(doctor_id)
+            if not idx:
+                return []
+
+            # walk the most selective word; the others are checked per candidate
+            probe = min(words, key=lambda w: self._run_size(idx.names, w) + self._run_size(idx.others, w))
+
+            runs = [(idx.names, probe), (idx.others, probe)]
+            if probe.isdigit():
+                runs.append((idx.suffix, probe[::-1]))
+
+            results = []
+            seen = set()
+            scanned = 0
+            for lst, key in runs:
+                i = bisect_left(lst, (key,))
+                while i < len(lst) and scanned < SCAN_LIMIT and len(results) < limit:
+                    tok, pid = lst[i]
+                    if not tok.startswith(key):
+                        break
+                    i += 1
+                    scanned += 1
+                    if pid in seen:
+                        continue
+                    seen.add(pid)
+                    doc = self._docs[pid]
+                    if len(words) == 1 or self._matches(doc, words):
+                        results.append({k: doc[k] for k in PUBLIC_FIELDS})
+
+            return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": self._loaded,
+                "patients": len(self._docs),
+                "doctors": len(self._doctors),
+                "tokens": sum(len(i.names) + len(i.others) + len(i.suffix) for i in self._doctors.values()),
+            }
+
+
+patient_index = PatientSearchIndex()
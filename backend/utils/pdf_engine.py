@@ -0,0 +1,286 @@
+import json
+from collections import namedtuple
+
+from fpdf import FPDF
+
+# ----------------------------------------
+# PDF rendering engine
+# ----------------------------------------
+# Layouts (patient summary, prescription) are described once as page
+# templates: page geometry and text styles are resolved at import, and
+# the character widths of every core font style used are measured once
+# per process. Line wrapping uses those cached widths (plus a per-word
+# width cache) and emits plain cells, instead of FPDF.multi_cell()'s
+# per-character loop, which was most of the render time.
+#
+#   render_patient_summary(patient, prescriptions, reports) -> bytes
+#   render_prescription(prescription)                        -> bytes
+#   render_batch(kind, items)                                -> [bytes]
+
+Style = namedtuple("Style", "family style size line_height")
+
+# Core PDF fonts only cover latin-1: map common typography first so a
+# dash or bullet in a diagnosis cannot abort the whole export.
+_TEXT_MAP = str.maketrans({
+    "\u2014": "-", "\u2013": "-", "\u2022": "*", "\u2018": "'", "\u2019": "'",
+    "\u201c": '"', "\u201d": '"', "\u2026": "...", "\u00a0": " ",
+})
+
+WORD_CACHE_SIZE = 50000
+
+
+def clean(value):
+    text = "" if value is None else str(value)
+    return text.translate(_TEXT_MAP).encode("latin-1", "replace").decode("latin-1")
+
+
+class FontMetrics:
+    """
+    Character widths of one core font style (user units at size 1),
+    measured once per process and shared by every document.
+    """
+    _cache = {}
+
+    def __init__(self, family, style):
+        probe = FPDF()
+        probe.set_font(family, style, 1)
+        self.widths = [probe.get_string_width(chr(i)) for i in range(256)]
+        self._words = {}
+
+    @classmethod
+    def get(cls, family, style):
+        key = (family, style)
+        if key not in cls._cache:
+            cls._cache[key] = cls(family, style)
+        return cls._cache[key]
+
+    def word_width(self, word):
+        w = self._words.get(word)
+        if w is None:
+            w = sum(map(self.widths.__getitem__, word.encode("latin-1")))
+            if len(self._words) >= WORD_CACHE_SIZE:
+                self._words.clear()
+            self._words[word] = w
+        return w
+
+    def _break_word(self, word, max_units):
+        """
+        Split a word wider than a line into line-sized pieces.
+        """
+        pieces = []
+        start = 0
+        total = 0.0
+        for i, width in enumerate(map(self.widths.__getitem__, word.encode("latin-1"))):
+            if i > start and total + width > max_units:
+                pieces.append(word[start:i])
+                start, total = i, 0.0
+            total += width
+        pieces.append(word[start:])
+        return pieces
+
+    def wrap(self, text, size, max_width):
+        """
+        Greedy word wrap of latin-1 `text`; words wider than a line are
+        broken by character. Widths are compared in size-1 units.
+        """
+        max_units = max_width / size
+        space = self.widths[32]
+        widths = self.widths
+        word_width = self.word_width
+        lines = []
+        for para in text.split("\n"):
+            if sum(map(widths.__getitem__, para.encode("latin-1"))) <= max_units:
+                lines.append(para)
+                continue
+            line, line_w = [], 0.0
+            for word in para.split(" "):
+                ww = word_width(word)
+                if line and line_w + space + ww > max_units:
+                    lines.append(" ".join(line))
+                    line, line_w = [], 0.0
+                if ww > max_units:
+                    *full, word = self._break_word(word, max_units)
+                    lines.extend(full)
+                    ww = word_width(word)
+                line_w = line_w + space + ww if line else ww
+                line.append(word)
+            lines.append(" ".join(line))
+        return lines
+
+
+class PageTemplate:
+    """
+    Page geometry, title and named text styles for one layout.
+    """
+
+    def __init__(self, title, styles, page_break_margin=12):
+        self.title = clean(title)
+        self.styles = styles
+        self.page_break_margin = page_break_margin
+        self.metrics = {name: FontMetrics.get(s.family, s.style) for name, s in styles.items()}
+
+        probe = FPDF()
+        self.text_width = probe.w - probe.l_margin - probe.r_margin - 2 * probe.c_margin
+
+    def new_document(self):
+        pdf = FPDF()
+        pdf.set_auto_page_break(auto=True, margin=self.page_break_margin)
+        pdf.add_page()
+        return _Writer(pdf, self)
+
+
+class _Writer:
+    """
+    Writes one document against a PageTemplate, switching fonts only
+    when the style actually changes.
+    """
+
+    def __init__(self, pdf, template):
+        self.pdf = pdf
+        self.template = template
+        self._style = None
+
+    def _use(self, name):
+        if name != self._style:
+            s = self.template.styles[name]
+            self.pdf.set_font(s.family, s.style, s.size)
+            self._style = name
+        return self.template.styles[name]
+
+    def title(self):
+        s = self._use("title")
+        self.pdf.cell(0, s.line_height, self.template.title, ln=1, align="C")
+
+    def line(self, text, style="body"):
+        s = self._use(style)
+        self.pdf.cell(0, s.line_height, clean(text), ln=1)
+
+    def para(self, text, style="body", indent=""):
+        """
+        Wrapped text; continuation lines keep the indent.
+        """
+        s = self._use(style)
+        metrics = self.template.metrics[style]
+        indent_w = metrics.word_width(indent) * s.size
+        text = clean(text)
+        for chunk in metrics.wrap(text, s.size, self.template.text_width - indent_w):
+            self.pdf.cell(0, s.line_height, indent + chunk, ln=1)
+
+    def gap(self, h):
+        self.pdf.ln(h)
+
+    def output(self):
+        data = self.pdf.output(dest="S")
+        return data.encode("latin-1") if isinstance(data, str) else bytes(data)
+
+
+# ----------------------------------------
+# Templates
+# ----------------------------------------
+PATIENT_SUMMARY = PageTemplate("Patient Summary", {
+    "title": Style("Arial", "B", 16, 10),
+    "info": Style("Arial", "", 12, 8),
+    "section": Style("Arial", "B", 14, 8),
+    "body": Style("Arial", "", 11, 6),
+})
+
+PRESCRIPTION = PageTemplate("Prescription", {
+    "title": Style("Arial", "B", 16, 10),
+    "info": Style("Arial", "", 12, 8),
+    "section": Style("Arial", "B", 12, 8),
+    "body": Style("Arial", "", 11, 6),
+})
+
+
+def _medicines(value):
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = []
+    return value or []
+
+
+# ----------------------------------------
+# Layouts
+# ----------------------------------------
+def render_patient_summary(patient, prescriptions, reports):
+    doc = PATIENT_SUMMARY.new_document()
+    doc.title()
+    doc.gap(6)
+
+    doc.line(f"Name: {patient.get('first_name','')} {patient.get('last_name','')}", "info")
+    doc.line(f"Username: {patient.get('username','')}", "info")
+    doc.line(f"Phone: {patient.get('phone') or '-'}", "info")
+    doc.line(f"DOB: {patient.get('dob') or '-'}", "info")
+    doc.line(f"Assigned Doctor: {patient.get('doctor_name') or '-'}", "info")
+    doc.gap(8)
+
+    doc.line("Prescriptions:", "section")
+    if prescriptions:
+        for pres in prescriptions:
+            doc.para(f"- [{pres.get('created_at')}] {pres.get('doctor_name') or ''} - {pres.get('diagnosis') or ''}")
+            if pres.get("prescription_text"):
+                doc.para(pres["prescription_text"], indent="  ")
+            meds = _medicines(pres.get("medicines"))
+            if meds:
+                doc.line("  Medicines:")
+                for m in meds:
+                    doc.para(f"* {m.get('name','')} {m.get('dosage','')}", indent="    ")
+            doc.gap(2)
+    else:
+        doc.line("No prescriptions found.")
+
+    doc.gap(6)
+    doc.line("Lab Reports:", "section")
+    if reports:
+        for r in reports:
+            doc.para(f"- [{r.get('upload_date')}] {r.get('report_name')} ({r.get('report_file')})")
+    else:
+        doc.line("No lab reports found.")
+
+    return doc.output()
+
+
+def render_prescription(prescription):
+    doc = PRESCRIPTION.new_document()
+    doc.title()
+    doc.gap(6)
+
+    doc.line(f"Date: {prescription.get('created_at','')}", "info")
+    doc.line(f"Doctor: {prescription.get('doctor_name','')}", "info")
+    if prescription.get("first_name"):
+        doc.line(f"Patient: {prescription.get('first_name','')} {prescription.get('last_name','')}", "info")
+    doc.gap(6)
+
+    doc.line("Diagnosis:", "section")
+    doc.para(prescription.get("diagnosis") or "")
+    doc.gap(4)
+
+    doc.line("Prescription:", "section")
+    doc.para(prescription.get("prescription_text") or "")
+    doc.gap(4)
+
+    meds = _medicines(prescription.get("medicines"))
+    if meds:
+        doc.line("Medicines:", "section")
+        for m in meds:
+            doc.para(f"- {m.get('name','')} {m.get('dosage','')}")
+
+    return doc.output()
+
+
+RENDERERS = {
+    "patient": lambda item: render_patient_summary(item["patient"], item["prescriptions"], item["reports"]),
+    "prescription": render_prescription,
+}
+
+
+def render_batch(kind, items):
+    """
+    Render many documents of one kind in this process. `items` are
+    {"patient", "prescriptions", "reports"} dicts for "patient" and
+    prescription dicts for "prescription". Returns a list of bytes.
+    """
+    render = RENDERERS[kind]
+    return [render(item) for item in items]
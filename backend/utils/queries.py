@@ -0,0 +1,268 @@
+import threading
+import time
+import weakref
+
+from utils import sql_profiler
+
+# ----------------------------------------
+# Named statement registry
+# ----------------------------------------
+# Route SQL is declared once here by name and run through server-side
+# prepared statements: each connection keeps one prepared cursor per
+# statement name, so MySQL parses a statement once per pooled connection
+# instead of on every call. Every statement records calls, rows and
+# cumulative / max time (see /admin/query-stats).
+#
+#   row = queries.fetch_one(conn, "doctor.patient_owner", (pid,))
+#   rows = queries.fetch_all(conn, "patient.prescriptions", (pid,))
+#   result = queries.execute(conn, "doctor.insert_report", (...))   # .rowcount / .lastrowid
+#
+# Rows come back as dicts, like cursor(dictionary=True). Statements
+# assembled at runtime (filters, keyset pagination) stay inline.
+
+STATEMENTS = {}
+
+_stats_lock = threading.Lock()
+_cursors = weakref.WeakKeyDictionary()      # raw connection -> {name: prepared cursor}
+_cursors_lock = threading.Lock()
+
+
+class Statement:
+    __slots__ = ("name", "sql", "calls", "rows", "errors", "prepares", "total_ms", "max_ms")
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = " ".join(sql.split())
+        self.calls = 0
+        self.rows = 0
+        self.errors = 0
+        self.prepares = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+
+class Result:
+    __slots__ = ("rowcount", "lastrowid")
+
+    def __init__(self, rowcount, lastrowid):
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+
+
+def statement(name, sql):
+    if name in STATEMENTS:
+        raise ValueError(f"Statement {name!r} declared twice")
+    STATEMENTS[name] = Statement(name, sql)
+    return name
+
+
+# ----------------------------------------
+# auth_routes
+# ----------------------------------------
+statement("auth.admin_by_email", "SELECT * FROM admins WHERE email=%s")
+statement("auth.doctor_by_email", "SELECT * FROM doctors WHERE email=%s")
+statement("auth.patient_by_username", "SELECT * FROM patients WHERE username=%s")
+
+# ----------------------------------------
+# doctor_routes
+# ----------------------------------------
+statement("doctor.patient_owner", "SELECT patient_id, doctor_id FROM patients WHERE patient_id=%s")
+statement("doctor.insert_prescription", """
+    INSERT INTO prescriptions
+        (doctor_id, patient_id, diagnosis, prescription_text, medicines, created_at)
+    VALUES (%s, %s, %s, %s, %s, NOW())
+""")
+statement("doctor.insert_report", """
+    INSERT INTO lab_reports (doctor_id, patient_id, report_name, report_file, upload_date)
+    VALUES (%s, %s, %s, %s, NOW())
+""")
+statement("doctor.patient_prescriptions", """
+    SELECT p.*, d.name AS doctor_name
+    FROM prescriptions p
+    JOIN doctors d ON p.doctor_id = d.doctor_id
+    WHERE p.patient_id=%s
+    ORDER BY p.created_at DESC
+""")
+statement("doctor.prescription_detail", """
+    SELECT p.*, d.name AS doctor_name, pa.first_name, pa.last_name
+    FROM prescriptions p
+    JOIN doctors d ON p.doctor_id=d.doctor_id
+    JOIN patients pa ON p.patient_id=pa.patient_id
+    WHERE p.prescription_id=%s
+""")
+statement("doctor.report_file", "SELECT report_file FROM lab_reports WHERE report_id=%s")
+
+# ----------------------------------------
+# patient_routes
+# ----------------------------------------
+statement("patient.prescriptions", """
+    SELECT p.*, d.name AS doctor_name
+    FROM prescriptions p
+    LEFT JOIN doctors d ON p.doctor_id = d.doctor_id
+    WHERE p.patient_id = %s
+    ORDER BY p.created_at DESC
+""")
+statement("patient.reports", """
+    SELECT lr.*, d.name AS doctor_name
+    FROM lab_reports lr
+    LEFT JOIN doctors d ON lr.doctor_id = d.doctor_id
+    WHERE lr.patient_id = %s
+    ORDER BY lr.upload_date DESC
+""")
+statement("patient.report", "SELECT * FROM lab_reports WHERE report_id=%s")
+
+# ----------------------------------------
+# nlp_routes
+# ----------------------------------------
+statement("nlp.patient_context", """
+    SELECT first_name, last_name, dob, phone
+    FROM patients
+    WHERE patient_id=%s AND doctor_id=%s
+""")
+
+# ----------------------------------------
+# admin_routes
+# ----------------------------------------
+statement("admin.recent_audit_logs", """
+    SELECT role, user_id, action, timestamp, ip_address
+    FROM audit_logs
+    ORDER BY timestamp DESC
+    LIMIT 5
+""")
+statement("admin.insert_doctor", """
+    INSERT INTO doctors (name, email, password, specialization, phone, created_at)
+    VALUES (%s, %s, %s, %s, %s, NOW())
+""")
+statement("admin.update_doctor_with_password", """
+    UPDATE doctors
+    SET name=%s, email=%s, specialization=%s, phone=%s, password=%s
+    WHERE doctor_id=%s
+""")
+statement("admin.update_doctor", """
+    UPDATE doctors
+    SET name=%s, email=%s, specialization=%s, phone=%s
+    WHERE doctor_id=%s
+""")
+statement("admin.doctor_name", "SELECT name FROM doctors WHERE doctor_id=%s")
+statement("admin.delete_doctor", "DELETE FROM doctors WHERE doctor_id=%s")
+statement("admin.insert_patient", """
+    INSERT INTO patients (doctor_id, first_name, last_name, phone, dob, username, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, NOW())
+""")
+statement("admin.doctor_choices", "SELECT doctor_id, name FROM doctors ORDER BY name")
+statement("admin.update_patient", """
+    UPDATE patients
+    SET first_name=%s, last_name=%s, username=%s, phone=%s, dob=%s, doctor_id=%s
+    WHERE patient_id=%s
+""")
+statement("admin.patient_username", "SELECT username FROM patients WHERE patient_id=%s")
+statement("admin.delete_patient", "DELETE FROM patients WHERE patient_id=%s")
+statement("admin.patient_audit", """
+    SELECT *
+    FROM audit_logs
+    WHERE action LIKE %s OR user_id=%s
+    ORDER BY timestamp DESC
+""")
+
+
+# ----------------------------------------
+# Execution
+# ----------------------------------------
+def _prepared_cursor(conn, stmt):
+    raw = getattr(conn, "_raw", conn)      # database.PooledConnection wraps the real one
+    with _cursors_lock:
+        cursors = _cursors.get(raw)
+        if cursors is None:
+            cursors = _cursors[raw] = {}
+    cursor = cursors.get(stmt.name)
+    if cursor is None:
+        cursor = cursors[stmt.name] = raw.cursor(prepared=True)
+        with _stats_lock:
+            stmt.prepares += 1
+    return cursor
+
+
+def _forget_cursor(conn, name):
+    raw = getattr(conn, "_raw", conn)
+    with _cursors_lock:
+        cursor = _cursors.get(raw, {}).pop(name, None)
+    if cursor is not None:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+
+
+def _value(v):
+    # the binary protocol can hand back TEXT columns as bytearray
+    if isinstance(v, (bytes, bytearray)):
+        try:
+            return v.decode("utf-8")
+        except UnicodeDecodeError:
+            return bytes(v)
+    return v
+
+
+def _run(conn, name, params):
+    """
+    Execute statement `name`; returns (rows as dicts or None, Result).
+    """
+    stmt = STATEMENTS[name]
+    start = time.perf_counter()
+    try:
+        cursor = _prepared_cursor(conn, stmt)
+        # the cursor re-prepares unless it is given the very same string object
+        cursor.execute(stmt.sql, tuple(params))
+        rows = None
+        if cursor.description:
+            columns = cursor.column_names
+            rows = [dict(zip(columns, map(_value, row))) for row in cursor.fetchall()]
+        result = Result(cursor.rowcount, cursor.lastrowid)
+    except Exception:
+        _forget_cursor(conn, name)
+        with _stats_lock:
+            stmt.errors += 1
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with _stats_lock:
+            stmt.calls += 1
+            stmt.total_ms += elapsed_ms
+            stmt.max_ms = max(stmt.max_ms, elapsed_ms)
+
+    if rows is not None:
+        with _stats_lock:
+            stmt.rows += len(rows)
+    sql_profiler.record(stmt.sql, elapsed_ms, len(rows) if rows is not None else result.rowcount)
+    return rows, result
+
+
+def fetch_all(conn, name, params=()):
+    return _run(conn, name, params)[0]
+
+
+def fetch_one(conn, name, params=()):
+    rows = _run(conn, name, params)[0]
+    return rows[0] if rows else None
+
+
+def execute(conn, name, params=()):
+    return _run(conn, name, params)[1]
+
+
+def stats():
+    """
+    Per-statement counters, busiest (by cumulative time) first.
+    """
+    with _stats_lock:
+        data = [{
+            "name": s.name,
+            "calls": s.calls,
+            "rows": s.rows,
+            "errors": s.errors,
+            "prepares": s.prepares,
+            "total_ms": round(s.total_ms, 3),
+            "avg_ms": round(s.total_ms / s.calls, 3) if s.calls else 0.0,
+            "max_ms": round(s.max_ms, 3),
+        } for s in STATEMENTS.values()]
+    return sorted(data, key=lambda s: s["total_ms"], reverse=True)
@@ -0,0 +1,233 @@
+import os
+import re
+import sys
+import time
+import random
+import fnmatch
+import cProfile
+import threading
+from collections import Counter
+
+from flask import g, request
+
+# ----------------------------------------
+# Opt-in request profiler
+# ----------------------------------------
+# Off by default. An admin turns it on for a route pattern (glob on the
+# endpoint or the path, e.g. "doctor.ai_*" or "/doctor/export*") and a
+# sample rate; matching requests are profiled until max_profiles files
+# are written or the time limit passes, then it switches itself off.
+#
+#   mode "cprofile"  deterministic cProfile  -> logs/profiles/*.pstats
+#                    (snakeviz, gprof2dot, python -m pstats)
+#   mode "sample"    stack sampling every SAMPLE_INTERVAL seconds from a
+#                    helper thread -> logs/profiles/*.collapsed
+#                    (flamegraph.pl, speedscope, inferno)
+#
+# Profiling covers the whole request, streamed bodies included. When
+# off, the only cost is one attribute check per request.
+#
+# EHR_PROFILE_ROUTE (+ EHR_PROFILE_RATE, EHR_PROFILE_MODE) turns it on
+# at startup; /admin/profiler turns it on and off at runtime.
+
+LOG_DIR = os.environ.get("EHR_LOG_DIR", os.path.join(os.getcwd(), "logs"))
+PROFILE_DIR = os.path.join(LOG_DIR, "profiles")
+PROFILE_MAX = int(os.environ.get("EHR_PROFILE_MAX", 50))                  # files per session
+PROFILE_DURATION = float(os.environ.get("EHR_PROFILE_DURATION", 600))      # seconds per session
+SAMPLE_INTERVAL = float(os.environ.get("EHR_PROFILE_SAMPLE_INTERVAL", 0.005))
+MODES = ("cprofile", "sample")
+
+_SAFE_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+_config = None                  # active session, or None when off
+_lock = threading.Lock()
+_sampled = {}                   # thread id -> Counter of collapsed stacks
+_sampler = None
+_recent = []
+
+
+class ProfilerError(ValueError):
+    pass
+
+
+# ----------------------------------------
+# Control
+# ----------------------------------------
+def start(pattern, rate=1.0, mode="cprofile", max_profiles=PROFILE_MAX, duration=PROFILE_DURATION):
+    """
+    Profile requests whose endpoint or path matches `pattern`, each
+    with probability `rate`. Replaces any running session.
+    """
+    global _config
+    if not pattern:
+        raise ProfilerError("pattern is required")
+    if mode not in MODES:
+        raise ProfilerError(f"mode must be one of {', '.join(MODES)}")
+    if not 0 < rate <= 1:
+        raise ProfilerError("rate must be in (0, 1]")
+    if max_profiles < 1 or duration <= 0:
+        raise ProfilerError("max_profiles and duration must be positive")
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with _lock:
+        _config = {
+            "pattern": pattern,
+            "rate": rate,
+            "mode": mode,
+            "max_profiles": max_profiles,
+            "written": 0,
+            "started_at": time.time(),
+            "until": time.time() + duration,
+        }
+    if mode == "sample":
+        _start_sampler()
+    print(f"🔬 Request profiler on: {pattern} rate={rate} mode={mode}")
+    return status()
+
+
+def stop():
+    global _config
+    with _lock:
+        was_on = _config is not None
+        _config = None
+    if was_on:
+        print("🔬 Request profiler off")
+    return status()
+
+
+def status():
+    with _lock:
+        config = dict(_config) if _config else None
+        recent = list(_recent)
+    return {"enabled": config is not None, "config": config, "directory": PROFILE_DIR, "recent": recent}
+
+
+def _matches(config):
+    pattern = config["pattern"]
+    return (fnmatch.fnmatchcase(request.endpoint or "", pattern)
+            or fnmatch.fnmatchcase(request.path, pattern))
+
+
+# ----------------------------------------
+# Stack sampler
+# ----------------------------------------
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def _sample_loop():
+    global _sampler
+    while True:
+        with _lock:
+            # exit under the lock so start() never sees a sampler that is leaving
+            if _config is None or _config["mode"] != "sample":
+                _sampler = None
+                return
+            thread_ids = list(_sampled)
+        if thread_ids:
+            frames = sys._current_frames()
+            for tid in thread_ids:
+                frame = frames.get(tid)
+                counts = _sampled.get(tid)
+                if frame is not None and counts is not None:
+                    counts[_collapse(frame)] += 1
+            del frames
+        time.sleep(SAMPLE_INTERVAL)
+
+
+def _start_sampler():
+    global _sampler
+    with _lock:
+        if _sampler is not None:
+            return
+        _sampler = threading.Thread(target=_sample_loop, name="request-sampler", daemon=True)
+    _sampler.start()
+
+
+# ----------------------------------------
+# Flask hooks
+# ----------------------------------------
+def _before():
+    config = _config
+    if config is None:
+        return
+    if time.time() > config["until"]:
+        stop()
+        return
+    if not _matches(config) or random.random() >= config["rate"]:
+        return
+
+    if config["mode"] == "cprofile":
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return      # another profiler is already active on this interpreter
+        g._request_profile = ("cprofile", profiler, time.perf_counter())
+    else:
+        tid = threading.get_ident()
+        with _lock:
+            _sampled[tid] = Counter()
+        g._request_profile = ("sample", tid, time.perf_counter())
+
+
+def _teardown(exc=None):
+    entry = g.pop("_request_profile", None)
+    if entry is None:
+        return
+    mode, handle, start = entry
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if mode == "cprofile":
+        handle.disable()
+    else:
+        with _lock:
+            handle = _sampled.pop(handle, None)
+
+    name = "{}-{}-{}ms-{:04x}".format(time.strftime("%Y%m%d-%H%M%S"),
+                                      _SAFE_RE.sub("_", request.endpoint or "unmatched"),
+                                      int(elapsed_ms), random.getrandbits(16))
+    try:
+        if mode == "cprofile":
+            path = os.path.join(PROFILE_DIR, name + ".pstats")
+            handle.dump_stats(path)
+        else:
+            if not handle:
+                return      # request finished before the first sample
+            path = os.path.join(PROFILE_DIR, name + ".collapsed")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in handle.most_common():
+                    f.write(f"{stack} {count}\n")
+    except OSError as e:
+        print("❌ Could not write profile:", e)
+        return
+
+    with _lock:
+        _recent.append({"file": os.path.basename(path), "endpoint": request.endpoint,
+                        "path": request.path, "ms": round(elapsed_ms, 1)})
+        del _recent[:-PROFILE_MAX]
+        done = _config is not None and _bump_written()
+    if done:
+        stop()
+
+
+def _bump_written():
+    # under _lock; True once the session has written its quota
+    _config["written"] += 1
+    return _config["written"] >= _config["max_profiles"]
+
+
+def init_app(app):
+    app.before_request(_before)
+    app.teardown_request(_teardown)
+
+    pattern = os.environ.get("EHR_PROFILE_ROUTE")
+    if pattern:
+        start(pattern,
+              rate=float(os.environ.get("EHR_PROFILE_RATE", 1.0)),
+              mode=os.environ.get("EHR_PROFILE_MODE", "cprofile"))
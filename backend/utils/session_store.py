@@ -0,0 +1,265 @@
+import os
+import time
+import sqlite3
+import secrets
+import threading
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# ----------------------------------------
+# Server-side sessions
+# ----------------------------------------
+# The cookie carries only a random session ID; the session dict lives
+# in an in-process LRU in front of a SQLite store, so requests no longer
+# upload (and the server no longer unsigns and decodes) a serialized
+# copy of the user's row. Entries expire SESSION_TTL seconds after last
+# use (sliding, refreshed on disk at most once per half TTL) and a
+# background thread deletes expired rows every SESSION_SWEEP_INTERVAL.
+#
+# The LRU is per process: when running several worker processes, set
+# EHR_SESSION_MEMORY_ENTRIES=0 so a logout in one worker is seen by all.
+#
+# As with Flask's cookie sessions, changes to nested values are only
+# saved if the top-level key is reassigned.
+
+SESSION_DB_PATH = os.environ.get("EHR_SESSION_DB_PATH", os.path.join(os.getcwd(), "cache", "sessions.sqlite"))
+SESSION_TTL = int(os.environ.get("EHR_SESSION_TTL", 8 * 3600))                  # seconds since last use
+SESSION_MEMORY_ENTRIES = int(os.environ.get("EHR_SESSION_MEMORY_ENTRIES", 5000))
+SESSION_SWEEP_INTERVAL = int(os.environ.get("EHR_SESSION_SWEEP_INTERVAL", 300))  # seconds
+
+
+class SessionStore:
+
+    def __init__(self, path=SESSION_DB_PATH, ttl=SESSION_TTL, memory_entries=SESSION_MEMORY_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.serializer = TaggedJSONSerializer()    # keeps datetimes etc. as in cookie sessions
+        self._memory = OrderedDict()                # sid -> [data, expires_at]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sweeper = None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0,
+                       "touches": 0, "deletes": 0, "swept": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._db() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+
+    def _db(self):
+        # one SQLite connection per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def _remember(self, sid, data, expires_at):
+        # under self._lock
+        if self.memory_entries <= 0:
+            return
+        self._memory[sid] = [data, expires_at]
+        self._memory.move_to_end(sid)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # ---------- access ----------
+    def get(self, sid):
+        """
+        The session dict for sid (a copy), or None if unknown/expired.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(sid)
+            if entry is not None:
+                if entry[1] <= now:
+                    del self._memory[sid]
+                    entry = None
+                else:
+                    self._memory.move_to_end(sid)
+                    self._stats["memory_hits"] += 1
+
+        if entry is None:
+            row = self._db().execute("SELECT data, expires_at FROM sessions WHERE sid=?", (sid,)).fetchone()
+            if row is None or row[1] <= now:
+                with self._lock:
+                    self._stats["misses"] += 1
+                return None
+            entry = [self.serializer.loads(row[0]), row[1]]
+            with self._lock:
+                self._remember(sid, *entry)
+                self._stats["disk_hits"] += 1
+
+        # sliding expiry without a write on every request
+        if entry[1] - now < self.ttl / 2:
+            self.touch(sid)
+        return dict(entry[0])
+
+    def save(self, sid, data):
+        data = dict(data)
+        expires_at = time.time() + self.ttl
+        with self._db() as db:
+            db.execute("INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+                       (sid, self.serializer.dumps(data), expires_at))
+        with self._lock:
+            self._remember(sid, data, expires_at)
+            self._stats["writes"] += 1
+
+    def touch(self, sid):
+        expires_at = time.time() + self.ttl
+        with self._db() as db:
+            db.execute("UPDATE sessions SET expires_at=? WHERE sid=?", (expires_at, sid))
+        with self._lock:
+            entry = self._memory.get(sid)
+            if entry is not None:
+                entry[1] = expires_at
+            self._stats["touches"] += 1
+
+    def delete(self, sid):
+        with self._db() as db:
+            db.execute("DELETE FROM sessions WHERE sid=?", (sid,))
+        with self._lock:
+            self._memory.pop(sid, None)
+            self._stats["deletes"] += 1
+
+    # ---------- expiry ----------
+    def sweep(self):
+        """
+        Drop expired sessions from memory and disk; returns rows deleted.
+        """
+        now = time.time()
+        with self._lock:
+            for sid in [sid for sid, entry in self._memory.items() if entry[1] <= now]:
+                del self._memory[sid]
+        with self._db() as db:
+            removed = db.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+        with self._lock:
+            self._stats["swept"] += removed
+        return removed
+
+    def start_sweeper(self, interval=SESSION_SWEEP_INTERVAL):
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print("❌ Session sweep failed:", e)
+
+        self._sweeper = threading.Thread(target=run, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["memory_entries"] = len(self._memory)
+        data["stored"] = self._db().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        data["ttl"] = self.ttl
+        return data
+
+
+# ----------------------------------------
+# Flask integration
+# ----------------------------------------
+class ServerSession(CallbackDict, SessionMixin):
+
+    def __init__(self, initial=None, sid=None, new=False, store=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.store = store
+        self.modified = False
+
+    def regenerate(self):
+        """
+        Move the session to a fresh ID and drop the old one. Call it on
+        login (any privilege change) so a planted or leaked ID never
+        becomes an authenticated session.
+        """
+        if not self.new and self.store is not None:
+            self.store.delete(self.sid)
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.get(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid, store=self.store)
+        # unknown or expired IDs are never reused
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True, store=self.store)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            self.store.save(session.sid, session)
+
+        if session.new or session.modified or (session.permanent and app.config["SESSION_REFRESH_EACH_REQUEST"]):
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+session_store = None
+
+
+def init_app(app):
+    global session_store
+    session_store = SessionStore()
+    session_store.start_sweeper()
+    app.session_interface = ServerSessionInterface(session_store)
+
+    @app.cli.command("sweep-sessions")
+    def sweep_sessions_command():
+        """Delete expired server-side sessions."""
+        print(f"✅ Removed {session_store.sweep()} expired sessions")
+
+
+def stats():
+    if session_store is None:
+        return {"started": False}
+    return session_store.stats()
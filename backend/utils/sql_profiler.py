@@ -0,0 +1,300 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from functools import lru_cache
+
+from flask import g, request, has_request_context
+
+# ----------------------------------------
+# Per-request SQL profiler
+# ----------------------------------------
+# Cursors handed out by the pool during a request are wrapped so every
+# statement's duration (execute + fetch) and row count is recorded on
+# flask.g; named statements (utils.queries) report in directly. When
+# the request ends:
+#   - statements slower than SQL_SLOW_MS go to logs/slow_queries.log
+#     (one JSON object per line; statement text only, never parameters)
+#   - a statement shape run SQL_N_PLUS_ONE or more times in one request
+#     is flagged as an N+1 pattern (console + the same log)
+#   - per-route and per-statement totals are aggregated for /admin/perf
+# Responses carry a Server-Timing header with the query count and time
+# so far. EHR_SQL_PROFILE=0 turns all of it off (cursors are not wrapped).
+
+SQL_PROFILE = os.environ.get("EHR_SQL_PROFILE", "1") == "1"
+SQL_SLOW_MS = float(os.environ.get("EHR_SQL_SLOW_MS", 200))
+SQL_N_PLUS_ONE = int(os.environ.get("EHR_SQL_N_PLUS_ONE", 5))
+SQL_MAX_SHAPES = int(os.environ.get("EHR_SQL_MAX_SHAPES", 500))
+LOG_DIR = os.environ.get("EHR_LOG_DIR", os.path.join(os.getcwd(), "logs"))
+SLOW_LOG_PATH = os.path.join(LOG_DIR, "slow_queries.log")
+RECENT_EVENTS = 50
+
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+_lock = threading.Lock()
+_log_lock = threading.Lock()
+_routes = {}                 # endpoint -> totals
+_statements = {}             # shape -> totals
+_recent = deque(maxlen=RECENT_EVENTS)
+_totals = {"requests": 0, "queries": 0, "slow": 0, "n_plus_one": 0, "dropped_shapes": 0}
+
+
+@lru_cache(maxsize=2048)
+def shape(sql):
+    """
+    Statement with literals and IN-lists folded, so the same query with
+    different values counts as one shape.
+    """
+    if isinstance(sql, (bytes, bytearray)):
+        sql = bytes(sql).decode("utf-8", "replace")
+    sql = _STRING_RE.sub("?", str(sql))
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = _SPACE_RE.sub(" ", sql).strip()
+    return _IN_LIST_RE.sub("(?+)", sql)
+
+
+# ----------------------------------------
+# Recording
+# ----------------------------------------
+def _current():
+    if not SQL_PROFILE or not has_request_context():
+        return None
+    profile = g.get("_sql_profile")
+    if profile is None:
+        profile = g._sql_profile = []
+    return profile
+
+
+def record(sql, duration_ms, rows=0):
+    """
+    Record one statement against the current request (no-op outside one).
+    Returns the entry [sql, ms, rows] so fetch time/rows can be added.
+    """
+    profile = _current()
+    if profile is None:
+        return None
+    entry = [sql, duration_ms, rows]
+    profile.append(entry)
+    return entry
+
+
+class ProfiledCursor:
+    """
+    Cursor proxy timing execute()/fetch*() into the request profile.
+    """
+
+    def __init__(self, cursor, profile):
+        self._cursor = cursor
+        self._profile = profile
+        self._entry = None
+
+    def _timed(self, method, sql, args, kwargs):
+        start = time.perf_counter()
+        try:
+            return method(sql, *args, **kwargs)
+        finally:
+            self._entry = [sql, (time.perf_counter() - start) * 1000, 0]
+            self._profile.append(self._entry)
+
+    def execute(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.execute, operation, args, kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.executemany, operation, args, kwargs)
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        if self._entry is not None:
+            self._entry[1] += (time.perf_counter() - start) * 1000
+            if isinstance(result, list):
+                self._entry[2] += len(result)
+            elif result is not None:
+                self._entry[2] += 1
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, *args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def unwrap(cursor):
+    """
+    The cursor behind a ProfiledCursor, for reads that time themselves
+    and report through record() (e.g. multi-statement result sets,
+    whose fetches the proxy cannot see).
+    """
+    return cursor._cursor if isinstance(cursor, ProfiledCursor) else cursor
+
+
+def wrap(cursor):
+    """
+    Profiled proxy for `cursor` inside a request, else the cursor itself.
+    """
+    profile = _current()
+    if profile is None:
+        return cursor
+    return ProfiledCursor(cursor, profile)
+
+
+# ----------------------------------------
+# End of request
+# ----------------------------------------
+def _write_log(event):
+    try:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        line = json.dumps(event, default=str)
+        with _log_lock, open(SLOW_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print("❌ Could not write slow query log:", e)
+
+
+def _finish(exc=None):
+    profile = g.pop("_sql_profile", None)
+    if not profile:
+        return
+
+    endpoint = request.endpoint or "unmatched"
+    now = datetime.now().isoformat(timespec="seconds")
+    total_ms = sum(e[1] for e in profile)
+    shapes = Counter()
+    slow = []
+
+    with _lock:
+        _totals["requests"] += 1
+        _totals["queries"] += len(profile)
+
+        route = _routes.setdefault(endpoint, {"requests": 0, "queries": 0, "sql_ms": 0.0, "max_queries": 0,
+                                              "max_sql_ms": 0.0, "n_plus_one": 0, "slow": 0})
+        route["requests"] += 1
+        route["queries"] += len(profile)
+        route["sql_ms"] += total_ms
+        route["max_queries"] = max(route["max_queries"], len(profile))
+        route["max_sql_ms"] = max(route["max_sql_ms"], total_ms)
+
+        for sql, ms, rows in profile:
+            key = shape(sql)
+            shapes[key] += 1
+            stat = _statements.get(key)
+            if stat is None:
+                if len(_statements) >= SQL_MAX_SHAPES:
+                    _totals["dropped_shapes"] += 1
+                    continue
+                stat = _statements[key] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0,
+                                           "slow": 0, "endpoints": Counter()}
+            stat["calls"] += 1
+            stat["total_ms"] += ms
+            stat["max_ms"] = max(stat["max_ms"], ms)
+            stat["rows"] += rows
+            stat["endpoints"][endpoint] += 1
+            if ms >= SQL_SLOW_MS:
+                stat["slow"] += 1
+                slow.append({"kind": "slow", "time": now, "endpoint": endpoint, "path": request.path,
+                             "ms": round(ms, 3), "rows": rows, "sql": key})
+
+        repeated = [(key, n) for key, n in shapes.items() if n >= SQL_N_PLUS_ONE]
+        events = slow + [{"kind": "n+1", "time": now, "endpoint": endpoint, "path": request.path,
+                          "count": n, "sql": key} for key, n in repeated]
+        route["slow"] += len(slow)
+        route["n_plus_one"] += len(repeated)
+        _totals["slow"] += len(slow)
+        _totals["n_plus_one"] += len(repeated)
+        _recent.extend(events)
+
+    for key, n in repeated:
+        print(f"⚠️ N+1 in {endpoint}: {n} x {key[:120]}")
+    for event in events:
+        _write_log(event)
+
+
+def _server_timing(response):
+    profile = g.get("_sql_profile")
+    if profile:
+        ms = sum(e[1] for e in profile)
+        response.headers.add("Server-Timing", f'sql;dur={ms:.1f};desc="{len(profile)} queries"')
+    return response
+
+
+def init_app(app):
+    if not SQL_PROFILE:
+        return
+    app.after_request(_server_timing)
+    app.teardown_request(_finish)
+
+
+# ----------------------------------------
+# Report
+# ----------------------------------------
+def report(limit=20):
+    """
+    Worst routes (by SQL time per request) and statements (by total time).
+    """
+    with _lock:
+        routes = [{
+            "endpoint": endpoint,
+            "requests": r["requests"],
+            "avg_queries": round(r["queries"] / r["requests"], 2),
+            "max_queries": r["max_queries"],
+            "avg_sql_ms": round(r["sql_ms"] / r["requests"], 3),
+            "max_sql_ms": round(r["max_sql_ms"], 3),
+            "slow": r["slow"],
+            "n_plus_one": r["n_plus_one"],
+        } for endpoint, r in _routes.items()]
+        statements = [{
+            "sql": key,
+            "calls": s["calls"],
+            "total_ms": round(s["total_ms"], 3),
+            "avg_ms": round(s["total_ms"] / s["calls"], 3),
+            "max_ms": round(s["max_ms"], 3),
+            "rows": s["rows"],
+            "slow": s["slow"],
+            "endpoints": [e for e, _ in s["endpoints"].most_common(3)],
+        } for key, s in _statements.items()]
+        recent = list(_recent)[::-1]
+        totals = dict(_totals)
+
+    routes.sort(key=lambda r: r["avg_sql_ms"], reverse=True)
+    statements.sort(key=lambda s: s["total_ms"], reverse=True)
+    return {
+        "enabled": SQL_PROFILE,
+        "slow_ms": SQL_SLOW_MS,
+        "n_plus_one_threshold": SQL_N_PLUS_ONE,
+        "slow_log": SLOW_LOG_PATH,
+        "totals": totals,
+        "routes": routes[:limit],
+        "statements": statements[:limit],
+        "recent": recent,
+    }
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+        _statements.clear()
+        _recent.clear()
+        for k in _totals:
+            _totals[k] = 0
@@ -0,0 +1,20 @@
+import json
+
+# ----------------------------------------
+# Server-sent events
+# ----------------------------------------
+# Routes that stream structured output return
+#   Response(stream_with_context(gen()), mimetype="text/event-stream", headers=SSE_HEADERS)
+# where gen() yields sse_event(...) strings.
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",      # nginx: do not buffer the stream
+}
+
+
+def sse_event(event, data):
+    """
+    One SSE frame; data is sent as JSON on a single line.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
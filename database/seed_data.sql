@@ -18,7 +18,7 @@ CREATE TABLE IF NOT EXISTS doctors (
     specialization VARCHAR(100),
     phone VARCHAR(15),
     address VARCHAR(255),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
 
@@ -34,7 +34,7 @@ CREATE TABLE IF NOT EXISTS patients (
     address VARCHAR(255),
     username VARCHAR(100) UNIQUE,
     password VARCHAR(255),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (doctor_id) REFERENCES doctors(doctor_id)
 );
 